@@ -2,13 +2,23 @@ from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
+from sqlalchemy.engine import make_url
 
 from alembic import context
 
+from app.db import carregar_config
+
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
 
+# o mesmo banco do app (ambiente ou sync_mangas.toml), com o driver síncrono
+_url = make_url(carregar_config()["url"])
+_url = _url.set(drivername=_url.get_backend_name())
+config.set_main_option(
+    "sqlalchemy.url", _url.render_as_string(hide_password=False).replace("%", "%%")
+)
+
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
 if config.config_file_name is not None:
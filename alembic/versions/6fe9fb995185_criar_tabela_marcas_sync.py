@@ -0,0 +1,36 @@
+"""Criar tabela de marcas da sincronização incremental
+
+Revision ID: 6fe9fb995185
+Revises: afa3f290e645
+Create Date: 2026-10-18 09:12:40.512873
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6fe9fb995185'
+down_revision: Union[str, Sequence[str], None] = 'afa3f290e645'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'marcas_sync',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('provedor_id', sa.Integer(), sa.ForeignKey('provedores.id'), nullable=False),
+        sa.Column('url', sa.String(), nullable=False),
+        sa.Column('hash', sa.String(), nullable=True),
+        sa.Column('etag', sa.String(), nullable=True),
+        sa.Column('last_modified', sa.String(), nullable=True),
+        sa.Column('atualizado_em', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.UniqueConstraint('provedor_id', 'url', name='uq_marca_por_provedor'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('marcas_sync')
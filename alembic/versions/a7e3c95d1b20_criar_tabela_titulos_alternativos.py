@@ -0,0 +1,33 @@
+"""Criar tabela de títulos alternativos (títulos de mangás mesclados)
+
+Revision ID: a7e3c95d1b20
+Revises: f4c1d8b26e57
+Create Date: 2026-10-18 21:14:52.306481
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7e3c95d1b20'
+down_revision: Union[str, Sequence[str], None] = 'f4c1d8b26e57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'titulos_alternativos',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('manga_id', sa.Integer(), sa.ForeignKey('mangas.id'), nullable=False),
+        sa.Column('titulo', sa.String(), nullable=False, unique=True),
+    )
+    op.create_index('ix_titulos_alternativos_manga_id', 'titulos_alternativos', ['manga_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_titulos_alternativos_manga_id', table_name='titulos_alternativos')
+    op.drop_table('titulos_alternativos')
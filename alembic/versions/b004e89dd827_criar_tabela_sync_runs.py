@@ -0,0 +1,42 @@
+"""Criar tabela de execuções de sincronização (sync_runs)
+
+Revision ID: b004e89dd827
+Revises: 6fe9fb995185
+Create Date: 2026-10-18 11:47:05.330918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b004e89dd827'
+down_revision: Union[str, Sequence[str], None] = '6fe9fb995185'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'sync_runs',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('provedor_id', sa.Integer(), sa.ForeignKey('provedores.id'), nullable=False),
+        sa.Column('status', sa.String(), nullable=False, server_default='executando'),
+        sa.Column('incremental', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('cursor', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('mangas', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('capitulos', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('falhas', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('erro', sa.String(), nullable=True),
+        sa.Column('iniciado_em', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column('atualizado_em', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column('finalizado_em', sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index('ix_sync_runs_provedor_id', 'sync_runs', ['provedor_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sync_runs_provedor_id', table_name='sync_runs')
+    op.drop_table('sync_runs')
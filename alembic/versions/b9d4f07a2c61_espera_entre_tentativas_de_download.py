@@ -0,0 +1,26 @@
+"""Espera entre tentativas dos jobs de download (disponivel_em)
+
+Revision ID: b9d4f07a2c61
+Revises: a7e3c95d1b20
+Create Date: 2026-10-18 21:40:08.915372
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9d4f07a2c61'
+down_revision: Union[str, Sequence[str], None] = 'a7e3c95d1b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('download_jobs', sa.Column('disponivel_em', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('download_jobs', 'disponivel_em')
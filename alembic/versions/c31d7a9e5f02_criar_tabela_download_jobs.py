@@ -0,0 +1,40 @@
+"""Criar tabela da fila de downloads (download_jobs)
+
+Revision ID: c31d7a9e5f02
+Revises: b004e89dd827
+Create Date: 2026-10-18 14:05:21.734190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c31d7a9e5f02'
+down_revision: Union[str, Sequence[str], None] = 'b004e89dd827'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'download_jobs',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('capitulo_id', sa.Integer(), sa.ForeignKey('capitulos.id'), nullable=False, unique=True),
+        sa.Column('status', sa.String(), nullable=False, server_default='pendente'),
+        sa.Column('tentativas', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('worker', sa.String(), nullable=True),
+        sa.Column('lease_ate', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('erro', sa.String(), nullable=True),
+        sa.Column('criado_em', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column('atualizado_em', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column('concluido_em', sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index('ix_download_jobs_status', 'download_jobs', ['status'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_download_jobs_status', table_name='download_jobs')
+    op.drop_table('download_jobs')
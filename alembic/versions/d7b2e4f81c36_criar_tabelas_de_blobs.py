@@ -0,0 +1,46 @@
+"""Criar tabelas do armazém de blobs (blobs, paginas_capitulo)
+
+Revision ID: d7b2e4f81c36
+Revises: c31d7a9e5f02
+Create Date: 2026-10-18 16:22:48.901345
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7b2e4f81c36'
+down_revision: Union[str, Sequence[str], None] = 'c31d7a9e5f02'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'blobs',
+        sa.Column('hash', sa.String(), primary_key=True),
+        sa.Column('tamanho', sa.BigInteger(), nullable=False),
+        sa.Column('refs', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('criado_em', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_table(
+        'paginas_capitulo',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('capitulo_id', sa.Integer(), sa.ForeignKey('capitulos.id'), nullable=False),
+        sa.Column('indice', sa.Integer(), nullable=False),
+        sa.Column('blob_hash', sa.String(), sa.ForeignKey('blobs.hash'), nullable=False),
+        sa.Column('extensao', sa.String(), nullable=False),
+        sa.UniqueConstraint('capitulo_id', 'indice', name='uq_pagina_capitulo'),
+    )
+    op.create_index('ix_paginas_capitulo_capitulo_id', 'paginas_capitulo', ['capitulo_id'])
+    op.create_index('ix_paginas_capitulo_blob_hash', 'paginas_capitulo', ['blob_hash'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_paginas_capitulo_blob_hash', table_name='paginas_capitulo')
+    op.drop_index('ix_paginas_capitulo_capitulo_id', table_name='paginas_capitulo')
+    op.drop_table('paginas_capitulo')
+    op.drop_table('blobs')
@@ -0,0 +1,50 @@
+"""Índice de busca de mangás (pg_trgm, unaccent e tsvector)
+
+Revision ID: e08c5a1f93d4
+Revises: d7b2e4f81c36
+Create Date: 2026-10-18 17:40:12.518266
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e08c5a1f93d4'
+down_revision: Union[str, Sequence[str], None] = 'd7b2e4f81c36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+
+    # unaccent() não é IMMUTABLE e por isso não pode ir num índice; o wrapper
+    # fixa o dicionário e pode
+    op.execute("""
+        CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT AS
+        $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+    """)
+
+    # 'simple': os títulos misturam português, inglês e japonês romanizado,
+    # então nada de stemming nem stopwords
+    op.execute("""
+        ALTER TABLE mangas ADD COLUMN busca tsvector GENERATED ALWAYS AS (
+            to_tsvector('simple', f_unaccent(lower(titulo || ' ' || coalesce(alter_title, ''))))
+        ) STORED
+    """)
+    op.execute("CREATE INDEX ix_mangas_busca ON mangas USING gin (busca)")
+    op.execute("""
+        CREATE INDEX ix_mangas_titulo_trgm ON mangas
+        USING gin ((f_unaccent(lower(titulo || ' ' || coalesce(alter_title, '')))) gin_trgm_ops)
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_mangas_titulo_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_mangas_busca")
+    op.drop_column('mangas', 'busca')
+    op.execute("DROP FUNCTION IF EXISTS f_unaccent(text)")
@@ -0,0 +1,42 @@
+"""Impressões das listas de capítulos e remoções/trocas de URL nas ligações
+
+Revision ID: f4c1d8b26e57
+Revises: e08c5a1f93d4
+Create Date: 2026-10-18 19:02:37.804113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4c1d8b26e57'
+down_revision: Union[str, Sequence[str], None] = 'e08c5a1f93d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('capitulos_provedores', sa.Column('removido_em', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('capitulos_provedores', sa.Column('url_anterior', sa.String(), nullable=True))
+    op.add_column('capitulos_provedores', sa.Column('alterado_em', sa.DateTime(timezone=True), nullable=True))
+
+    op.create_table(
+        'impressoes_capitulos',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('manga_id', sa.Integer(), sa.ForeignKey('mangas.id'), nullable=False),
+        sa.Column('provedor_id', sa.Integer(), sa.ForeignKey('provedores.id'), nullable=False),
+        sa.Column('impressao', sa.String(), nullable=False),
+        sa.Column('capitulos', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('atualizado_em', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.UniqueConstraint('manga_id', 'provedor_id', name='uq_impressao_por_provedor'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('impressoes_capitulos')
+    op.drop_column('capitulos_provedores', 'alterado_em')
+    op.drop_column('capitulos_provedores', 'url_anterior')
+    op.drop_column('capitulos_provedores', 'removido_em')
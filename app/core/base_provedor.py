@@ -1,23 +1,234 @@
 from sqlalchemy.future import select
-from httpx import AsyncClient
+from httpx import AsyncClient, Response, TransportError, URL
+from collections import Counter
+from concurrent.futures import Executor
+from urllib.parse import urljoin
+import asyncio
+import contextlib
+import hashlib
 import re
+import time
 
 from app.db import async_session
-from app.models import Manga, Capitulo, CapituloProvedor, Provedor
+from app.models import Provedor, Manga, Capitulo, CapituloProvedor
+from app.core import bulk, diff_capitulos, limitador
+from app.core import execucao as execucao_sync
+from app.core.cache_http import CacheHTTP
+from app.core.casamento import CasadorTitulos, chave_titulo
+from app.core.catalogo import CatalogoCapitulos
+from app.core.downloader import Downloader, criar_saida
+from app.core.metricas import Metricas
+from app.core.pool_http import PoolHTTP
+
+def _interpretar(funcao, conteudo: bytes | str, encoding: str | None, args: tuple):
+    """Decodifica o documento (se vier em bytes) e roda o parse; é o que vai para o pool de processos."""
+    if isinstance(conteudo, bytes):
+        conteudo = conteudo.decode(encoding or "utf-8", errors="replace")
+    return funcao(conteudo, *args)
+
 
 class BaseProvedor:
     nome = str
     url = str
     session: AsyncClient | None = None
+    # cache de respostas HTTP compartilhado por todos os provedores (None = sem cache)
+    cache: CacheHTTP | None = None
+    # pool de conexões compartilhado por todos os provedores
+    pool: PoolHTTP = PoolHTTP()
+    # índice de títulos do catálogo para casar os mangás entre provedores
+    # (None = cada sincronização monta o seu)
+    casador: CasadorTitulos | None = None
+    # máximo de mangás com capítulos sendo buscados ao mesmo tempo no sync
+    max_concorrencia: int = 8
+    # mangás gravados por lote de comandos em massa no banco
+    tamanho_lote: int = 50
+    # segundos sem lote cheio após os quais o que já chegou é gravado mesmo assim
+    intervalo_gravacao: float = 5.0
+    # a listagem vem ordenada pela última atualização? (permite parar cedo no modo incremental)
+    listagem_por_atualizacao: bool = False
+    # ritmo máximo de requisições ao site (compartilhado por host)
+    requisicoes_por_segundo: float = 5.0
+    # tentativas por requisição em erros de rede, 429 e 5xx
+    max_tentativas: int = 5
+    # latência acima da qual a concorrência do sync começa a ser reduzida
+    latencia_alvo: float = 2.0
+    # HTML com mais caracteres que isso é interpretado fora do event loop
+    tamanho_parse_em_thread: int = 64 * 1024
+    # pool de processos para o parse de HTML, compartilhado (None = no próprio processo)
+    executor: Executor | None = None
+    # tempos das etapas, requisições e linhas gravadas, compartilhado (None = sem métricas)
+    metricas: Metricas | None = None
+
+    # estado da sincronização incremental (None = desligada)
+    _marcas: dict | None = None
+    # controle de concorrência adaptativa do sync em andamento
+    _controle: limitador.ConcorrenciaAdaptativa | None = None
+    # capítulos já conhecidos, carregados no começo do sync
+    _catalogo: CatalogoCapitulos | None = None
         
+    async def __aenter__(self):
+        if self.session is None:
+            await self.criar_sessao()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.fechar()
+
     async def criar_sessao(self):
         """
-        cria um sessão HTTP por padrão
+        cria um sessão HTTP por padrão, usando o cliente compartilhado do pool
         Pode ser sobrescrito por provedores que necessitam passar por cloudflare, login, etc.
+        (nesse caso a sessão própria é fechada em `fechar`).
         """
-        self.session = AsyncClient(follow_redirects=True, timeout=30)
+        self.session = self.pool.cliente(self.cache)
         return self.session
+
+    async def fechar(self):
+        """Devolve a sessão HTTP ao pool (ou fecha a sessão própria do provedor)."""
+        if self.session is None:
+            return
+
+        session, self.session = self.session, None
+        if not await self.pool.liberar(session):
+            await session.aclose()
+
+    async def requisitar(self, metodo: str, url: str, marca: str | None = None, **kwargs):
+        """
+        Faz uma requisição pela sessão HTTP do provedor.
+
+        Respeita o limite de requisições por segundo do host e tenta de novo em
+        erros de rede, 429 e 5xx (backoff exponencial com jitter, ou o Retry-After
+        do servidor). Esgotadas as tentativas, levanta a exceção / HTTPStatusError.
+
+        Com `marca` e a sincronização incremental ligada, envia If-None-Match /
+        If-Modified-Since da última execução e registra se o conteúdo mudou
+        (consultar com `inalterado(marca)`).
+        """
+        if self.session is None:
+            await self.criar_sessao()
+
+        anterior = None
+        if marca and self._marcas is not None:
+            anterior = self._marcas.get(marca)
+
+        if anterior:
+            headers = dict(kwargs.pop("headers", None) or {})
+            if anterior.get("etag"):
+                headers["If-None-Match"] = anterior["etag"]
+            if anterior.get("last_modified"):
+                headers["If-Modified-Since"] = anterior["last_modified"]
+            kwargs["headers"] = headers
+
+        response = await self._requisitar_com_retentativas(metodo, url, **kwargs)
+
+        if marca and self._marcas is not None:
+            self._registrar_marca(marca, anterior, response)
+
+        return response
+
+    async def _requisitar_com_retentativas(self, metodo: str, url: str, **kwargs):
+        balde = limitador.balde_do_host(URL(url).host, self.requisicoes_por_segundo)
+        # no modo offline o 504 é "fora do cache", não adianta tentar de novo
+        tentativas = 1 if self.cache is not None and self.cache.offline else self.max_tentativas
+
+        for tentativa in range(1, tentativas + 1):
+            await balde.adquirir()
+            inicio = time.monotonic()
+
+            try:
+                response = await self.session.request(metodo, url, **kwargs)
+            except TransportError as e:
+                self._registrar_resultado(inicio, erro=True)
+                if self.metricas is not None:
+                    self.metricas.requisicao(self.nome, "erro")
+                if tentativa == tentativas:
+                    raise
+                espera = limitador.backoff(tentativa)
+                print(f"[!] {type(e).__name__} em {url}; tentativa {tentativa}/{tentativas}, aguardando {espera:.1f}s")
+                await asyncio.sleep(espera)
+                continue
+
+            erro = response.status_code in limitador.STATUS_RETENTAVEIS
+            self._registrar_resultado(inicio, erro)
+            if self.metricas is not None:
+                self.metricas.requisicao(self.nome, response.status_code, len(response.content))
+            if not erro:
+                return response
+
+            if tentativa == tentativas:
+                response.raise_for_status()
+
+            pedido = limitador.retry_after(response)
+            if pedido is not None:
+                # o servidor pediu para esperar: segura todas as requisições ao host
+                balde.pausar(pedido)
+            espera = pedido if pedido is not None else limitador.backoff(tentativa)
+            print(f"[!] HTTP {response.status_code} em {url}; tentativa {tentativa}/{tentativas}, aguardando {espera:.1f}s")
+            await asyncio.sleep(espera)
+
+        return response
+
+    def _medir(self, etapa: str, **rotulos):
+        """Context manager que mede o bloco na `etapa` das métricas (se ligadas)."""
+        if self.metricas is None:
+            return contextlib.nullcontext()
+        return self.metricas.medir(etapa, provedor=self.nome, **rotulos)
+
+    def _registrar_resultado(self, inicio: float, erro: bool):
+        if self._controle is not None:
+            self._controle.registrar(time.monotonic() - inicio, erro)
+
+    def _registrar_marca(self, marca: str, anterior: dict | None, response):
+        if response.status_code == 304:
+            self._inalterados.add(marca)
+            return
+
+        if response.status_code != 200:
+            return
+
+        hash_ = hashlib.sha1(response.content).hexdigest()
+        if anterior and anterior.get("hash") == hash_:
+            self._inalterados.add(marca)
+            return
+
+        self._marcas_novas[marca] = {
+            "hash": hash_,
+            "etag": response.headers.get("etag"),
+            "last_modified": response.headers.get("last-modified"),
+        }
+
+    def inalterado(self, marca: str) -> bool:
+        """True se o conteúdo da `marca` não mudou desde a última sincronização."""
+        return self._marcas is not None and marca in self._inalterados
     
+    async def analisar(self, funcao, documento: Response | str, *args):
+        """
+        Roda o parse `funcao(html, *args)` sobre uma resposta HTTP (ou o HTML).
+
+        Com `executor` (pool de processos), a resposta vai como bytes para um
+        processo, que decodifica, interpreta e devolve só os registros; o event
+        loop fica com a rede e o banco. Sem ele, documentos grandes (listas de
+        capítulos longas, listagens) vão para uma thread.
+        """
+        if isinstance(documento, Response):
+            conteudo, encoding = documento.content, documento.encoding
+        else:
+            conteudo, encoding = documento, None
+
+        # no pool, o tempo inclui a espera por um processo livre
+        with self._medir("parse", funcao=getattr(funcao, "__name__", "?")):
+            if self.executor is not None:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self.executor, _interpretar, funcao, conteudo, encoding, args)
+            if len(conteudo) < self.tamanho_parse_em_thread:
+                return _interpretar(funcao, conteudo, encoding, args)
+            return await asyncio.to_thread(_interpretar, funcao, conteudo, encoding, args)
+
+    def __reduce__(self):
+        # para o pool de processos: o provedor vai só como a classe (sem sessão
+        # HTTP nem estado do sync) e é recriado do outro lado
+        return (type(self), ())
+
     async def buscar_mangas(self, query: str) -> list:
         """
         Recebe lista de busca e retorna uma lista de dicionarios:
@@ -34,100 +245,607 @@ class BaseProvedor:
         
         [{'titulo': 'Blue Lock', 'alter_title': 'ブルーロック', 'autor': '...', 'url': '...'}]
         """
+        return [m async for m in self.iter_mangas()]
+
+    async def iter_mangas(self, pagina_inicial: int = 1):
+        """
+        Versão em streaming de `get_all_mangas`: gera os mangas página a página,
+        sem acumular o catálogo inteiro em memória. É o que o sync usa.
+
+        Provedores que implementam `url_listagem` e `parse_listagem` ganham o
+        crawler de listagem paralelo, que começa em `pagina_inicial` e anota em
+        cada mangá a 'pagina' de onde ele veio; os que só sobrescrevem
+        `get_all_mangas` têm a lista inteira repassada.
+        """
+        if type(self).get_all_mangas is not BaseProvedor.get_all_mangas:
+            for m in await self.get_all_mangas():
+                yield m
+            return
+
+        if self._marcas is not None and self.listagem_por_atualizacao:
+            listagem = self._listar_ate_pagina_inalterada(pagina_inicial)
+        else:
+            listagem = self._listar_em_paralelo(pagina_inicial)
+
+        async for m in listagem:
+            yield m
+
+    def url_listagem(self, pagina: int) -> str:
+        """URL da página `pagina` (começando em 1) da listagem de mangás."""
         raise NotImplementedError
+
+    def parse_listagem(self, html: str) -> list:
+        """Extrai os mangás de uma página de listagem, no formato de `get_all_mangas`."""
+        raise NotImplementedError
+
+    def total_paginas(self, html: str) -> int | None:
+        """
+        Número de páginas da listagem lido da paginação da primeira página.
+        None quando não dá para saber (aí o total é descoberto por sondagem).
+        """
+        return None
+
+    async def _buscar_pagina(self, pagina: int, rastrear: bool = False) -> tuple[list | None, Response | None]:
+        """
+        Busca e interpreta uma página da listagem.
+        Retorna (mangas, resposta); mangas é None se a página não mudou (modo
+        incremental) e [] se ela não existe ou está vazia.
+        """
+        url_pesquisa = self.url_listagem(pagina)
+        print(f"[*] Buscando página {pagina}: {url_pesquisa}")
+
+        with self._medir("listagem"):
+            response = await self.requisitar("GET", url_pesquisa, marca=url_pesquisa if rastrear else None)
+            if rastrear and self._marcas is not None and url_pesquisa in self._marcas_novas:
+                # a marca da página espera os mangás dela (ver sincronizar_mangas)
+                self._marcas_paginas[pagina] = (url_pesquisa, self._marcas_novas.pop(url_pesquisa))
+
+            if self.inalterado(url_pesquisa):
+                return None, None
+
+            if response.status_code != 200 or not response.content.strip():
+                return [], None
+
+            return await self.analisar(self.parse_listagem, response), response
+
+    async def _listar_ate_pagina_inalterada(self, pagina_inicial: int = 1):
+        """Listagem sequencial que para na primeira página sem mudanças (incremental)."""
+        pagina = pagina_inicial
+        while True:
+            mangas, _ = await self._buscar_pagina(pagina, rastrear=True)
+            if mangas is None:
+                print(f"[✓] Página {pagina} sem mudanças desde a última sincronização. Encerrando.")
+                return
+            if not mangas:
+                print(f"[✓] Nenhum mangá encontrado na página {pagina}. Encerrando.")
+                return
+
+            for m in mangas:
+                m["pagina"] = pagina
+                yield m
+            pagina += 1
+
+    async def _listar_em_paralelo(self, pagina_inicial: int = 1):
+        """
+        Descobre quantas páginas a listagem tem (pela paginação ou por sondagem)
+        e busca várias ao mesmo tempo, entregando os mangás na ordem das páginas.
+        """
+        primeira, resposta = await self._buscar_pagina(1)
+        if not primeira:
+            print("[✓] Nenhum mangá encontrado na página 1. Encerrando.")
+            return
+
+        # páginas já buscadas durante a descoberta
+        buscadas = {1: primeira}
+        total = await self.analisar(self.total_paginas, resposta) or await self._sondar_total_paginas(buscadas)
+        print(f"[*] {total} páginas de listagem em {self.nome}")
+
+        janela = self.max_concorrencia
+        tarefas = {}
+        try:
+            for pagina in range(pagina_inicial, total + 1):
+                # mantém até `janela` páginas à frente sendo buscadas
+                for p in range(pagina, min(total, pagina + janela) + 1):
+                    if p not in buscadas and p not in tarefas:
+                        tarefas[p] = asyncio.create_task(self._buscar_pagina(p))
+
+                if pagina in buscadas:
+                    mangas = buscadas.pop(pagina)
+                else:
+                    mangas, _ = await tarefas.pop(pagina)
+
+                for m in mangas or []:
+                    m["pagina"] = pagina
+                    yield m
+        finally:
+            for tarefa in tarefas.values():
+                tarefa.cancel()
+
+        # o catálogo pode ter crescido durante a busca: segue até a primeira página vazia
+        pagina = max(total, pagina_inicial - 1) + 1
+        while True:
+            mangas, _ = await self._buscar_pagina(pagina)
+            if not mangas:
+                break
+            for m in mangas:
+                m["pagina"] = pagina
+                yield m
+            pagina += 1
+
+    async def _sondar_total_paginas(self, buscadas: dict[int, list]) -> int:
+        """
+        Acha a última página não vazia dobrando o número da página até passar do
+        fim e depois fazendo busca binária. As páginas cheias ficam em `buscadas`.
+        """
+        async def cheia(pagina: int) -> bool:
+            mangas, _ = await self._buscar_pagina(pagina)
+            if mangas:
+                buscadas[pagina] = mangas
+                return True
+            return False
+
+        baixo, alto = 1, 2
+        while await cheia(alto):
+            baixo, alto = alto, alto * 2
+
+        while alto - baixo > 1:
+            meio = (baixo + alto) // 2
+            if await cheia(meio):
+                baixo = meio
+            else:
+                alto = meio
+
+        return baixo
     
     async def get_manga_details(self, url: str) -> dict:
         raise NotImplementedError
     
-    async def get_chapters(self, url: str) -> list:
+    async def get_chapters(self, url: str) -> list | None:
+        """
+        Retorna a lista de capítulos do mangá:
+
+        [{'numero': 12, 'titulo': 'Capítulo 12', 'url': '...'}]
+
+        No modo incremental, retorna None se a lista não mudou desde a última
+        sincronização (use `requisitar(..., marca=url)` e `inalterado(url)`).
+        """
         raise NotImplementedError
 
-    async def sincronizar_mangas(self):
-        """Busca mangas novos e capítulos novos, e atualiza o banco."""
-        print(f"[*] Sincronizando mangás do provedor {self.nome}")
-        
-        # pega a lista de todos os mangas do server
-        mangas = await self.get_all_mangas()
+    async def sincronizar_mangas(
+        self,
+        concorrencia: int | None = None,
+        incremental: bool = False,
+        retomar: bool = False,
+    ):
+        """
+        Busca mangas novos e capítulos novos, e atualiza o banco.
+
+        Roda como um pipeline de etapas ligadas por filas limitadas:
+        páginas de listagem -> fila de mangás -> buscadores de capítulos ->
+        fila de resultados -> gravação no banco. A memória não cresce com o
+        tamanho do catálogo e cada lote de `tamanho_lote` mangás (ou o que houver
+        a cada `intervalo_gravacao` segundos) já é gravado e commitado.
+
+        Os capítulos são buscados por até `concorrencia` (ou `max_concorrencia`)
+        buscadores ao mesmo tempo; a escrita no banco continua sequencial.
+
+        Com `incremental=True`, usa as marcas da última execução (ETag,
+        Last-Modified, hash do conteúdo) para pular mangás sem mudanças e, se a
+        listagem for ordenada por atualização, parar na primeira página inalterada.
+
+        Mangás cuja busca de capítulos falha (depois das retentativas) não são
+        gravados como "sem capítulos": ficam para a próxima sincronização, e a
+        página de listagem de onde vieram não ganha marca (continua "mudada").
+
+        A execução fica registrada em `sync_runs`, com o cursor (última página
+        da listagem totalmente gravada) atualizado junto com cada lote. Com
+        `retomar=True`, continua a última execução não concluída do provedor.
+
+        Retorna {'mangas': processados, 'capitulos': adicionados, 'falhas': n}.
+        """
+        limite = concorrencia or self.max_concorrencia
+        modo = "incremental" if incremental else "completa"
+        print(f"[*] Sincronizando mangás do provedor {self.nome} ({modo}, concorrência: {limite})")
+
+        fila_mangas = asyncio.Queue(maxsize=limite * 2)
+        fila_resultados = asyncio.Queue(maxsize=self.tamanho_lote * 2)
+        erro_listagem = None
+
+        async def listar(pagina_inicial: int):
+            # etapa 1: páginas de listagem -> fila de mangás
+            nonlocal erro_listagem
+            try:
+                async for m in self.iter_mangas(pagina_inicial):
+                    self._cursor.listado(m.get("pagina"))
+                    await fila_mangas.put(m)
+            except Exception as e:
+                print(f"[!] Falha na listagem de {self.nome}: {e}")
+                erro_listagem = e
+            # a falha é ao buscar a página seguinte: as já entregues estão
+            # completas e o cursor pode chegar até elas
+            self._cursor.fim_da_listagem()
+
+            # um aviso de fim para cada buscador
+            for _ in range(limite):
+                await fila_mangas.put(None)
+
+        async def buscar_capitulos():
+            # etapa 2: fila de mangás -> capítulos -> fila de resultados
+            while True:
+                m = await fila_mangas.get()
+                if m is None:
+                    break
+
+                async with self._controle:
+                    try:
+                        with self._medir("capitulos"):
+                            capitulos = await self.get_chapters(m["url"])
+                    except Exception as e:
+                        # falha não é "sem capítulos": o mangá fica para a próxima sincronização
+                        capitulos = e
+
+                await fila_resultados.put((m, capitulos))
+
+            await fila_resultados.put(None)
         
         async with async_session() as session:
             result = await session.execute(select(Provedor).where(Provedor.nome == self.nome))
             db_prov = result.scalars().first()
             self.db_provedor_id = db_prov.id
 
-            for m in mangas:
-                titulo = m["titulo"].strip()
-                
-                # checa se já existe no banco
-                result = await session.execute(
-                    select(Manga).where(Manga.titulo == titulo)
-                )
-                manga_db = result.scalars().first()
-                
-                if not manga_db:
-                    # se não existir, cria um novo manga
-                    manga_db = Manga(titulo=titulo)
-                    session.add(manga_db)
-                    await session.flush() # gera o id
-                    
-                # pega os caps existentes no banco
-                result = await session.execute(
-                    select(Capitulo).where(Capitulo.manga_id == manga_db.id)
-                )
-                
-                caps_existentes = result.scalars().all()
-                caps_existentes_dict = {float(c.numero): c for c in caps_existentes}
-                
-                # pega capitulos novos do provedor
-                capitulos = await self.get_chapters(m["url"])
-                
-                if len(capitulos) == len(caps_existentes):
-                    print(f"[-] Mangá '{titulo}' já sincronizado.")
-                    continue
-                
-                #adiciona caps que não existem
-                novos = 0
-                for cap in capitulos:
-                    if cap["numero"] not in caps_existentes_dict:
-                        novo_cap = Capitulo(
-                            manga_id=manga_db.id,
-                            numero=cap["numero"],
-                            titulo=cap.get("titulo"),
-                        )
-                        session.add(novo_cap)
-                        await session.flush()  # garante que novo_cap.id é gerado
-
-                        # 👉 Atualiza o dict para evitar inserir duplicados
-                        caps_existentes_dict[cap["numero"]] = novo_cap
-
-                        cap_prov = CapituloProvedor(
-                            capitulo_id=novo_cap.id,
-                            provedor_id=self.db_provedor_id,
-                            url=cap["url"]
-                        )
-                        session.add(cap_prov)
-                        novos += 1
-                    else:
-                        print(f"[!] Capítulo {cap['numero']} já existente em '{titulo}', ignorado.")
-
-                        
-                if novos > 0:
-                    print(f"[+] Mangá '{titulo}': {novos} capítulos adicionados.")
-                    
-            await session.commit()
-            
+            if self.casador is None:
+                self.casador = await CasadorTitulos.carregar(session)
+            self._catalogo = await CatalogoCapitulos.carregar(session, db_prov.id)
+            self._impressoes = await bulk.carregar_impressoes(session, db_prov.id)
+            self._vistos = set()
+
+            execucao = await execucao_sync.iniciar_execucao(session, db_prov.id, incremental, retomar)
+            self._execucao = execucao
+            self._cursor = execucao_sync.CursorListagem(execucao.cursor)
+
+            self._marcas = await bulk.carregar_marcas(session, db_prov.id) if incremental else None
+            self._marcas_novas = {}
+            # marcas das páginas de listagem, {pagina: (url, marca)}, e páginas
+            # com algum mangá que falhou
+            self._marcas_paginas = {}
+            self._paginas_com_falha = set()
+            self._inalterados = set()
+            self._controle = limitador.ConcorrenciaAdaptativa(limite, latencia_alvo=self.latencia_alvo)
+
+            sem_mudancas = 0
+            lote = []
+
+            tarefas = [asyncio.create_task(listar(execucao.cursor + 1))]
+            tarefas += [asyncio.create_task(buscar_capitulos()) for _ in range(limite)]
+            try:
+                # etapa 3: fila de resultados -> banco, em lotes
+                buscadores_ativos = limite
+                while buscadores_ativos:
+                    try:
+                        item = await asyncio.wait_for(fila_resultados.get(), timeout=self.intervalo_gravacao)
+                    except asyncio.TimeoutError:
+                        # buscas lentas: grava o que já chegou em vez de esperar o lote encher
+                        if lote:
+                            await self._gravar_lote(session, lote)
+                            lote = []
+                        continue
+
+                    if item is None:
+                        buscadores_ativos -= 1
+                        continue
+
+                    m, capitulos = item
+                    if isinstance(capitulos, Exception):
+                        print(f"[!] Falha ao buscar capítulos de '{m['titulo']}': {capitulos}")
+                        self._marcas_novas.pop(m["url"], None)
+                        self._paginas_com_falha.add(m.get("pagina"))
+                        execucao.falhas += 1
+                        self._cursor.concluido(m.get("pagina"))
+                        continue
+
+                    if capitulos is None:
+                        sem_mudancas += 1
+                        self._cursor.concluido(m.get("pagina"))
+                        continue
+
+                    lote.append((m, capitulos))
+
+                    if len(lote) >= self.tamanho_lote:
+                        await self._gravar_lote(session, lote)
+                        lote = []
+
+                if lote:
+                    await self._gravar_lote(session, lote)
+
+                if erro_listagem is not None:
+                    # tudo o que foi listado está gravado: o --resume recomeça
+                    # depois da última página entregue, sem refazer (e recontar) nada
+                    execucao.cursor = self._cursor.valor
+                    await session.commit()
+                    raise erro_listagem
+
+                # marcas das páginas de listagem: só depois de todos os mangás
+                # gravados, e só das páginas sem falhas; com a página "inalterada",
+                # o próximo sync incremental pararia antes do mangá que falhou
+                for pagina, (url, marca) in self._marcas_paginas.items():
+                    if pagina not in self._paginas_com_falha:
+                        self._marcas_novas[url] = marca
+                if self._marcas_novas:
+                    await bulk.upsert_marcas(session, db_prov.id, self._marcas_novas)
+                execucao.cursor = self._cursor.valor
+                await execucao_sync.finalizar_execucao(session, execucao)
+            except BaseException as e:
+                # o que já foi commitado fica; a execução pode ser retomada com --resume
+                try:
+                    await session.rollback()
+                    await execucao_sync.finalizar_execucao(session, execucao, e)
+                except Exception as erro_registro:
+                    print(f"[warn] não foi possível registrar a falha da execução: {erro_registro}")
+                raise
+            finally:
+                for tarefa in tarefas:
+                    tarefa.cancel()
+                self._controle = None
+                self._catalogo = None
+                self._impressoes = None
+                self._vistos = None
+                # sem isso, um get_chapters depois do sync (UI, baixar, worker)
+                # ainda veria as marcas e poderia receber None ("inalterado")
+                self._marcas = None
+                self._marcas_novas = {}
+                self._marcas_paginas = {}
+                self._paginas_com_falha = set()
+                self._inalterados = set()
+
+        if incremental:
+            print(f"[*] {sem_mudancas} mangás sem mudanças desde a última sincronização.")
+        if execucao.falhas:
+            print(f"[!] {execucao.falhas} mangás não puderam ser buscados e ficaram para a próxima sincronização.")
         print(f"[✓] Sincronização de {self.nome} concluída!")
+        return {"mangas": execucao.mangas, "capitulos": execucao.capitulos, "falhas": execucao.falhas}
+
+    async def _gravar_lote(self, session, lote: list[tuple[dict, list]]) -> int:
+        """
+        Grava e commita um lote de (manga, capitulos) com poucos comandos em massa:
+        insert dos mangás, dos capítulos e das ligações com o provedor que ainda
+        não existem (segundo o casador de títulos e o retrato do catálogo),
+        junto com as marcas incrementais desses mangás e o checkpoint da execução.
+        Mangás cuja lista tem a impressão da última sincronização são pulados;
+        nos outros, capítulos que sumiram da lista, voltaram ou trocaram de URL
+        ficam registrados nas ligações (CapituloProvedor).
+        Retorna quantos capítulos foram adicionados.
+        """
+        inicio = time.perf_counter()
+        marcas = {
+            m["url"]: self._marcas_novas.pop(m["url"])
+            for m, _ in lote if m["url"] in self._marcas_novas
+        }
+        paginas = [m.get("pagina") for m, _ in lote]
+        lote = [(m["titulo"].strip(), capitulos) for m, capitulos in lote]
+
+        # o mesmo mangá com outra grafia ("Blue Lock (Pt-BR)", sem acento, ...)
+        # vai para o que já existe; só os títulos que não casam viram mangás novos
+        manga_ids = {}
+        novos_titulos = {}
+        for titulo, casado in self.casador.casar_lote(titulo for titulo, _ in lote).items():
+            if casado is not None:
+                manga_ids[titulo] = casado
+            else:
+                novos_titulos.setdefault(chave_titulo(titulo) or titulo, []).append(titulo)
+
+        if novos_titulos:
+            inseridos = await bulk.upsert_mangas(session, (t[0] for t in novos_titulos.values()))
+            for titulos in novos_titulos.values():
+                for titulo in titulos:
+                    manga_ids[titulo] = inseridos[titulos[0]]
+
+        # a lista de cada mangá, sem números repetidos (vale o primeiro); dois
+        # títulos do provedor que caem no mesmo mangá viram uma lista só
+        listas = {}
+        repetidos = set()
+        for titulo, capitulos in lote:
+            manga_id = manga_ids[titulo]
+            if manga_id in listas:
+                repetidos.add(manga_id)
+            urls = listas.setdefault(manga_id, {})
+            for cap in capitulos:
+                urls.setdefault(float(cap["numero"]), cap)
+
+        # impressão igual à da última sincronização: a lista não mudou e o
+        # mangá não custa mais nada
+        impressoes = {}
+        mudados = {}
+        for manga_id, capitulos in listas.items():
+            urls = {numero: cap["url"] for numero, cap in capitulos.items()}
+            # mangá que já apareceu com outro título nesta execução: cada
+            # título traz só parte da lista, então nada é dado como removido
+            # e a impressão não serve para pular o mangá da próxima vez
+            parcial = manga_id in repetidos or manga_id in self._vistos
+            self._vistos.add(manga_id)
+            impressao = diff_capitulos.impressao(urls)
+            if not parcial and self._impressoes.get(manga_id) == impressao:
+                continue
+            mudados[manga_id] = (capitulos, urls, parcial)
+            # lista vazia costuma ser falha do site, não o fim do mangá: não
+            # remove nada e não vira impressão
+            if urls:
+                impressoes[manga_id] = (diff_capitulos.SEMPRE_COMPARAR if parcial else impressao, len(urls))
+
+        # só os mangás que mudaram são comparados com as ligações do provedor
+        anteriores = await bulk.carregar_links(session, self.db_provedor_id, list(mudados)) if mudados else {}
+
+        diferencas = {}
+        linhas = []
+        links = {}
+        sem_capitulo = []
+        for manga_id, (capitulos, urls, parcial) in mudados.items():
+            diferenca = diff_capitulos.comparar(
+                urls, anteriores.get(manga_id, {}), remocoes=bool(urls) and not parcial,
+            )
+            diferencas[manga_id] = diferenca
+            # pelo retrato do catálogo: só capítulos novos são inseridos e só
+            # ligações que faltam são criadas, sem consultar o banco
+            for numero in diferenca.novos:
+                cap = capitulos[numero]
+                cap_id, ligado = self._catalogo.capitulo(manga_id, numero)
+                if cap_id is None:
+                    linhas.append({"manga_id": manga_id, "numero": cap["numero"], "titulo": cap.get("titulo")})
+                    sem_capitulo.append((manga_id, cap))
+                elif not ligado:
+                    links.setdefault(cap_id, (manga_id, cap))
+
+        cap_ids, novos = await bulk.inserir_capitulos(session, linhas) if linhas else ({}, set())
+        for manga_id, cap in sem_capitulo:
+            cap_id = cap_ids.get((manga_id, float(cap["numero"])))
+            if cap_id is not None:
+                links.setdefault(cap_id, (manga_id, cap))
+
+        if links:
+            await bulk.inserir_links(session, [
+                {"capitulo_id": cap_id, "provedor_id": self.db_provedor_id, "url": cap["url"]}
+                for cap_id, (_, cap) in links.items()
+            ])
+
+        removidos, reaparecidos, urls_alteradas = [], [], []
+        for diferenca in diferencas.values():
+            removidos += diferenca.removidos
+            reaparecidos += diferenca.reaparecidos
+            urls_alteradas += diferenca.urls_alteradas
+        alterados = await bulk.atualizar_links(session, removidos, reaparecidos, urls_alteradas)
+
+        if impressoes:
+            await bulk.upsert_impressoes(session, self.db_provedor_id, impressoes)
+
+        # resumo por mangá
+        novos_por_manga = Counter(manga_id for manga_id, _ in novos)
+        for titulo, _ in lote:
+            manga_id = manga_ids[titulo]
+            diferenca = diferencas.pop(manga_id, None)
+            if diferenca is None:
+                print(f"[-] Mangá '{titulo}' já sincronizado.")
+                continue
+            qtd = novos_por_manga.pop(manga_id, 0)
+            partes = [f"{qtd} capítulos adicionados"] if qtd else []
+            if diferenca.removidos:
+                partes.append(f"{len(diferenca.removidos)} removidos")
+            if diferenca.reaparecidos:
+                partes.append(f"{len(diferenca.reaparecidos)} de volta")
+            if diferenca.urls_alteradas:
+                partes.append(f"{len(diferenca.urls_alteradas)} com URL nova")
+            if diferenca.renumerados:
+                partes.append(f"{diferenca.renumerados} renumerados")
+            if partes:
+                print(f"[{'+' if qtd else '*'}] Mangá '{titulo}': {', '.join(partes)}.")
+            else:
+                print(f"[-] Mangá '{titulo}' já sincronizado.")
+
+        # as marcas e o checkpoint vão na mesma transação dos dados que eles descrevem
+        if marcas:
+            await bulk.upsert_marcas(session, self.db_provedor_id, marcas)
+
+        for pagina in paginas:
+            self._cursor.concluido(pagina)
+        self._execucao.cursor = self._cursor.valor
+        self._execucao.mangas += len(lote)
+        self._execucao.capitulos += len(novos)
 
-    async def baixar_mangas(self, manga_id):
+        if self.metricas is not None:
+            self.metricas.observar("gravacao", time.perf_counter() - inicio, provedor=self.nome)
+            self.metricas.gravadas(self.nome, "mangas", len(novos_titulos))
+            self.metricas.gravadas(self.nome, "capitulos", len(novos))
+            self.metricas.gravadas(self.nome, "capitulo_provedor", len(links) + alterados)
+            self.metricas.gravadas(self.nome, "impressoes", len(impressoes))
+            self.metricas.gravadas(self.nome, "marcas", len(marcas))
+        with self._medir("commit"):
+            await session.commit()
+
+        for titulos in novos_titulos.values():
+            self.casador.adicionar(manga_ids[titulos[0]], titulos[0])
+        for cap_id, (manga_id, cap) in links.items():
+            self._catalogo.registrar(manga_id, cap["numero"], cap_id)
+        self._impressoes.update((manga_id, impressao) for manga_id, (impressao, _) in impressoes.items())
+
+        return len(novos)
+
+    async def baixar_mangas(
+        self,
+        manga_id: int,
+        destino: str = "downloads",
+        formato: str = "pastas",
+        saida=None,
+        **opcoes,
+    ) -> dict:
+        """
+        Baixa os capítulos ainda não baixados do mangá que vieram deste provedor.
+
+        As páginas de cada capítulo vêm de `get_paginas` e são gravadas por `saida`
+        (padrão: a saída do `formato` em `destino`: pastas de imagens, .cbz ou o
+        armazém de blobs). `opcoes` vão para o Downloader (max_simultaneos,
+        max_por_host, capitulos_simultaneos, ...).
+
+        Retorna {'capitulos', 'falhas', 'paginas', 'bytes', 'duracao'}.
+        """
+        async with async_session() as session:
+            manga = await session.get(Manga, manga_id)
+            if manga is None:
+                raise ValueError(f"Mangá {manga_id} não encontrado")
+
+            result = await session.execute(
+                select(Capitulo.id, Capitulo.numero, Capitulo.titulo, CapituloProvedor.url)
+                .join(CapituloProvedor, CapituloProvedor.capitulo_id == Capitulo.id)
+                .join(Provedor, Provedor.id == CapituloProvedor.provedor_id)
+                .where(
+                    Capitulo.manga_id == manga_id,
+                    Capitulo.baixado.is_(False),
+                    Provedor.nome == self.nome,
+                    CapituloProvedor.removido_em.is_(None),
+                )
+                .order_by(Capitulo.numero)
+            )
+            capitulos = [
+                {"id": id_, "numero": numero, "titulo": titulo, "url": url}
+                for id_, numero, titulo, url in result.all()
+            ]
+            dados_manga = {
+                "id": manga.id,
+                "titulo": manga.titulo,
+                "alter_title": manga.alter_title,
+                "autor": manga.autor,
+                "descricao": manga.descricao,
+            }
+
+        if not capitulos:
+            print(f"[-] Nenhum capítulo pendente de '{dados_manga['titulo']}' em {self.nome}")
+            return {"capitulos": 0, "falhas": 0, "paginas": 0, "bytes": 0, "duracao": 0.0}
+
+        print(f"[*] Baixando {len(capitulos)} capítulos de '{dados_manga['titulo']}' via {self.nome}")
+        downloader = Downloader(saida or criar_saida(formato, destino), **opcoes)
+        return await downloader.baixar(self, dados_manga, capitulos)
+
+    async def get_paginas(self, url: str) -> list[str]:
         """
-        Baixa os capítulos do manga informado.
-        Deve ser sobrescrito por cada provedor.
+        Retorna as URLs das imagens do capítulo, em ordem de leitura.
+        Por padrão baixa a página do capítulo e usa `parse_paginas`.
         """
+        response = await self.requisitar("GET", url)
+        response.raise_for_status()
+        return [urljoin(url, p) for p in await self.analisar(self.parse_paginas, response)]
+
+    def parse_paginas(self, html: str) -> list[str]:
+        """Extrai as URLs das imagens do HTML de um capítulo."""
         raise NotImplementedError
     
-    async def parse_chapter(self, text: str) -> str:
+    async def parse_chapter(self, text: str) -> tuple[int | float | None, str]:
         """
         Retorna (numero, titulo)
         """
+        return self.numero_capitulo(text)
+
+    def numero_capitulo(self, text: str) -> tuple[int | float | None, str]:
+        """
+        Versão síncrona de `parse_chapter`, usada dentro do parse (inclusive
+        nos processos do pool). Retorna (numero, titulo).
+        """
         # tenta extrair número inteiro ou decimal após "capitulo" (case insensitive)
         m = re.search(r'[Cc]ap[ií]tulo\s+(\d+(?:\.\d+)?)', text)
         if m:
@@ -136,4 +854,4 @@ class BaseProvedor:
             numero = None  # não achou número
         
         titulo = text.strip()
-        return numero, titulo
\ No newline at end of file
+        return numero, titulo
@@ -0,0 +1,304 @@
+"""
+Benchmark do sync sem acessar os sites de verdade.
+
+`SiteFalso` é um app ASGI que gera, na hora, as páginas que cada provedor
+espera: a listagem e o AJAX de capítulos do tema Madara (MangaOnline:
+`.post-title a`, `li a`) e a listagem e a página do mangá do MangaBR
+(`.link-series`, `.col-chapter a h5`). Ele responde pelos hosts dos
+provedores e entra no lugar da rede pelo `transporte` do PoolHTTP, então o
+resto do caminho (limite por host, parse, casador, gravação em lote) é o
+mesmo de um sync real.
+
+`executar_benchmark` roda `sincronizar_provedores` de ponta a ponta em
+rodadas, contra um SQLite temporário ou o banco informado (PostgreSQL de
+teste: o benchmark grava nele), e mede a vazão de cada rodada e o pico de
+memória do processo até o fim dela. A primeira rodada sincroniza o
+catálogo inteiro; nas seguintes uma fração dos mangás ganha um capítulo
+novo, como num sync do dia a dia.
+"""
+import asyncio
+import os
+import random
+import shutil
+import tempfile
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+from sqlalchemy import select, func
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from app import db
+from app.models import Base, Manga
+from app.core import registro
+from app.core.base_provedor import BaseProvedor
+from app.core.metricas import Metricas
+from app.core.pool_http import PoolHTTP
+
+
+class SiteFalso:
+    """App ASGI que imita os sites dos provedores, com um catálogo sintético determinístico."""
+
+    # provedor -> método que gera as páginas no formato do site dele
+    LAYOUTS = {"MangaOnline": "_madara", "MangaBR": "_mangabr"}
+
+    def __init__(
+        self,
+        mangas: int = 1000,
+        capitulos: int = 50,
+        por_pagina: int = 20,
+        latencia: float = 0.0,
+        atualizados: float = 0.1,
+        semente: int = 0,
+    ):
+        aleatorio = random.Random(semente)
+        # capítulos de cada mangá, com média `capitulos`
+        self._capitulos = [aleatorio.randint(1, max(1, 2 * capitulos - 1)) for _ in range(mangas)]
+        self.por_pagina = por_pagina
+        self.latencia = latencia
+        # a cada rodada, 1 de cada `_passo` mangás ganha um capítulo
+        self._passo = round(1 / atualizados) if atualizados else 0
+        self.rodada = 0
+        self.requisicoes = 0
+        self.bytes = 0
+        # host -> método do layout, preenchido por `servir`
+        self._hosts = {}
+
+    def servir(self, nome: str, url: str) -> bool:
+        """Passa a responder pelo host de `url` com o layout do provedor `nome` (False se não há layout)."""
+        layout = self.LAYOUTS.get(nome)
+        if layout is None:
+            return False
+        self._hosts[urlsplit(url).hostname] = getattr(self, layout)
+        return True
+
+    @property
+    def total_paginas(self) -> int:
+        return max(1, -(-len(self._capitulos) // self.por_pagina))
+
+    def titulo(self, i: int) -> str:
+        return f"Mangá Sintético {i}"
+
+    def capitulos(self, i: int) -> int:
+        n = self._capitulos[i]
+        if self._passo and i % self._passo == 0:
+            n += self.rodada
+        return n
+
+    def _pagina(self, pagina: int) -> range | None:
+        if not 1 <= pagina <= self.total_paginas:
+            return None
+        inicio = (pagina - 1) * self.por_pagina
+        return range(inicio, min(inicio + self.por_pagina, len(self._capitulos)))
+
+    def _indice(self, slug: str) -> int | None:
+        if not slug.startswith("manga-") or not slug[6:].isdigit():
+            return None
+        i = int(slug[6:])
+        return i if i < len(self._capitulos) else None
+
+    def _madara(self, base: str, metodo: str, caminho: str, query: dict) -> tuple[int, str]:
+        partes = [p for p in caminho.split("/") if p]
+
+        # /manga/ e /manga/page/N/
+        if partes[:1] == ["manga"] and (len(partes) == 1 or (len(partes) == 3 and partes[1] == "page")):
+            mangas = self._pagina(int(partes[2]) if len(partes) == 3 and partes[2].isdigit() else 1)
+            if mangas is None:
+                return 404, "<html><body>Página não encontrada</body></html>"
+            itens = "".join(
+                f'<div class="page-item-detail"><div class="post-title font-title"><h3 class="h5">'
+                f'<a href="{base}/manga/manga-{i}/">{self.titulo(i)}</a></h3></div></div>'
+                for i in mangas
+            )
+            return 200, (
+                f'<html><body><div class="page-content-listing">{itens}</div>'
+                f'<div class="wp-pagenavi"><a class="last" href="{base}/manga/page/{self.total_paginas}/">Última</a>'
+                f"</div></body></html>"
+            )
+
+        # POST /manga/<slug>/ajax/chapters/
+        if metodo == "POST" and len(partes) == 4 and partes[0] == "manga" and partes[2:] == ["ajax", "chapters"]:
+            i = self._indice(partes[1])
+            if i is None:
+                return 404, ""
+            itens = "".join(
+                f'<li class="wp-manga-chapter"><a href="{base}/manga/manga-{i}/capitulo-{n}/">Capítulo {n}</a>'
+                f'<span class="chapter-release-date"><i>1 de janeiro de 2024</i></span></li>'
+                for n in range(self.capitulos(i), 0, -1)
+            )
+            return 200, f'<div class="listing-chapters_wrap"><ul class="main version-chap">{itens}</ul></div>'
+
+        return 404, ""
+
+    def _mangabr(self, base: str, metodo: str, caminho: str, query: dict) -> tuple[int, str]:
+        partes = [p for p in caminho.split("/") if p]
+
+        # /manga e /manga?page=N
+        if partes == ["manga"]:
+            pagina = query.get("page", ["1"])[0]
+            mangas = self._pagina(int(pagina) if pagina.isdigit() else 1)
+            if mangas is None:
+                return 200, '<html><body><div class="series"></div></body></html>'
+            itens = "".join(
+                f'<div class="series"><div class="d-flex justify-content-center">'
+                f'<a class="link-series" href="/manga/manga-{i}">{self.titulo(i)}</a></div></div>'
+                for i in mangas
+            )
+            paginacao = "".join(
+                f'<li class="page-item"><a class="page-link" href="{base}/manga?page={p}">{p}</a></li>'
+                for p in (1, 2, self.total_paginas)
+            )
+            return 200, f'<html><body>{itens}<ul class="pagination">{paginacao}</ul></body></html>'
+
+        # /manga/<slug>
+        if len(partes) == 2 and partes[0] == "manga":
+            i = self._indice(partes[1])
+            if i is None:
+                return 404, ""
+            itens = "".join(
+                f'<div class="col-chapter"><a href="/ler/manga-{i}/{n}">'
+                f"<h5>Capítulo {n} <small>01/01/2024</small></h5></a></div>"
+                for n in range(self.capitulos(i), 0, -1)
+            )
+            return 200, f'<html><body><div class="chapters">{itens}</div></body></html>'
+
+        return 404, ""
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+
+        if self.latencia:
+            await asyncio.sleep(self.latencia * random.uniform(0.5, 1.5))
+
+        headers = dict(scope["headers"])
+        host = headers.get(b"host", b"").decode().split(":")[0]
+        layout = self._hosts.get(host)
+        if layout is None:
+            status, corpo = 404, ""
+        else:
+            base = f"{scope['scheme']}://{host}"
+            query = parse_qs(scope.get("query_string", b"").decode())
+            status, corpo = layout(base, scope["method"], scope["path"], query)
+
+        dados = corpo.encode("utf-8")
+        self.requisicoes += 1
+        self.bytes += len(dados)
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"text/html; charset=utf-8"), (b"content-length", str(len(dados)).encode())],
+        })
+        await send({"type": "http.response.body", "body": dados})
+
+
+def _rss_pico_mb() -> float | None:
+    """Pico de memória residente do processo até agora, em MB."""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KB no Linux, bytes no macOS
+    return pico / (1024 * 1024 if os.uname().sysname == "Darwin" else 1024)
+
+
+async def executar_benchmark(
+    site: SiteFalso,
+    provedores: list[str] | None = None,
+    banco: str | None = None,
+    rodadas: int = 2,
+    concorrencia: int | None = None,
+    processos: int | None = None,
+) -> dict:
+    """
+    Sincroniza os `provedores` (padrão: todos que o site falso imita) contra
+    o `site` por `rodadas` rodadas e retorna {'config', 'rodadas': [...]},
+    com duração, mangás, capítulos e requisições (totais e por segundo),
+    MB servidos, pico de memória do processo até o fim da rodada (o
+    ru_maxrss não volta a zero: a partir da segunda rodada, é o maior pico até
+    ali) e as etapas mais demoradas de cada rodada.
+    `banco` é a URL do banco (padrão: um SQLite temporário, apagado no fim).
+    """
+    from app import crud
+
+    manifesto = registro.manifesto()
+    provedores = [
+        nome for nome in (provedores or list(manifesto))
+        if nome in manifesto and site.servir(nome, manifesto[nome]["url"])
+    ]
+    if not provedores:
+        raise ValueError(f"nenhum provedor com layout no site falso (disponíveis: {', '.join(SiteFalso.LAYOUTS)})")
+
+    temporario = None
+    if banco is None:
+        temporario = tempfile.mkdtemp(prefix="sync-mangas-bench-")
+        banco = "sqlite+aiosqlite:///" + os.path.join(temporario, "bench.db")
+    db.configurar(url=banco)
+
+    anteriores = BaseProvedor.pool, BaseProvedor.metricas, BaseProvedor.requisicoes_por_segundo
+    BaseProvedor.pool = PoolHTTP(transporte=httpx.ASGITransport(app=site))
+    # sem limite de ritmo: quem segura é a latência do site falso
+    BaseProvedor.requisicoes_por_segundo = 1e9
+
+    resultados = []
+    try:
+        async with db.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with db.async_session() as session:
+            existentes = await session.scalar(select(func.count(Manga.id)))
+        if existentes:
+            print(f"[warn] o banco já tem {existentes} mangás; a primeira rodada não parte do zero")
+        await crud.registrar_provedores()
+
+        for rodada in range(1, rodadas + 1):
+            site.rodada = rodada - 1
+            requisicoes, servidos = site.requisicoes, site.bytes
+            BaseProvedor.metricas = Metricas()
+            print(f"[*] Rodada {rodada}/{rodadas}: {', '.join(provedores)}")
+
+            inicio = time.perf_counter()
+            resumos = await crud.sincronizar_provedores(
+                provedores=provedores, concorrencia=concorrencia, processos=processos,
+            )
+            duracao = time.perf_counter() - inicio
+
+            mangas = sum(r["mangas"] for r in resumos)
+            capitulos = sum(r["capitulos"] for r in resumos)
+            requisicoes = site.requisicoes - requisicoes
+            resultados.append({
+                "rodada": rodada,
+                "duracao_s": round(duracao, 3),
+                "mangas": mangas,
+                "capitulos": capitulos,
+                "requisicoes": requisicoes,
+                "mangas_por_s": round(mangas / duracao, 1),
+                "capitulos_por_s": round(capitulos / duracao, 1),
+                "requisicoes_por_s": round(requisicoes / duracao, 1),
+                "mb_servidos": round((site.bytes - servidos) / 1024 / 1024, 2),
+                "rss_pico_processo_mb": _rss_pico_mb(),
+                "falhas": sum(r["falhas"] for r in resumos),
+                "erros": [r["erro"] for r in resumos if r["erro"]],
+                "etapas": BaseProvedor.metricas.relatorio()["etapas"][:8],
+            })
+    finally:
+        BaseProvedor.pool, BaseProvedor.metricas, BaseProvedor.requisicoes_por_segundo = anteriores
+        await db.fechar()
+        if temporario is not None:
+            shutil.rmtree(temporario, ignore_errors=True)
+
+    return {
+        "config": {
+            "provedores": provedores,
+            "banco": "sqlite temporário" if temporario else db.engine.url.render_as_string(hide_password=True),
+            "mangas": len(site._capitulos),
+            "capitulos_por_manga": round(sum(site._capitulos) / len(site._capitulos), 1),
+            "por_pagina": site.por_pagina,
+            "latencia_s": site.latencia,
+            "concorrencia": concorrencia,
+            "processos": processos,
+        },
+        "rodadas": resultados,
+    }
@@ -0,0 +1,189 @@
+"""
+Armazém de imagens endereçado por conteúdo.
+
+Cada página baixada é gravada uma única vez, com o nome do seu sha256, em
+<raiz>/ab/cd/abcd...; páginas idênticas (a mesma página vinda de provedores
+diferentes, páginas de créditos dos grupos de scan) ocupam um arquivo só.
+
+No banco, `paginas_capitulo` diz quais blobs formam cada capítulo e `blobs.refs`
+conta quantas páginas apontam para cada blob. Blobs sem referências são
+apagados por `coletar` (cli.py gc), respeitando um prazo de carência: um
+arquivo recém-gravado ou reaproveitado (mtime recente) nunca é apagado, pois
+pode pertencer a um capítulo que ainda está sendo baixado.
+"""
+import asyncio
+import hashlib
+import os
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+from sqlalchemy import select, update, delete
+
+from app.core import bulk
+from app.db import async_session
+from app.models import Blob, PaginaCapitulo
+
+
+class ArmazemBlobs:
+    def __init__(self, raiz: str | os.PathLike):
+        self.raiz = Path(raiz).expanduser()
+        self._tmp = self.raiz / "tmp"
+
+    def caminho(self, hash_: str) -> Path:
+        return self.raiz / hash_[:2] / hash_[2:4] / hash_
+
+    async def gravar(self, corpo) -> tuple[str, int]:
+        """
+        Grava o conteúdo de um iterador assíncrono de bytes, calculando o hash
+        enquanto escreve. Retorna (hash, tamanho).
+        """
+        # o disco é acessado em threads, para não travar o event loop dos outros downloads
+        await asyncio.to_thread(self._tmp.mkdir, parents=True, exist_ok=True)
+        fd, tmp = await asyncio.to_thread(tempfile.mkstemp, dir=self._tmp)
+        h = hashlib.sha256()
+        tamanho = 0
+        try:
+            f = os.fdopen(fd, "wb")
+            try:
+                async for chunk in corpo:
+                    h.update(chunk)
+                    await asyncio.to_thread(f.write, chunk)
+                    tamanho += len(chunk)
+            finally:
+                await asyncio.to_thread(f.close)
+
+            hash_ = h.hexdigest()
+            await asyncio.to_thread(self._guardar, tmp, self.caminho(hash_))
+        except BaseException:
+            await asyncio.to_thread(self._apagar, tmp)
+            raise
+
+        return hash_, tamanho
+
+    @staticmethod
+    def _guardar(tmp: str, final: Path):
+        if final.exists():
+            # já temos essa imagem; renova o mtime para o gc respeitar a carência
+            os.utime(final)
+            os.unlink(tmp)
+        else:
+            final.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp, final)
+
+    @staticmethod
+    def _apagar(tmp: str):
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+
+
+async def registrar_paginas(session, capitulo_id: int, paginas: list[tuple[int, str, int, str]]):
+    """
+    Define as páginas (indice, hash, tamanho, extensao) do capítulo, trocando as
+    anteriores se houver, e ajusta as referências dos blobs.
+    """
+    # solta as referências das páginas antigas (capítulo baixado de novo)
+    result = await session.execute(
+        delete(PaginaCapitulo)
+        .where(PaginaCapitulo.capitulo_id == capitulo_id)
+        .returning(PaginaCapitulo.blob_hash)
+    )
+    # sempre na ordem dos hashes, para workers simultâneos não travarem um ao outro
+    for hash_, n in sorted(Counter(result.scalars().all()).items()):
+        await session.execute(update(Blob).where(Blob.hash == hash_).values(refs=Blob.refs - n))
+
+    refs = Counter(hash_ for _, hash_, _, _ in paginas)
+    tamanhos = {hash_: tamanho for _, hash_, tamanho, _ in paginas}
+    linhas = [{"hash": h, "tamanho": tamanhos[h], "refs": n} for h, n in sorted(refs.items())]
+    for chunk in bulk._chunks(linhas):
+        stmt = bulk._insert(session, Blob).values(chunk)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Blob.hash],
+            set_={"refs": Blob.refs + stmt.excluded.refs},
+        )
+        await session.execute(stmt)
+
+    linhas = [
+        {"capitulo_id": capitulo_id, "indice": indice, "blob_hash": hash_, "extensao": extensao}
+        for indice, hash_, _, extensao in paginas
+    ]
+    for chunk in bulk._chunks(linhas):
+        await session.execute(bulk._insert(session, PaginaCapitulo).values(chunk))
+
+
+async def caminhos_do_capitulo(session, armazem: ArmazemBlobs, capitulo_id: int) -> list[tuple[Path, str]]:
+    """(arquivo no armazém, extensão) de cada página do capítulo, em ordem."""
+    result = await session.execute(
+        select(PaginaCapitulo.blob_hash, PaginaCapitulo.extensao)
+        .where(PaginaCapitulo.capitulo_id == capitulo_id)
+        .order_by(PaginaCapitulo.indice)
+    )
+    return [(armazem.caminho(hash_), extensao) for hash_, extensao in result.all()]
+
+
+async def coletar(session, armazem: ArmazemBlobs, carencia: float = 3600) -> dict:
+    """
+    Apaga os blobs sem referências e os arquivos do armazém que não constam no
+    banco (sobras de downloads interrompidos), exceto os modificados há menos
+    de `carencia` segundos. Retorna {'blobs', 'bytes'} removidos.
+    """
+    await session.execute(delete(Blob).where(Blob.refs <= 0))
+    await session.commit()
+
+    limite = time.time() - carencia
+    removidos = 0
+    liberados = 0
+
+    # temporários de gravações que não terminaram
+    if armazem._tmp.exists():
+        for arquivo in armazem._tmp.iterdir():
+            if arquivo.stat().st_mtime < limite:
+                arquivo.unlink(missing_ok=True)
+
+    # um diretório de primeiro nível (1/256 dos hashes) por vez, para não
+    # carregar todos os hashes do banco na memória
+    for shard in sorted(armazem.raiz.glob("[0-9a-f][0-9a-f]")):
+        result = await session.execute(
+            select(Blob.hash).where(Blob.hash >= shard.name, Blob.hash < shard.name + "g")
+        )
+        conhecidos = set(result.scalars().all())
+
+        for arquivo in shard.glob("*/*"):
+            if arquivo.name in conhecidos:
+                continue
+            stat = arquivo.stat()
+            if stat.st_mtime >= limite:
+                continue
+            arquivo.unlink(missing_ok=True)
+            removidos += 1
+            liberados += stat.st_size
+
+    return {"blobs": removidos, "bytes": liberados}
+
+
+class SaidaBlobs:
+    """
+    Saída do Downloader que grava as páginas no armazém de blobs
+    (<raiz>/blobs) e registra a composição do capítulo no banco.
+    """
+
+    def __init__(self, raiz: str | os.PathLike):
+        self.armazem = ArmazemBlobs(Path(raiz).expanduser() / "blobs")
+
+    async def iniciar_capitulo(self, manga: dict, capitulo: dict):
+        return {"capitulo": capitulo, "paginas": []}
+
+    async def gravar_pagina(self, ctx, indice: int, extensao: str, corpo) -> int:
+        hash_, tamanho = await self.armazem.gravar(corpo)
+        ctx["paginas"].append((indice, hash_, tamanho, extensao))
+        return tamanho
+
+    async def concluir_capitulo(self, ctx):
+        async with async_session() as session:
+            await registrar_paginas(session, ctx["capitulo"]["id"], sorted(ctx["paginas"]))
+            await session.commit()
+
+    async def descartar_capitulo(self, ctx):
+        # os blobs já gravados ficam sem referência e saem no próximo gc
+        pass
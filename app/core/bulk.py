@@ -0,0 +1,234 @@
+"""
+Escrita em lote usada pela sincronização.
+
+Em vez de um select + flush por mangá/capítulo, cada lote vira poucos comandos:
+upsert dos mangás por título, INSERT ... ON CONFLICT DO NOTHING dos capítulos
+(uq_capitulo_manga) e das ligações com o provedor (uq_capitulo_por_provedor).
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import select, update, tuple_, func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.models import Manga, Capitulo, CapituloProvedor, MarcaSync, ImpressaoCapitulos
+
+# linhas por INSERT; mantém os parâmetros bem abaixo do limite do asyncpg (32767)
+TAMANHO_CHUNK = 1000
+
+
+def _insert(session, model):
+    """INSERT com suporte a ON CONFLICT do dialeto em uso (PostgreSQL ou SQLite)."""
+    if session.bind.dialect.name == "sqlite":
+        return sqlite.insert(model)
+    return postgresql.insert(model)
+
+
+def _chunks(linhas: list, tamanho: int = TAMANHO_CHUNK):
+    for i in range(0, len(linhas), tamanho):
+        yield linhas[i:i + tamanho]
+
+
+async def upsert_mangas(session, titulos) -> dict[str, int]:
+    """
+    Garante que todos os títulos existem em `mangas`.
+    Retorna {titulo: id} para todos eles, novos ou não.
+    """
+    titulos = list(dict.fromkeys(titulos))
+    ids = {}
+
+    for chunk in _chunks(titulos):
+        stmt = _insert(session, Manga).values([{"titulo": t} for t in chunk])
+        # DO UPDATE "vazio" para que o RETURNING traga também as linhas já existentes
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Manga.titulo],
+            set_={"titulo": stmt.excluded.titulo},
+        ).returning(Manga.id, Manga.titulo)
+
+        result = await session.execute(stmt)
+        ids.update({titulo: id_ for id_, titulo in result.all()})
+
+    return ids
+
+
+async def inserir_capitulos(session, capitulos: list[dict]) -> tuple[dict, set]:
+    """
+    Insere capítulos ({'manga_id', 'numero', 'titulo'}) ignorando os que já existem.
+
+    Retorna ({(manga_id, numero): capitulo_id} de todos os capítulos pedidos,
+    conjunto das chaves que foram realmente inseridas).
+    """
+    por_chave = {}
+    for cap in capitulos:
+        por_chave.setdefault((cap["manga_id"], float(cap["numero"])), cap)
+
+    ids = {}
+    novos = set()
+
+    for chunk in _chunks(list(por_chave.values())):
+        stmt = _insert(session, Capitulo).values([
+            {"manga_id": c["manga_id"], "numero": c["numero"], "titulo": c.get("titulo"), "baixado": False}
+            for c in chunk
+        ])
+        stmt = stmt.on_conflict_do_nothing(
+            index_elements=[Capitulo.numero, Capitulo.manga_id]
+        ).returning(Capitulo.id, Capitulo.manga_id, Capitulo.numero)
+
+        result = await session.execute(stmt)
+        for id_, manga_id, numero in result.all():
+            chave = (manga_id, float(numero))
+            ids[chave] = id_
+            novos.add(chave)
+
+    # os que já existiam não voltam no RETURNING: busca os ids de uma vez
+    faltando = [chave for chave in por_chave if chave not in ids]
+    for chunk in _chunks(faltando):
+        result = await session.execute(
+            select(Capitulo.id, Capitulo.manga_id, Capitulo.numero).where(
+                tuple_(Capitulo.manga_id, Capitulo.numero).in_(chunk)
+            )
+        )
+        for id_, manga_id, numero in result.all():
+            ids[(manga_id, float(numero))] = id_
+
+    return ids, novos
+
+
+async def inserir_links(session, links: list[dict]) -> int:
+    """
+    Insere ligações capítulo ↔ provedor ({'capitulo_id', 'provedor_id', 'url'}),
+    ignorando as que já existem. Retorna quantas foram inseridas.
+    """
+    inseridos = 0
+
+    for chunk in _chunks(links):
+        stmt = _insert(session, CapituloProvedor).values(chunk)
+        stmt = stmt.on_conflict_do_nothing(
+            index_elements=[CapituloProvedor.capitulo_id, CapituloProvedor.provedor_id]
+        ).returning(CapituloProvedor.id)
+
+        result = await session.execute(stmt)
+        inseridos += len(result.all())
+
+    return inseridos
+
+
+async def carregar_marcas(session, provedor_id: int) -> dict[str, dict]:
+    """Retorna {url: marca} com todas as marcas de sincronização do provedor."""
+    result = await session.execute(
+        select(
+            MarcaSync.url, MarcaSync.hash, MarcaSync.etag, MarcaSync.last_modified,
+        ).where(MarcaSync.provedor_id == provedor_id)
+    )
+    return {
+        url: {"hash": hash_, "etag": etag, "last_modified": last_modified}
+        for url, hash_, etag, last_modified in result.all()
+    }
+
+
+async def upsert_marcas(session, provedor_id: int, marcas: dict[str, dict]):
+    """Grava as marcas {url: marca} do provedor, substituindo as anteriores."""
+    linhas = [{"provedor_id": provedor_id, "url": url, **marca} for url, marca in marcas.items()]
+
+    for chunk in _chunks(linhas):
+        stmt = _insert(session, MarcaSync).values(chunk)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[MarcaSync.provedor_id, MarcaSync.url],
+            set_={
+                "hash": stmt.excluded.hash,
+                "etag": stmt.excluded.etag,
+                "last_modified": stmt.excluded.last_modified,
+                "atualizado_em": func.now(),
+            },
+        )
+        await session.execute(stmt)
+
+
+async def carregar_impressoes(session, provedor_id: int) -> dict[int, str]:
+    """Retorna {manga_id: impressão} das listas de capítulos do provedor."""
+    result = await session.execute(
+        select(ImpressaoCapitulos.manga_id, ImpressaoCapitulos.impressao)
+        .where(ImpressaoCapitulos.provedor_id == provedor_id)
+    )
+    return dict(result.all())
+
+
+async def upsert_impressoes(session, provedor_id: int, impressoes: dict[int, tuple[str, int]]):
+    """Grava as impressões {manga_id: (impressão, nº de capítulos)} do provedor."""
+    linhas = [
+        {"manga_id": manga_id, "provedor_id": provedor_id, "impressao": impressao, "capitulos": n}
+        for manga_id, (impressao, n) in impressoes.items()
+    ]
+
+    for chunk in _chunks(linhas):
+        stmt = _insert(session, ImpressaoCapitulos).values(chunk)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ImpressaoCapitulos.manga_id, ImpressaoCapitulos.provedor_id],
+            set_={
+                "impressao": stmt.excluded.impressao,
+                "capitulos": stmt.excluded.capitulos,
+                "atualizado_em": func.now(),
+            },
+        )
+        await session.execute(stmt)
+
+
+async def carregar_links(session, provedor_id: int, manga_ids: list[int]) -> dict[int, dict]:
+    """
+    Ligações do provedor com os capítulos dos mangás pedidos, inclusive as
+    removidas: {manga_id: {numero: (link_id, url, removido)}}.
+    """
+    links = {}
+    for chunk in _chunks(list(manga_ids)):
+        result = await session.execute(
+            select(
+                Capitulo.manga_id, Capitulo.numero, CapituloProvedor.id,
+                CapituloProvedor.url, CapituloProvedor.removido_em,
+            )
+            .join(CapituloProvedor, CapituloProvedor.capitulo_id == Capitulo.id)
+            .where(CapituloProvedor.provedor_id == provedor_id, Capitulo.manga_id.in_(chunk))
+        )
+        for manga_id, numero, link_id, url, removido_em in result.all():
+            links.setdefault(manga_id, {})[float(numero)] = (link_id, url, removido_em is not None)
+    return links
+
+
+async def atualizar_links(
+    session,
+    removidos: list[int],
+    reaparecidos: list[int],
+    urls_alteradas: list[tuple[int, str, str]],
+) -> int:
+    """
+    Marca as ligações que sumiram da lista do provedor, desmarca as que
+    voltaram e troca as URLs alteradas (guardando a anterior). Uma ligação
+    que volta com outra URL está só em `urls_alteradas`. Retorna quantas
+    ligações foram atualizadas.
+    """
+    agora = datetime.now(timezone.utc)
+
+    for chunk in _chunks(removidos):
+        await session.execute(
+            update(CapituloProvedor).where(CapituloProvedor.id.in_(chunk))
+            .values(removido_em=agora, alterado_em=agora)
+        )
+    for chunk in _chunks(reaparecidos):
+        await session.execute(
+            update(CapituloProvedor).where(CapituloProvedor.id.in_(chunk))
+            .values(removido_em=None, alterado_em=agora)
+        )
+    # UPDATE em massa pela chave primária, um comando por chunk
+    for chunk in _chunks(urls_alteradas):
+        await session.execute(update(CapituloProvedor), [
+            {"id": link_id, "url": url, "url_anterior": url_antiga, "removido_em": None, "alterado_em": agora}
+            for link_id, url_antiga, url in chunk
+        ])
+
+    return len(removidos) + len(reaparecidos) + len(urls_alteradas)
+
+
+async def marcar_baixados(session, capitulo_ids: list[int]):
+    """Marca os capítulos como baixados."""
+    for chunk in _chunks(list(capitulo_ids)):
+        await session.execute(
+            update(Capitulo).where(Capitulo.id.in_(chunk)).values(baixado=True)
+        )
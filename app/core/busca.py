@@ -0,0 +1,230 @@
+"""
+Busca de mangás por título.
+
+No PostgreSQL usa a coluna `mangas.busca` (tsvector) e o índice de trigramas
+criados pela migração e08c5a1f93d4: casa palavras por prefixo, trechos do título
+(ILIKE, servido pelo índice pg_trgm) e palavras parecidas (word_similarity,
+tolera erros de digitação), tudo sem acento e sem diferenciar
+maiúsculas. O resultado vem ordenado por relevância.
+
+Em outros bancos (ex.: SQLite em desenvolvimento) ou sem a migração, um índice
+de trigramas em memória (`IndiceTrigramas`) faz o mesmo papel.
+"""
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+from sqlalchemy import select, text, func
+
+from app.models import Manga
+
+# similaridade mínima (0 a 1) entre a busca e um trecho do título para ele
+# entrar no resultado (mesmo padrão do pg_trgm.word_similarity_threshold)
+SIMILARIDADE_MINIMA = 0.6
+
+# mesma expressão do índice de trigramas da migração; tem que bater exatamente
+_EXPR_TITULO = "f_unaccent(lower(m.titulo || ' ' || coalesce(m.alter_title, '')))"
+
+_SQL_BUSCA = text(f"""
+    SELECT m.id, m.titulo, m.alter_title, m.autor, m.descricao
+    FROM mangas m
+    WHERE m.busca @@ to_tsquery('simple', :tsquery)
+       OR {_EXPR_TITULO} ILIKE :padrao
+       OR f_unaccent(lower(CAST(:termo AS text))) <% {_EXPR_TITULO}
+    ORDER BY
+        ts_rank(m.busca, to_tsquery('simple', :tsquery))
+        + word_similarity(f_unaccent(lower(CAST(:termo AS text))), {_EXPR_TITULO})
+        + similarity(f_unaccent(lower(CAST(:termo AS text))), {_EXPR_TITULO}) DESC,
+        m.id
+    LIMIT :limite OFFSET :offset
+""")
+
+_disponivel: bool | None = None
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas, sem acentos e com espaços simples (equivale a f_unaccent(lower(...)))."""
+    texto = unicodedata.normalize("NFKD", texto or "")
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(texto.lower().split())
+
+
+def _palavras(texto: str) -> list[str]:
+    return re.findall(r"\w+", normalizar(texto))
+
+
+def trigramas(texto: str) -> set[str]:
+    """Trigramas no estilo do pg_trgm: cada palavra com dois espaços antes e um depois."""
+    grams = set()
+    for palavra in _palavras(texto):
+        p = f"  {palavra} "
+        grams.update(p[i:i + 3] for i in range(len(p) - 2))
+    return grams
+
+
+async def indice_postgres_disponivel(session) -> bool:
+    """O banco é PostgreSQL com a migração da busca aplicada? (consultado uma vez)"""
+    global _disponivel
+    if _disponivel is None:
+        if session.bind.dialect.name != "postgresql":
+            _disponivel = False
+        else:
+            _disponivel = bool(await session.scalar(text(
+                "SELECT 1 FROM pg_attribute "
+                "WHERE attrelid = 'mangas'::regclass AND attname = 'busca' AND NOT attisdropped"
+            )))
+            if not _disponivel:
+                print("[warn] índice de busca não encontrado (rode `alembic upgrade head`); usando índice em memória")
+    return _disponivel
+
+
+async def buscar_postgres(session, termo: str, limite: int | None, offset: int) -> list[dict]:
+    palavras = _palavras(termo)
+    if not palavras:
+        return []
+
+    escapado = normalizar(termo).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    result = await session.execute(_SQL_BUSCA, {
+        "tsquery": " & ".join(f"{p}:*" for p in palavras),
+        "padrao": f"%{escapado}%",
+        "termo": termo,
+        "limite": limite,
+        "offset": offset,
+    })
+    return [dict(row._mapping) for row in result]
+
+
+class IndiceTrigramas:
+    """Índice invertido de trigramas dos títulos, em memória."""
+
+    def __init__(self):
+        self._titulos: dict[int, str] = {}
+        self._grams: dict[int, int] = {}
+        self._postings: dict[str, list[int]] = defaultdict(list)
+
+    def adicionar(self, manga_id: int, *titulos: str | None):
+        texto = " ".join(t for t in titulos if t)
+        grams = trigramas(texto)
+        self._titulos[manga_id] = normalizar(texto)
+        self._grams[manga_id] = len(grams)
+        for g in grams:
+            self._postings[g].append(manga_id)
+
+    def __len__(self):
+        return len(self._titulos)
+
+    def buscar(self, termo: str) -> list[int]:
+        """Ids dos mangás que casam com `termo`, do mais para o menos relevante."""
+        termo_norm = normalizar(termo)
+        palavras = _palavras(termo)
+        grams = trigramas(termo)
+        if not grams:
+            return []
+
+        comuns = Counter()
+        for g in grams:
+            comuns.update(self._postings.get(g, ()))
+
+        # só quem tem os trigramas do começo de todas as palavras pode casar por prefixo
+        inicios = {f"  {p} "[i:i + 3] for p in palavras for i in range(len(p))}
+        candidatos_prefixo = set(comuns)
+        for g in sorted(inicios, key=lambda g: len(self._postings.get(g, ()))):
+            candidatos_prefixo.intersection_update(self._postings.get(g, ()))
+        prefixos = re.compile("".join(rf"(?=.*\b{re.escape(p)})" for p in palavras))
+
+        resultado = []
+        for manga_id, n in comuns.items():
+            # fração dos trigramas da busca presentes no título (aproxima a
+            # word_similarity do pg_trgm) e similaridade do título inteiro, que
+            # desempata a favor de títulos mais próximos do que foi digitado
+            parecido = n / len(grams)
+            similaridade = n / (len(grams) + self._grams[manga_id] - n)
+            titulo = self._titulos[manga_id]
+            contem = termo_norm in titulo
+            prefixo = manga_id in candidatos_prefixo and prefixos.match(titulo) is not None
+            if contem or prefixo or parecido >= SIMILARIDADE_MINIMA:
+                resultado.append((parecido + similaridade + contem + prefixo, manga_id))
+
+        resultado.sort(key=lambda r: (-r[0], r[1]))
+        return [manga_id for _, manga_id in resultado]
+
+
+_indice: IndiceTrigramas | None = None
+_assinatura = None
+
+
+def invalidar_indice():
+    """Descarta o índice em memória; chamar ao alterar títulos de mangás que já existem."""
+    global _indice, _assinatura
+    _indice = None
+    _assinatura = None
+
+
+async def _ids_locais(session, termo: str) -> list[int]:
+    """
+    Ids dos mangás que casam com `termo` no índice em memória, por relevância.
+    O índice é reconstruído quando a tabela de mangás muda (mangás novos ou
+    apagados, títulos alternativos preenchidos) ou quando `invalidar_indice`
+    é chamada.
+    """
+    global _indice, _assinatura
+
+    assinatura = (await session.execute(
+        select(func.count(Manga.id), func.max(Manga.id), func.count(Manga.alter_title))
+    )).one()
+    if _indice is None or assinatura != _assinatura:
+        _indice = IndiceTrigramas()
+        result = await session.stream(select(Manga.id, Manga.titulo, Manga.alter_title))
+        async for manga_id, titulo, alter_title in result:
+            _indice.adicionar(manga_id, titulo, alter_title)
+        _assinatura = assinatura
+
+    return _indice.buscar(termo)
+
+
+async def _carregar_mangas(session, ids: list[int]) -> list[dict]:
+    """Os mangás `ids`, na mesma ordem."""
+    if not ids:
+        return []
+    result = await session.execute(
+        select(Manga.id, Manga.titulo, Manga.alter_title, Manga.autor, Manga.descricao)
+        .where(Manga.id.in_(ids))
+    )
+    por_id = {row.id: dict(row._mapping) for row in result}
+    return [por_id[i] for i in ids if i in por_id]
+
+
+async def buscar_local(session, termo: str, limite: int | None, offset: int) -> list[dict]:
+    """Busca pelo índice em memória."""
+    ids = await _ids_locais(session, termo)
+    ids = ids[offset:offset + limite] if limite is not None else ids[offset:]
+    return await _carregar_mangas(session, ids)
+
+
+async def buscar(session, termo: str, limite: int | None = 50, offset: int = 0) -> list[dict]:
+    """Mangás que casam com `termo`, por relevância: [{'id', 'titulo', 'alter_title', 'autor', 'descricao'}]."""
+    if await indice_postgres_disponivel(session):
+        return await buscar_postgres(session, termo, limite, offset)
+    return await buscar_local(session, termo, limite, offset)
+
+
+async def iter_buscar(session, termo: str, tamanho_pagina: int = 50):
+    """
+    Todos os resultados de `termo`, por relevância, buscados em páginas de
+    `tamanho_pagina`. No índice em memória a pontuação é feita uma vez e as
+    páginas são fatias do resultado.
+    """
+    if await indice_postgres_disponivel(session):
+        offset = 0
+        while True:
+            pagina = await buscar_postgres(session, termo, tamanho_pagina, offset)
+            for r in pagina:
+                yield r
+            if len(pagina) < tamanho_pagina:
+                return
+            offset += tamanho_pagina
+
+    ids = await _ids_locais(session, termo)
+    for i in range(0, len(ids), tamanho_pagina):
+        for r in await _carregar_mangas(session, ids[i:i + tamanho_pagina]):
+            yield r
@@ -0,0 +1,230 @@
+"""
+Cache em disco das respostas HTTP dos provedores.
+
+Funciona como um transporte do httpx, então qualquer AsyncClient pode usá-lo:
+
+    cache = CacheHTTP("~/.cache/sync-mangas", ttl=3600)
+    client = AsyncClient(transport=cache.transporte())
+
+- chave: método + URL + corpo da requisição
+- respostas dentro do TTL são servidas direto do disco
+- respostas vencidas são revalidadas com If-None-Match / If-Modified-Since
+- o diretório é limitado por tamanho, descartando as menos usadas (LRU)
+- `offline=True` nunca acessa a rede (útil contra fixtures gravadas); faltas viram 504
+"""
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+import httpx
+
+# cabeçalhos que deixam de valer porque o corpo é gravado já decodificado
+_HEADERS_DESCARTADOS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+class CacheHTTP:
+    def __init__(
+        self,
+        diretorio: str | os.PathLike,
+        ttl: float = 3600,
+        tamanho_max: int = 512 * 1024 * 1024,
+        offline: bool = False,
+    ):
+        self.diretorio = Path(diretorio).expanduser()
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.tamanho_max = tamanho_max
+        self.offline = offline
+        # chave -> [tamanho em bytes, último acesso]
+        self._indice: dict[str, list] | None = None
+        # soma dos tamanhos do índice, mantida por gravar/remover
+        self._total = 0
+
+    def transporte(self, base: httpx.AsyncBaseTransport | None = None) -> "TransporteCache":
+        return TransporteCache(self, base)
+
+    def chave(self, request: httpx.Request) -> str:
+        h = hashlib.sha256()
+        h.update(request.method.encode())
+        h.update(b"\n")
+        h.update(str(request.url).encode())
+        h.update(b"\n")
+        h.update(request.content)
+        return h.hexdigest()
+
+    def _caminhos(self, chave: str) -> tuple[Path, Path]:
+        pasta = self.diretorio / chave[:2]
+        return pasta / f"{chave}.json", pasta / f"{chave}.body"
+
+    def _carregar_indice(self) -> dict[str, list]:
+        if self._indice is None:
+            self._indice = {}
+            for meta in self.diretorio.glob("*/*.json"):
+                corpo = meta.with_suffix(".body")
+                try:
+                    st = corpo.stat()
+                    self._indice[meta.stem] = [st.st_size + meta.stat().st_size, st.st_mtime]
+                except FileNotFoundError:
+                    continue
+            self._total = sum(tamanho for tamanho, _ in self._indice.values())
+        return self._indice
+
+    def ler(self, chave: str) -> tuple[dict, bytes] | None:
+        meta_path, corpo_path = self._caminhos(chave)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            corpo = corpo_path.read_bytes()
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        # marca o acesso para o LRU
+        agora = time.time()
+        os.utime(corpo_path, (agora, agora))
+        indice = self._carregar_indice()
+        if chave in indice:
+            indice[chave][1] = agora
+        return meta, corpo
+
+    def fresco(self, meta: dict) -> bool:
+        return time.time() - meta["armazenado_em"] < self.ttl
+
+    def gravar(self, chave: str, request: httpx.Request, response: httpx.Response, corpo: bytes):
+        meta = {
+            "metodo": request.method,
+            "url": str(request.url),
+            "status": response.status_code,
+            "headers": [
+                (k, v) for k, v in response.headers.multi_items()
+                if k.lower() not in _HEADERS_DESCARTADOS
+            ],
+            "armazenado_em": time.time(),
+        }
+        meta_path, corpo_path = self._caminhos(chave)
+        meta_path.parent.mkdir(exist_ok=True)
+
+        # grava em arquivo temporário e renomeia, para nunca deixar entrada pela metade
+        for path, dados in ((corpo_path, corpo), (meta_path, json.dumps(meta).encode("utf-8"))):
+            tmp = path.with_suffix(path.suffix + ".tmp")
+            tmp.write_bytes(dados)
+            os.replace(tmp, path)
+
+        indice = self._carregar_indice()
+        tamanho = len(corpo) + meta_path.stat().st_size
+        anterior = indice.get(chave)
+        self._total += tamanho - (anterior[0] if anterior else 0)
+        indice[chave] = [tamanho, time.time()]
+        self._evictar()
+
+    def renovar(self, chave: str, meta: dict):
+        """Conteúdo revalidado (304): reinicia o TTL da entrada."""
+        meta["armazenado_em"] = time.time()
+        meta_path, _ = self._caminhos(chave)
+        tmp = meta_path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp, meta_path)
+
+    def remover(self, chave: str):
+        for path in self._caminhos(chave):
+            path.unlink(missing_ok=True)
+        entrada = self._carregar_indice().pop(chave, None)
+        if entrada is not None:
+            self._total -= entrada[0]
+
+    def _evictar(self):
+        # o índice só é percorrido quando o total passa do limite
+        indice = self._carregar_indice()
+        if self._total <= self.tamanho_max:
+            return
+
+        # remove as menos usadas até sobrar folga de 10%
+        alvo = self.tamanho_max * 0.9
+        for chave, _ in sorted(indice.items(), key=lambda item: item[1][1]):
+            if self._total <= alvo:
+                break
+            self.remover(chave)
+
+    def resposta(self, request: httpx.Request, meta: dict, corpo: bytes) -> httpx.Response:
+        return httpx.Response(
+            meta["status"],
+            headers=meta["headers"],
+            content=corpo,
+            request=request,
+        )
+
+
+class TransporteCache(httpx.AsyncBaseTransport):
+    """
+    Transporte httpx que consulta o CacheHTTP antes de ir à rede.
+
+    Requisições com `extensions={"cache": False}` passam direto (ex.: download
+    de imagens). Requisições que já trazem If-None-Match/If-Modified-Since do
+    chamador também vão à rede, e o 304 é devolvido como veio.
+    """
+
+    def __init__(self, cache: CacheHTTP, base: httpx.AsyncBaseTransport | None = None):
+        self.cache = cache
+        self.base = base or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.extensions.get("cache") is False:
+            return await self.base.handle_async_request(request)
+
+        await request.aread()
+        chave = self.cache.chave(request)
+        entrada = self.cache.ler(chave)
+        condicional_do_chamador = (
+            "if-none-match" in request.headers or "if-modified-since" in request.headers
+        )
+
+        if entrada:
+            meta, corpo = entrada
+            if self.cache.offline or (not condicional_do_chamador and self.cache.fresco(meta)):
+                return self.cache.resposta(request, meta, corpo)
+
+        if self.cache.offline:
+            return httpx.Response(504, request=request, text="fora do cache (modo offline)")
+
+        revalidando = entrada is not None and not condicional_do_chamador
+        if revalidando:
+            meta, _ = entrada
+            validadores = {k.lower(): v for k, v in meta["headers"]}
+            if "etag" in validadores:
+                request.headers["If-None-Match"] = validadores["etag"]
+            if "last-modified" in validadores:
+                request.headers["If-Modified-Since"] = validadores["last-modified"]
+
+        response = await self.base.handle_async_request(request)
+
+        if response.status_code == 304 and revalidando:
+            meta, corpo = entrada
+            await response.aclose()
+            self.cache.renovar(chave, meta)
+            return self.cache.resposta(request, meta, corpo)
+
+        if response.status_code != 200 or not _armazenavel(response):
+            return response
+
+        corpo = await response.aread()
+        await response.aclose()
+        self.cache.gravar(chave, request, response, corpo)
+        return httpx.Response(
+            response.status_code,
+            headers=[
+                (k, v) for k, v in response.headers.multi_items()
+                if k.lower() not in _HEADERS_DESCARTADOS
+            ],
+            content=corpo,
+            request=request,
+            extensions=response.extensions,
+        )
+
+    async def aclose(self):
+        await self.base.aclose()
+
+
+def _armazenavel(response: httpx.Response) -> bool:
+    """Só guarda texto (HTML, JSON, XML); imagens e binários passam direto."""
+    tipo = response.headers.get("content-type", "text/html").split(";")[0].strip().lower()
+    return tipo.startswith("text/") or tipo.endswith(("json", "xml"))
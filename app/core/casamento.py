@@ -0,0 +1,274 @@
+"""
+Casamento de títulos entre provedores.
+
+Cada provedor escreve o mesmo mangá de um jeito ("Blue Lock", "Blue Lock (Pt-BR)",
+"Blue Lock - Colorido", com ou sem acento). A `chave_titulo` normaliza essas
+variações; títulos com a mesma chave são o mesmo mangá.
+
+Para o que a chave não resolve, o CasadorTitulos mantém em memória as chaves de
+todos os títulos (titulo e alter_title) com um índice de trigramas. Os
+candidatos de um título vêm só dos seus trigramas mais raros (filtro de
+prefixo: se a similaridade de Jaccard tem que ser ≥ t, basta olhar
+|q| - ⌈t·|q|⌉ + 1 trigramas de q para achar todos os pares possíveis), então
+casar uma listagem inteira ou procurar duplicados no catálogo não compara
+cada título com todos os outros.
+"""
+import math
+import re
+import sys
+from collections import defaultdict
+
+from sqlalchemy import select, update, delete
+
+from app.core import blobs, bulk
+from app.core.busca import invalidar_indice, normalizar, trigramas
+from app.models import Manga, Capitulo, CapituloProvedor, ImpressaoCapitulos, JobDownload, TituloAlternativo
+
+# similaridade a partir da qual um par aparece em `duplicados` para revisão
+LIMIAR_SUGESTAO = 0.7
+# similaridade a partir da qual a sincronização junta sem perguntar (além da
+# chave igual), desde que os números no título também batam
+LIMIAR_AUTOMATICO = 0.92
+
+# marcações de idioma/formato que os provedores penduram no título
+_MARCACOES = {
+    "pt", "br", "ptbr", "pt-br", "portugues", "legendado", "dublado",
+    "en", "eng", "english", "es", "raw", "colorido", "colored", "color",
+    "full", "oficial", "official", "scan", "hq", "manga", "manhwa", "manhua", "webtoon",
+}
+
+
+def _so_marcacoes(trecho: str) -> bool:
+    palavras = re.findall(r"[\w-]+", normalizar(trecho))
+    return bool(palavras) and all(p in _MARCACOES for p in palavras)
+
+
+def chave_titulo(titulo: str) -> str:
+    """
+    Forma canônica do título: sem acentos, minúsculas, sem pontuação e sem
+    marcações de idioma/formato como "(Pt-BR)", "[Colorido]" ou "- Manhwa".
+    """
+    texto = titulo or ""
+    # trechos entre parênteses/colchetes: some se for só marcação, senão fica o conteúdo
+    texto = re.sub(
+        r"[\(\[\{]([^\)\]\}]*)[\)\]\}]",
+        lambda m: " " if _so_marcacoes(m.group(1)) else f" {m.group(1)} ",
+        texto,
+    )
+    # sufixo "- Pt-BR", "| Colorido"
+    partes = re.split(r"\s[-–|:]\s", texto)
+    while len(partes) > 1 and _so_marcacoes(partes[-1]):
+        partes.pop()
+    texto = " ".join(partes)
+
+    return " ".join(re.findall(r"\w+", normalizar(texto)))
+
+
+def _numeros(chave: str) -> list[str]:
+    return re.findall(r"\d+", chave)
+
+
+class CasadorTitulos:
+    def __init__(self):
+        self._por_chave: dict[str, int] = {}
+        self._chaves: dict[int, list[str]] = defaultdict(list)
+        # mangás diferentes cujos títulos já têm a mesma chave
+        self._mesma_chave: set[tuple[int, int]] = set()
+        # cada chave indexada: (manga_id, chave, trigramas)
+        self._entradas: list[tuple[int, str, tuple[str, ...]]] = []
+        self._postings: dict[str, list[int]] = defaultdict(list)
+
+    @classmethod
+    async def carregar(cls, session) -> "CasadorTitulos":
+        """Monta o casador com todos os mangás do banco e os títulos dos que foram mesclados (em streaming)."""
+        casador = cls()
+        result = await session.stream(select(Manga.id, Manga.titulo, Manga.alter_title))
+        async for manga_id, titulo, alter_title in result:
+            casador.adicionar(manga_id, titulo, alter_title)
+        result = await session.stream(select(TituloAlternativo.manga_id, TituloAlternativo.titulo))
+        async for manga_id, titulo in result:
+            casador.adicionar(manga_id, titulo)
+        return casador
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def adicionar(self, manga_id: int, *titulos: str | None):
+        for titulo in titulos:
+            if not titulo:
+                continue
+            chave = chave_titulo(titulo)
+            if not chave:
+                continue
+            if chave in self._por_chave:
+                outro = self._por_chave[chave]
+                if outro != manga_id:
+                    self._mesma_chave.add((min(manga_id, outro), max(manga_id, outro)))
+                continue
+
+            self._por_chave[chave] = manga_id
+            self._chaves[manga_id].append(chave)
+            entrada = len(self._entradas)
+            # trigramas internados: o índice guarda uma cópia de cada, não uma por título
+            grams = tuple(sorted(sys.intern(g) for g in trigramas(chave)))
+            self._entradas.append((manga_id, chave, grams))
+            for g in grams:
+                self._postings[g].append(entrada)
+
+    def mesclar(self, manter_id: int, remover_id: int):
+        """Passa os títulos de `remover_id` para `manter_id`, como `mesclar_mangas` fez no banco."""
+        for chave in self._chaves.pop(remover_id, []):
+            self._por_chave[chave] = manter_id
+            self._chaves[manter_id].append(chave)
+        for i, (manga_id, chave, grams) in enumerate(self._entradas):
+            if manga_id == remover_id:
+                self._entradas[i] = (manter_id, chave, grams)
+        self._mesma_chave = {par for par in self._mesma_chave if remover_id not in par}
+
+    def _parecidos(self, chave: str, limiar: float) -> list[tuple[int, float]]:
+        grams = trigramas(chave)
+        if not grams:
+            return []
+
+        # só os trigramas mais raros precisam ser consultados (filtro de prefixo)
+        necessarios = len(grams) - math.ceil(limiar * len(grams)) + 1
+        raros = sorted(grams, key=lambda g: len(self._postings.get(g, ())))[:necessarios]
+        entradas = set().union(*(self._postings.get(g, ()) for g in raros))
+
+        # Jaccard ≥ t só é possível se o outro tiver entre t·|q| e |q|/t trigramas
+        menor, maior = limiar * len(grams), len(grams) / limiar
+        melhores: dict[int, float] = {}
+        for entrada in entradas:
+            manga_id, _, grams_outro = self._entradas[entrada]
+            if not menor <= len(grams_outro) <= maior:
+                continue
+            comuns = len(grams.intersection(grams_outro))
+            similaridade = comuns / (len(grams) + len(grams_outro) - comuns)
+            if similaridade >= limiar and similaridade > melhores.get(manga_id, 0):
+                melhores[manga_id] = similaridade
+
+        return sorted(melhores.items(), key=lambda c: (-c[1], c[0]))
+
+    def casar(self, titulo: str) -> int | None:
+        """Id do mangá que é certamente o mesmo `titulo`, ou None."""
+        chave = chave_titulo(titulo)
+        if chave in self._por_chave:
+            return self._por_chave[chave]
+
+        for manga_id, _ in self._parecidos(chave, LIMIAR_AUTOMATICO):
+            # "Título 2" não é "Título": os números precisam bater
+            if any(_numeros(c) == _numeros(chave) for c in self._chaves[manga_id]):
+                return manga_id
+        return None
+
+    def casar_lote(self, titulos) -> dict[str, int | None]:
+        """{titulo: manga_id ou None} para uma listagem inteira."""
+        return {titulo: self.casar(titulo) for titulo in dict.fromkeys(titulos)}
+
+    def duplicados(self, limiar: float = LIMIAR_SUGESTAO) -> list[tuple[int, int, float]]:
+        """
+        Pares (manga_id, outro_id, similaridade) de mangás diferentes com títulos
+        parecidos, em uma passada: cada chave só é comparada com as anteriores
+        (em ordem de tamanho) que têm em comum algum trigrama do seu prefixo,
+        numa ordem global do trigrama mais raro para o mais comum.
+        """
+        frequencia = {g: len(p) for g, p in self._postings.items()}
+        por_prefixo: dict[str, list[int]] = defaultdict(list)
+        pares = dict.fromkeys(self._mesma_chave, 1.0)
+
+        for entrada in sorted(range(len(self._entradas)), key=lambda e: len(self._entradas[e][2])):
+            manga_id, _, grams = self._entradas[entrada]
+            n = len(grams)
+            if not n:
+                continue
+            prefixo = sorted(grams, key=lambda g: (frequencia[g], g))[:n - math.ceil(limiar * n) + 1]
+            candidatos = set().union(*(por_prefixo[g] for g in prefixo))
+            for g in prefixo:
+                por_prefixo[g].append(entrada)
+
+            conjunto = set(grams)
+            for candidato in candidatos:
+                outro, _, grams_outro = self._entradas[candidato]
+                # os anteriores nunca são maiores; Jaccard ≥ t exige |outro| ≥ t·|este|
+                if outro == manga_id or len(grams_outro) < limiar * n:
+                    continue
+                comuns = len(conjunto.intersection(grams_outro))
+                similaridade = comuns / (n + len(grams_outro) - comuns)
+                if similaridade >= limiar:
+                    par = (min(manga_id, outro), max(manga_id, outro))
+                    pares[par] = max(pares.get(par, 0), similaridade)
+
+        return sorted(((a, b, s) for (a, b), s in pares.items()), key=lambda p: (-p[2], p[0], p[1]))
+
+
+async def mesclar_mangas(session, manter_id: int, remover_id: int):
+    """
+    Junta o mangá `remover_id` em `manter_id` e o apaga: capítulos que só existem
+    no removido passam para o mantido; nos repetidos, as ligações com os provedores
+    passam para o capítulo do mantido. Não faz commit.
+    """
+    manter = await session.get(Manga, manter_id)
+    remover = await session.get(Manga, remover_id)
+    if manter is None or remover is None or manter_id == remover_id:
+        raise ValueError("informe dois mangás diferentes e existentes")
+
+    result = await session.execute(select(Capitulo.numero, Capitulo.id).where(Capitulo.manga_id == manter_id))
+    do_mantido = {float(numero): id_ for numero, id_ in result.all()}
+    result = await session.execute(select(Capitulo.numero, Capitulo.id).where(Capitulo.manga_id == remover_id))
+    do_removido = {float(numero): id_ for numero, id_ in result.all()}
+
+    movidos = [id_ for numero, id_ in do_removido.items() if numero not in do_mantido]
+    if movidos:
+        await session.execute(update(Capitulo).where(Capitulo.id.in_(movidos)).values(manga_id=manter_id))
+
+    repetidos = {id_: do_mantido[numero] for numero, id_ in do_removido.items() if numero in do_mantido}
+    for repetido, destino in repetidos.items():
+        result = await session.execute(
+            select(CapituloProvedor.provedor_id).where(CapituloProvedor.capitulo_id == destino)
+        )
+        ja_ligados = set(result.scalars().all())
+        await session.execute(
+            update(CapituloProvedor)
+            .where(
+                CapituloProvedor.capitulo_id == repetido,
+                CapituloProvedor.provedor_id.not_in(ja_ligados),
+            )
+            .values(capitulo_id=destino)
+        )
+
+    if repetidos:
+        ids = list(repetidos)
+        # o que ainda aponta para os capítulos repetidos sai junto com eles
+        for repetido in ids:
+            await blobs.registrar_paginas(session, repetido, [])
+        await session.execute(delete(JobDownload).where(JobDownload.capitulo_id.in_(ids)))
+        await session.execute(delete(CapituloProvedor).where(CapituloProvedor.capitulo_id.in_(ids)))
+        await session.execute(delete(Capitulo).where(Capitulo.id.in_(ids)))
+
+    # as listas dos dois mudaram: os próximos syncs comparam de novo
+    await session.execute(
+        delete(ImpressaoCapitulos).where(ImpressaoCapitulos.manga_id.in_((manter_id, remover_id)))
+    )
+
+    # os títulos do removido (e os que ele já tinha herdado) ficam como
+    # alternativos do mantido: a grafia do provedor continua casando com ele
+    await session.execute(
+        update(TituloAlternativo).where(TituloAlternativo.manga_id == remover_id).values(manga_id=manter_id)
+    )
+    titulos = {t for t in (remover.titulo, remover.alter_title) if t} - {manter.titulo, manter.alter_title}
+    if titulos:
+        stmt = bulk._insert(session, TituloAlternativo).values(
+            [{"manga_id": manter_id, "titulo": t} for t in titulos]
+        )
+        await session.execute(stmt.on_conflict_do_nothing(index_elements=[TituloAlternativo.titulo]))
+
+    # o título do removido vira título alternativo e completa o que faltar
+    manter.alter_title = manter.alter_title or remover.titulo
+    manter.autor = manter.autor or remover.autor
+    manter.descricao = manter.descricao or remover.descricao
+    await session.delete(remover)
+    await session.flush()
+    # a busca local indexou os títulos antigos
+    invalidar_indice()
+
+    return {"movidos": len(movidos), "repetidos": len(repetidos)}
@@ -0,0 +1,71 @@
+"""
+Diferença entre a lista de capítulos que um provedor mostra agora e a que
+ele mostrava na última sincronização.
+
+A impressão de uma lista é um hash dos pares (número, URL) em ordem de
+número: se a impressão do mangá é igual à guardada em `impressoes_capitulos`
+nada mudou, e o mangá custa só essa comparação. Quando muda, `comparar`
+separa o que é novo, o que sumiu, o que voltou e o que trocou de URL,
+contra as ligações (CapituloProvedor) que o provedor já tem.
+"""
+import hashlib
+
+# impressão guardada para um mangá que nunca deve ser pulado (nenhum hash é vazio)
+SEMPRE_COMPARAR = ""
+
+
+def impressao(urls: dict[float, str]) -> str:
+    """Hash (hex) da lista {numero: url}; não depende da ordem em que o provedor lista os capítulos."""
+    texto = "\n".join(f"{numero!r}\t{url}" for numero, url in sorted(urls.items()))
+    return hashlib.blake2b(texto.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class Diferenca:
+    __slots__ = ("novos", "removidos", "reaparecidos", "urls_alteradas", "renumerados")
+
+    def __init__(self):
+        self.novos: list[float] = []                            # números sem ligação com o provedor
+        self.removidos: list[int] = []                          # ids das ligações que sumiram da lista
+        self.reaparecidos: list[int] = []                       # ids de ligações removidas que voltaram
+        self.urls_alteradas: list[tuple[int, str, str]] = []    # (id, url antiga, url nova)
+        # capítulos que sumiram com a URL reaparecendo em um número novo
+        self.renumerados = 0
+
+    def __bool__(self):
+        return bool(self.novos or self.removidos or self.reaparecidos or self.urls_alteradas)
+
+
+def comparar(
+    atuais: dict[float, str],
+    anteriores: dict[float, tuple[int, str, bool]],
+    remocoes: bool = True,
+) -> Diferenca:
+    """
+    Compara a lista atual {numero: url} com as ligações anteriores do
+    provedor {numero: (id, url, removido)}. Com `remocoes=False` o que não
+    está na lista atual não é dado como removido (lista parcial).
+    """
+    diferenca = Diferenca()
+
+    for numero, url in atuais.items():
+        anterior = anteriores.get(numero)
+        if anterior is None:
+            diferenca.novos.append(numero)
+            continue
+        link_id, url_antiga, removido = anterior
+        if url != url_antiga:
+            diferenca.urls_alteradas.append((link_id, url_antiga, url))
+        elif removido:
+            diferenca.reaparecidos.append(link_id)
+
+    if remocoes:
+        sumidos = [
+            (link_id, url) for numero, (link_id, url, removido) in anteriores.items()
+            if not removido and numero not in atuais
+        ]
+        diferenca.removidos = [link_id for link_id, _ in sumidos]
+        if sumidos and diferenca.novos:
+            urls_novas = {atuais[numero] for numero in diferenca.novos}
+            diferenca.renumerados = sum(1 for _, url in sumidos if url in urls_novas)
+
+    return diferenca
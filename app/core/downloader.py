@@ -0,0 +1,373 @@
+"""
+Motor de download dos capítulos.
+
+As páginas (imagens) são baixadas em paralelo, limitadas por um teto global e
+por um teto por host, e o corpo de cada imagem vai direto para o disco em
+pedaços, sem juntar o capítulo em memória. Cada arquivo é gravado como
+`.part` e renomeado no fim; o capítulo inteiro é montado numa pasta
+temporária que só vira a pasta definitiva quando todas as páginas chegaram.
+Escritas, renomeações e remoções no disco rodam em threads
+(`asyncio.to_thread`), para não travar o event loop dos outros downloads.
+Os capítulos concluídos são marcados como `baixado` no banco em lotes.
+
+Saídas disponíveis (ver `criar_saida`):
+- pastas: uma pasta de imagens por capítulo
+- cbz: um arquivo .cbz (zip sem compressão) por capítulo, com ComicInfo.xml
+- blobs: armazém endereçado por conteúdo, sem imagens repetidas (app.core.blobs)
+"""
+import asyncio
+import mimetypes
+import os
+import re
+import shutil
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+import zipfile
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlparse
+
+from httpx import TransportError, HTTPStatusError
+
+from app.core import bulk, limitador
+from app.core.blobs import SaidaBlobs
+from app.db import async_session
+
+
+def nome_seguro(texto: str) -> str:
+    """Nome de arquivo/pasta válido a partir de um título."""
+    texto = re.sub(r'[<>:"/\\|?*\x00-\x1f]', "", texto).strip().strip(".")
+    return texto[:150] or "sem-titulo"
+
+
+def nome_capitulo(numero: float) -> str:
+    """'Capitulo 0012' ou 'Capitulo 0012.5', para ordenar bem em qualquer leitor."""
+    inteiro = int(numero)
+    if numero == inteiro:
+        return f"Capitulo {inteiro:04d}"
+    return f"Capitulo {inteiro:04d}{str(numero)[len(str(inteiro)):]}"
+
+
+def extensao_da_pagina(url: str, content_type: str | None) -> str:
+    ext = os.path.splitext(urlparse(url).path)[1].lower()
+    if ext in (".jpg", ".jpeg", ".png", ".webp", ".gif", ".avif"):
+        return ext
+    if content_type:
+        return mimetypes.guess_extension(content_type.split(";")[0].strip()) or ".jpg"
+    return ".jpg"
+
+
+class SaidaPastas:
+    """Grava cada capítulo como uma pasta de imagens: <raiz>/<manga>/<capitulo>/001.jpg"""
+
+    def __init__(self, raiz: str | os.PathLike):
+        self.raiz = Path(raiz).expanduser()
+
+    def destino(self, manga: dict, capitulo: dict) -> Path:
+        return self.raiz / nome_seguro(manga["titulo"]) / nome_capitulo(capitulo["numero"])
+
+    async def iniciar_capitulo(self, manga: dict, capitulo: dict):
+        final = self.destino(manga, capitulo)
+        tmp = final.with_name(final.name + ".tmp")
+        await asyncio.to_thread(shutil.rmtree, tmp, ignore_errors=True)
+        await asyncio.to_thread(tmp.mkdir, parents=True)
+        return {"final": final, "tmp": tmp}
+
+    async def gravar_pagina(self, ctx, indice: int, extensao: str, corpo) -> int:
+        """Grava a página a partir de um iterador assíncrono de bytes. Retorna o tamanho."""
+        path = ctx["tmp"] / f"{indice:03d}{extensao}"
+        part = path.with_name(path.name + ".part")
+        tamanho = 0
+        f = await asyncio.to_thread(open, part, "wb")
+        try:
+            async for chunk in corpo:
+                await asyncio.to_thread(f.write, chunk)
+                tamanho += len(chunk)
+        finally:
+            await asyncio.to_thread(f.close)
+        await asyncio.to_thread(os.replace, part, path)
+        return tamanho
+
+    async def concluir_capitulo(self, ctx):
+        await asyncio.to_thread(self._substituir, ctx["tmp"], ctx["final"])
+
+    @staticmethod
+    def _substituir(tmp: Path, final: Path):
+        if final.exists():
+            shutil.rmtree(final)
+        os.replace(tmp, final)
+
+    async def descartar_capitulo(self, ctx):
+        await asyncio.to_thread(shutil.rmtree, ctx["tmp"], ignore_errors=True)
+
+
+class SaidaCBZ:
+    """
+    Grava cada capítulo como um .cbz: <raiz>/<manga>/<capitulo>.cbz
+
+    O zip é escrito em disco à medida que as páginas chegam (entradas sem
+    compressão; imagens já são comprimidas). Como as páginas são baixadas em
+    paralelo e o zip só aceita uma entrada por vez, cada página passa por um
+    buffer temporário limitado a `max_memoria_pagina` bytes (o excedente vai
+    para disco) e é copiada para o arquivo quando chega inteira; assim uma
+    página que falha no meio nunca deixa uma entrada pela metade no zip.
+    """
+
+    def __init__(self, raiz: str | os.PathLike, max_memoria_pagina: int = 2 * 1024 * 1024):
+        self.raiz = Path(raiz).expanduser()
+        self.max_memoria_pagina = max_memoria_pagina
+
+    def destino(self, manga: dict, capitulo: dict) -> Path:
+        return self.raiz / nome_seguro(manga["titulo"]) / f"{nome_capitulo(capitulo['numero'])}.cbz"
+
+    async def iniciar_capitulo(self, manga: dict, capitulo: dict):
+        final = self.destino(manga, capitulo)
+        await asyncio.to_thread(final.parent.mkdir, parents=True, exist_ok=True)
+        tmp = final.with_name(final.name + ".part")
+        return {
+            "final": final,
+            "tmp": tmp,
+            "zip": await asyncio.to_thread(zipfile.ZipFile, tmp, "w", compression=zipfile.ZIP_STORED),
+            "lock": asyncio.Lock(),
+            "paginas": 0,
+            "manga": manga,
+            "capitulo": capitulo,
+        }
+
+    async def gravar_pagina(self, ctx, indice: int, extensao: str, corpo) -> int:
+        tamanho = 0
+        with tempfile.SpooledTemporaryFile(max_size=self.max_memoria_pagina) as buffer:
+            async for chunk in corpo:
+                # passado do limite de memória o buffer escreve em disco
+                if tamanho + len(chunk) > self.max_memoria_pagina:
+                    await asyncio.to_thread(buffer.write, chunk)
+                else:
+                    buffer.write(chunk)
+                tamanho += len(chunk)
+            buffer.seek(0)
+
+            info = zipfile.ZipInfo(f"{indice:03d}{extensao}", datetime.now().timetuple()[:6])
+            info.compress_type = zipfile.ZIP_STORED
+            info.file_size = tamanho
+            async with ctx["lock"]:
+                await asyncio.to_thread(self._copiar, ctx["zip"], info, buffer)
+                ctx["paginas"] += 1
+        return tamanho
+
+    @staticmethod
+    def _copiar(arquivo: zipfile.ZipFile, info: zipfile.ZipInfo, buffer):
+        with arquivo.open(info, "w") as entrada:
+            shutil.copyfileobj(buffer, entrada)
+
+    async def concluir_capitulo(self, ctx):
+        xml = comic_info(ctx["manga"], ctx["capitulo"], ctx["paginas"])
+        await asyncio.to_thread(self._fechar, ctx, xml)
+
+    @staticmethod
+    def _fechar(ctx, xml: bytes):
+        ctx["zip"].writestr("ComicInfo.xml", xml)
+        ctx["zip"].close()
+        os.replace(ctx["tmp"], ctx["final"])
+
+    async def descartar_capitulo(self, ctx):
+        await asyncio.to_thread(ctx["zip"].close)
+        await asyncio.to_thread(ctx["tmp"].unlink, missing_ok=True)
+
+
+def comic_info(manga: dict, capitulo: dict, paginas: int) -> bytes:
+    """ComicInfo.xml (formato do ComicRack, lido pela maioria dos leitores de CBZ)."""
+    raiz = ET.Element("ComicInfo", {
+        "xmlns:xsi": "http://www.w3.org/2001/XMLSchema-instance",
+        "xmlns:xsd": "http://www.w3.org/2001/XMLSchema",
+    })
+
+    numero = capitulo["numero"]
+    campos = [
+        ("Title", capitulo.get("titulo")),
+        ("Series", manga["titulo"]),
+        ("Number", f"{numero:g}" if isinstance(numero, float) else str(numero)),
+        ("Summary", manga.get("descricao")),
+        ("Writer", manga.get("autor")),
+        ("AlternateSeries", manga.get("alter_title")),
+        ("PageCount", str(paginas)),
+        ("Manga", "Yes"),
+    ]
+    for tag, valor in campos:
+        if valor:
+            ET.SubElement(raiz, tag).text = str(valor)
+
+    ET.indent(raiz)
+    return ET.tostring(raiz, encoding="utf-8", xml_declaration=True)
+
+
+SAIDAS = {"pastas": SaidaPastas, "cbz": SaidaCBZ, "blobs": SaidaBlobs}
+
+
+def criar_saida(formato: str, destino: str | os.PathLike):
+    """Saída do Downloader pelo nome do formato ('pastas', 'cbz' ou 'blobs')."""
+    if formato not in SAIDAS:
+        raise ValueError(f"Formato de saída desconhecido: {formato} (use {', '.join(SAIDAS)})")
+    return SAIDAS[formato](destino)
+
+
+class Downloader:
+    def __init__(
+        self,
+        saida,
+        max_simultaneos: int = 16,
+        max_por_host: int = 4,
+        capitulos_simultaneos: int = 4,
+        tamanho_lote: int = 20,
+        max_tentativas: int = 4,
+        ao_concluir=None,
+    ):
+        """
+        `ao_concluir(ids)` é chamado com cada lote de capítulos baixados; o padrão
+        é marcá-los como `baixado` no banco.
+        """
+        self.saida = saida
+        self.ao_concluir = ao_concluir or self._marcar_baixados
+        self.capitulos_simultaneos = capitulos_simultaneos
+        self.tamanho_lote = tamanho_lote
+        self.max_tentativas = max_tentativas
+        self._global = asyncio.Semaphore(max_simultaneos)
+        self._por_host = defaultdict(lambda: asyncio.Semaphore(max_por_host))
+
+        self.paginas = 0
+        self.bytes = 0
+        self.concluidos = 0
+        self.falhas = 0
+        # {capitulo_id: motivo} dos capítulos que não foram baixados
+        self.falhos: dict[int, str] = {}
+        self._baixados: list[int] = []
+
+    async def baixar(self, provedor, manga: dict, capitulos: list[dict]) -> dict:
+        """
+        Baixa os `capitulos` ({'id', 'numero', 'titulo', 'url'}) do `manga`
+        ({'id', 'titulo'}) usando a sessão HTTP do `provedor`.
+        Retorna {'capitulos', 'falhas', 'paginas', 'bytes', 'duracao'}.
+        """
+        inicio = time.perf_counter()
+        await self.baixar_capitulos([(provedor, manga, cap) for cap in capitulos])
+        return self.resumo(time.perf_counter() - inicio)
+
+    async def baixar_capitulos(self, itens: list[tuple]):
+        """
+        Baixa uma lista de (provedor, manga, capitulo), que pode misturar mangás e
+        provedores; até `capitulos_simultaneos` capítulos ao mesmo tempo.
+        """
+        fila = asyncio.Queue()
+        for item in itens:
+            fila.put_nowait(item)
+
+        async def trabalhador():
+            while not fila.empty():
+                await self._baixar_capitulo(*fila.get_nowait())
+
+        await asyncio.gather(*(
+            trabalhador() for _ in range(min(self.capitulos_simultaneos, len(itens)))
+        ))
+        await self._entregar_baixados()
+
+    def resumo(self, duracao: float) -> dict:
+        """Imprime e retorna os totais acumulados deste Downloader."""
+        print(
+            f"[✓] {self.concluidos} capítulos, {self.paginas} páginas "
+            f"({self.bytes / 1024 / 1024:.1f} MiB) em {duracao:.1f}s — "
+            f"{self.paginas / duracao if duracao else 0:.1f} páginas/s"
+        )
+        return {
+            "capitulos": self.concluidos,
+            "falhas": self.falhas,
+            "paginas": self.paginas,
+            "bytes": self.bytes,
+            "duracao": duracao,
+        }
+
+    async def _baixar_capitulo(self, provedor, manga: dict, cap: dict):
+        titulo = f"'{manga['titulo']}' {nome_capitulo(cap['numero'])}"
+        try:
+            paginas = await provedor.get_paginas(cap["url"])
+        except Exception as e:
+            print(f"[!] Falha ao listar páginas de {titulo}: {e}")
+            self._falhou(cap, e)
+            return
+
+        if not paginas:
+            print(f"[!] Nenhuma página encontrada em {titulo}")
+            self._falhou(cap, "nenhuma página encontrada")
+            return
+
+        ctx = await self.saida.iniciar_capitulo(manga, cap)
+        tarefas = [
+            asyncio.create_task(self._baixar_pagina(provedor, ctx, indice, url))
+            for indice, url in enumerate(paginas, start=1)
+        ]
+        try:
+            await asyncio.gather(*tarefas)
+            await self.saida.concluir_capitulo(ctx)
+        except Exception as e:
+            # uma página falhou de vez: o capítulo não serve incompleto
+            for t in tarefas:
+                t.cancel()
+            await asyncio.gather(*tarefas, return_exceptions=True)
+            await self.saida.descartar_capitulo(ctx)
+            print(f"[!] Falha ao baixar {titulo}: {e}")
+            self._falhou(cap, e)
+            return
+
+        print(f"[+] {titulo}: {len(paginas)} páginas")
+        self.concluidos += 1
+        self._baixados.append(cap["id"])
+        if len(self._baixados) >= self.tamanho_lote:
+            await self._entregar_baixados()
+
+    def _falhou(self, cap: dict, motivo):
+        self.falhas += 1
+        # só a primeira linha (o httpx acrescenta um link de documentação)
+        self.falhos[cap["id"]] = str(motivo).split("\n")[0] or type(motivo).__name__
+
+    async def _baixar_pagina(self, provedor, ctx, indice: int, url: str):
+        host = urlparse(url).hostname or ""
+
+        for tentativa in range(1, self.max_tentativas + 1):
+            try:
+                async with self._global, self._por_host[host]:
+                    async with provedor.session.stream(
+                        "GET", url,
+                        headers={"Referer": provedor.url},
+                        extensions={"cache": False},
+                    ) as response:
+                        response.raise_for_status()
+
+                        extensao = extensao_da_pagina(url, response.headers.get("content-type"))
+                        tamanho = await self.saida.gravar_pagina(ctx, indice, extensao, response.aiter_bytes())
+
+                self.paginas += 1
+                self.bytes += tamanho
+                return
+            except (TransportError, HTTPStatusError) as e:
+                retentavel = (
+                    isinstance(e, TransportError)
+                    or e.response.status_code in limitador.STATUS_RETENTAVEIS
+                )
+                if not retentavel or tentativa == self.max_tentativas:
+                    raise
+
+                espera = limitador.backoff(tentativa)
+                if isinstance(e, HTTPStatusError):
+                    espera = limitador.retry_after(e.response) or espera
+                await asyncio.sleep(espera)
+
+    async def _entregar_baixados(self):
+        if not self._baixados:
+            return
+        ids, self._baixados = self._baixados, []
+        await self.ao_concluir(ids)
+
+    async def _marcar_baixados(self, ids: list[int]):
+        async with async_session() as session:
+            await bulk.marcar_baixados(session, ids)
+            await session.commit()
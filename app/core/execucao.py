@@ -0,0 +1,93 @@
+"""
+Checkpoints da sincronização.
+
+Cada execução fica registrada em `sync_runs` (ExecucaoSync). O cursor é a
+última página da listagem cujos mangás já foram todos gravados; como o pipeline
+grava fora de ordem, o CursorListagem acompanha quantos mangás de cada página
+ainda estão pendentes e só avança por páginas completas.
+"""
+from collections import Counter
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+
+from app.models import ExecucaoSync
+
+
+class CursorListagem:
+    def __init__(self, inicio: int = 0):
+        self.valor = inicio
+        self._pendentes = Counter()
+        # última página cuja listagem já terminou de ser enfileirada
+        self._listada_ate = inicio
+        self._ultima_vista = inicio
+
+    def listado(self, pagina: int | None):
+        """Um mangá da `pagina` entrou no pipeline."""
+        if pagina is None:
+            return
+        self._pendentes[pagina] += 1
+        # a listagem vem em ordem: ao chegar na página p, as anteriores estão completas
+        self._listada_ate = max(self._listada_ate, pagina - 1)
+        self._ultima_vista = max(self._ultima_vista, pagina)
+
+    def fim_da_listagem(self):
+        self._listada_ate = self._ultima_vista
+        self._avancar()
+
+    def concluido(self, pagina: int | None):
+        """Um mangá da `pagina` foi gravado (ou descartado) e não precisa ser refeito."""
+        if pagina is None:
+            return
+        self._pendentes[pagina] -= 1
+        self._avancar()
+
+    def _avancar(self):
+        while self.valor < self._listada_ate and self._pendentes[self.valor + 1] <= 0:
+            self._pendentes.pop(self.valor + 1, None)
+            self.valor += 1
+
+
+async def iniciar_execucao(session, provedor_id: int, incremental: bool, retomar: bool) -> ExecucaoSync:
+    """
+    Com `retomar`, reabre a última execução não concluída do provedor (se houver);
+    senão cria uma nova.
+    """
+    if retomar:
+        result = await session.execute(
+            select(ExecucaoSync)
+            .where(ExecucaoSync.provedor_id == provedor_id)
+            .order_by(ExecucaoSync.id.desc())
+            .limit(1)
+        )
+        anterior = result.scalars().first()
+        if anterior is not None and anterior.status != "concluida":
+            print(f"[*] Retomando execução #{anterior.id} a partir da página {anterior.cursor + 1}")
+            anterior.status = "executando"
+            anterior.erro = None
+            await session.commit()
+            return anterior
+        print("[*] Nenhuma execução interrompida para retomar; começando do início.")
+
+    execucao = ExecucaoSync(
+        provedor_id=provedor_id,
+        status="executando",
+        incremental=incremental,
+        cursor=0,
+        mangas=0,
+        capitulos=0,
+        falhas=0,
+    )
+    session.add(execucao)
+    await session.commit()
+    return execucao
+
+
+async def finalizar_execucao(session, execucao: ExecucaoSync, erro: BaseException | None = None):
+    execucao.finalizado_em = datetime.now(timezone.utc)
+    if erro is None:
+        execucao.status = "concluida"
+    else:
+        execucao.status = "falhou"
+        execucao.erro = str(erro) or type(erro).__name__
+    await session.commit()
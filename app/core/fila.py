@@ -0,0 +1,243 @@
+"""
+Fila de downloads no banco (`download_jobs`), compartilhada por vários workers.
+
+- enfileirar: cria um job para cada capítulo com baixado = false
+- reivindicar: pega jobs livres com SELECT ... FOR UPDATE SKIP LOCKED, de modo
+  que dois workers nunca recebem o mesmo job, e segura cada um por um lease
+- renovar: heartbeat do worker, empurra o fim do lease enquanto baixa
+- concluir / falhar / liberar: devolvem o resultado
+
+Um job cujo lease venceu (worker morreu ou travou) volta a ser reivindicável;
+um que falhou volta para a fila com `disponivel_em` no futuro (espera
+exponencial com jitter a cada tentativa), para que um capítulo que sempre dá
+erro não gaste todas as tentativas em segundos. Depois de `max_tentativas` ele
+fica como "falhou" até ser enfileirado de novo.
+O lease é calculado com o relógio do worker, então os hosts precisam estar com
+o relógio razoavelmente sincronizado (NTP).
+"""
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, update, and_, or_, case, func
+
+from app.core import bulk, limitador
+from app.models import JobDownload, Capitulo, CapituloProvedor, Manga
+
+# segundos que um job fica reservado para o worker sem heartbeat
+LEASE_PADRAO = 120.0
+MAX_TENTATIVAS = 5
+# espera antes de tentar de novo um job que falhou: dobra a cada tentativa, até o teto
+ESPERA_BASE = 30.0
+ESPERA_MAXIMA = 3600.0
+
+
+def _agora() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+async def enfileirar(session, manga_id: int | None = None) -> int:
+    """
+    Cria jobs para os capítulos ainda não baixados (de um mangá ou de todos).
+    Jobs já concluídos ou que falharam voltam para a fila se o capítulo
+    continua não baixado. Retorna quantos jobs entraram na fila.
+    """
+    capitulos = select(Capitulo.id).where(Capitulo.baixado.is_(False))
+    if manga_id is not None:
+        capitulos = capitulos.where(Capitulo.manga_id == manga_id)
+
+    stmt = bulk._insert(session, JobDownload).from_select(["capitulo_id"], capitulos)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[JobDownload.capitulo_id],
+        set_={
+            "status": "pendente", "tentativas": 0, "erro": None,
+            "worker": None, "lease_ate": None, "disponivel_em": None,
+        },
+        where=JobDownload.status.in_(("concluido", "falhou")),
+    )
+    result = await session.execute(stmt)
+    return max(result.rowcount or 0, 0)
+
+
+async def reivindicar(
+    session,
+    worker: str,
+    quantidade: int,
+    lease: float = LEASE_PADRAO,
+    max_tentativas: int = MAX_TENTATIVAS,
+) -> list[dict]:
+    """
+    Reserva até `quantidade` jobs para o `worker` e faz commit.
+    Retorna [{'job_id', 'tentativas', 'manga': {...}, 'capitulo': {...}, 'links': [...]}],
+    onde links são os (provedor_id, url) do capítulo.
+    """
+    agora = _agora()
+    vencido = and_(JobDownload.status == "executando", JobDownload.lease_ate < agora)
+    # pendente e fora da espera de uma falha anterior
+    livre = and_(
+        JobDownload.status == "pendente",
+        or_(JobDownload.disponivel_em.is_(None), JobDownload.disponivel_em <= agora),
+    )
+
+    # lease vencido sem tentativas sobrando: desiste do job
+    await session.execute(
+        update(JobDownload)
+        .where(vencido, JobDownload.tentativas >= max_tentativas)
+        .values(status="falhou", erro="lease expirado", worker=None, lease_ate=None)
+    )
+
+    result = await session.execute(
+        select(JobDownload.id)
+        .where(or_(livre, vencido))
+        .order_by(JobDownload.id)
+        .limit(quantidade)
+        .with_for_update(skip_locked=True)
+    )
+    ids = result.scalars().all()
+    if ids:
+        # a condição se repete no UPDATE: sem SKIP LOCKED (ex.: SQLite) fica só
+        # com os jobs que ninguém pegou entre o SELECT e aqui
+        result = await session.execute(
+            update(JobDownload)
+            .where(JobDownload.id.in_(ids), or_(livre, vencido))
+            .values(
+                status="executando",
+                worker=worker,
+                lease_ate=agora + timedelta(seconds=lease),
+                tentativas=JobDownload.tentativas + 1,
+            )
+            .returning(JobDownload.id)
+        )
+        ids = result.scalars().all()
+
+    if not ids:
+        await session.commit()
+        return []
+
+    result = await session.execute(
+        select(
+            JobDownload.id, JobDownload.tentativas,
+            Capitulo.id, Capitulo.numero, Capitulo.titulo,
+            Manga.id, Manga.titulo, Manga.alter_title, Manga.autor, Manga.descricao,
+        )
+        .join(Capitulo, Capitulo.id == JobDownload.capitulo_id)
+        .join(Manga, Manga.id == Capitulo.manga_id)
+        .where(JobDownload.id.in_(ids))
+        .order_by(JobDownload.id)
+    )
+    jobs = [
+        {
+            "job_id": job_id,
+            "tentativas": tentativas,
+            "manga": {
+                "id": manga_id,
+                "titulo": manga_titulo,
+                "alter_title": alter_title,
+                "autor": autor,
+                "descricao": descricao,
+            },
+            "capitulo": {"id": cap_id, "numero": numero, "titulo": titulo},
+            "links": [],
+        }
+        for (
+            job_id, tentativas, cap_id, numero, titulo,
+            manga_id, manga_titulo, alter_title, autor, descricao,
+        ) in result.all()
+    ]
+
+    por_capitulo = {j["capitulo"]["id"]: j for j in jobs}
+    result = await session.execute(
+        select(CapituloProvedor.capitulo_id, CapituloProvedor.provedor_id, CapituloProvedor.url)
+        .where(CapituloProvedor.capitulo_id.in_(por_capitulo), CapituloProvedor.removido_em.is_(None))
+        .order_by(CapituloProvedor.id)
+    )
+    for cap_id, provedor_id, url in result.all():
+        por_capitulo[cap_id]["links"].append((provedor_id, url))
+
+    await session.commit()
+    return jobs
+
+
+async def renovar(session, worker: str, job_ids: list[int], lease: float = LEASE_PADRAO) -> int:
+    """Estende o lease dos jobs que ainda são do `worker`. Retorna quantos continuam dele."""
+    result = await session.execute(
+        update(JobDownload)
+        .where(
+            JobDownload.id.in_(job_ids),
+            JobDownload.worker == worker,
+            JobDownload.status == "executando",
+        )
+        .values(lease_ate=_agora() + timedelta(seconds=lease))
+    )
+    await session.commit()
+    return result.rowcount
+
+
+async def concluir(session, capitulo_ids: list[int]):
+    """Marca os jobs dos capítulos como concluídos e os capítulos como baixados."""
+    await session.execute(
+        update(JobDownload)
+        .where(JobDownload.capitulo_id.in_(capitulo_ids))
+        .values(status="concluido", concluido_em=_agora(), erro=None, lease_ate=None)
+    )
+    await bulk.marcar_baixados(session, capitulo_ids)
+    await session.commit()
+
+
+async def falhar(session, worker: str, falhos: dict[int, str], max_tentativas: int = MAX_TENTATIVAS):
+    """
+    Devolve para a fila os jobs dos capítulos que falharam ({capitulo_id: motivo}),
+    disponíveis só depois da espera da tentativa, ou os marca como "falhou"
+    quando as tentativas acabaram.
+    """
+    result = await session.execute(
+        select(JobDownload.capitulo_id, JobDownload.tentativas)
+        .where(JobDownload.capitulo_id.in_(falhos), JobDownload.worker == worker)
+    )
+    agora = _agora()
+    for capitulo_id, tentativas in result.all():
+        espera = limitador.backoff(tentativas, base=ESPERA_BASE, teto=ESPERA_MAXIMA)
+        await session.execute(
+            update(JobDownload)
+            .where(JobDownload.capitulo_id == capitulo_id, JobDownload.worker == worker)
+            .values(
+                status=case((JobDownload.tentativas >= max_tentativas, "falhou"), else_="pendente"),
+                erro=falhos[capitulo_id],
+                worker=None,
+                lease_ate=None,
+                disponivel_em=agora + timedelta(seconds=espera),
+            )
+        )
+    await session.commit()
+
+
+async def liberar(session, worker: str, job_ids: list[int]):
+    """Devolve sem custo de tentativa os jobs que o worker não chegou a terminar (ex.: Ctrl+C)."""
+    await session.execute(
+        update(JobDownload)
+        .where(
+            JobDownload.id.in_(job_ids),
+            JobDownload.worker == worker,
+            JobDownload.status == "executando",
+        )
+        .values(status="pendente", worker=None, lease_ate=None, tentativas=JobDownload.tentativas - 1)
+    )
+    await session.commit()
+
+
+async def estatisticas(session) -> dict:
+    """
+    Retorna {'pendente', 'executando', 'concluido', 'falhou', 'por_hora'},
+    onde por_hora é quantos jobs foram concluídos na última hora.
+    """
+    result = await session.execute(
+        select(JobDownload.status, func.count(JobDownload.id)).group_by(JobDownload.status)
+    )
+    stats = {"pendente": 0, "executando": 0, "concluido": 0, "falhou": 0}
+    stats.update({status: int(n) for status, n in result.all()})
+
+    stats["por_hora"] = int(await session.scalar(
+        select(func.count(JobDownload.id)).where(
+            JobDownload.status == "concluido",
+            JobDownload.concluido_em >= _agora() - timedelta(hours=1),
+        )
+    ) or 0)
+    return stats
@@ -0,0 +1,138 @@
+"""
+Controle de ritmo das requisições aos provedores.
+
+- BaldeDeFichas: token bucket por host, compartilhado por todos os provedores
+  que acessam o mesmo site
+- backoff/retry_after: espera entre tentativas (exponencial com jitter, ou o
+  que o servidor pedir em Retry-After)
+- ConcorrenciaAdaptativa: semáforo cujo limite cai pela metade com erros ou
+  latência alta e volta a subir aos poucos quando o site responde bem (AIMD)
+"""
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+# status que valem nova tentativa
+STATUS_RETENTAVEIS = {429, 500, 502, 503, 504}
+
+# maior espera aceita entre tentativas, mesmo que o Retry-After peça mais
+ESPERA_MAXIMA = 300.0
+
+
+class BaldeDeFichas:
+    def __init__(self, taxa: float, capacidade: float | None = None):
+        self.taxa = taxa
+        self.capacidade = capacidade or max(1.0, taxa)
+        self._fichas = self.capacidade
+        self._ultimo = time.monotonic()
+        self._pausado_ate = 0.0
+        self._lock = asyncio.Lock()
+
+    async def adquirir(self):
+        async with self._lock:
+            while True:
+                agora = time.monotonic()
+                if agora < self._pausado_ate:
+                    await asyncio.sleep(self._pausado_ate - agora)
+                    continue
+
+                self._fichas = min(self.capacidade, self._fichas + (agora - self._ultimo) * self.taxa)
+                self._ultimo = agora
+                if self._fichas >= 1:
+                    self._fichas -= 1
+                    return
+
+                await asyncio.sleep((1 - self._fichas) / self.taxa)
+
+    def ajustar(self, taxa: float):
+        """Troca a taxa (req/s), mantendo as fichas acumuladas até agora."""
+        agora = time.monotonic()
+        self._fichas = min(self.capacidade, self._fichas + (agora - self._ultimo) * self.taxa)
+        self._ultimo = agora
+        self.taxa = taxa
+        self.capacidade = max(1.0, taxa)
+        self._fichas = min(self._fichas, self.capacidade)
+
+    def pausar(self, segundos: float):
+        """Segura todas as requisições ao host por `segundos` (ex.: 429 com Retry-After)."""
+        self._pausado_ate = max(self._pausado_ate, time.monotonic() + segundos)
+        self._fichas = 0
+
+
+_baldes: dict[str, BaldeDeFichas] = {}
+
+
+def balde_do_host(host: str, taxa: float) -> BaldeDeFichas:
+    """
+    Retorna o balde do host, criando na primeira vez com a taxa (req/s)
+    informada; se a taxa pedida mudou (outro provedor no mesmo host, ajuste
+    pela CLI ou em testes), o balde passa a usar a nova.
+    """
+    balde = _baldes.get(host)
+    if balde is None:
+        balde = _baldes[host] = BaldeDeFichas(taxa)
+    elif balde.taxa != taxa:
+        balde.ajustar(taxa)
+    return balde
+
+
+def backoff(tentativa: int, base: float = 1.0, teto: float = 60.0) -> float:
+    """Espera exponencial com jitter para a `tentativa` (começando em 1)."""
+    espera = min(teto, base * 2 ** (tentativa - 1))
+    return espera / 2 + random.uniform(0, espera / 2)
+
+
+def retry_after(response: httpx.Response) -> float | None:
+    """Segundos pedidos pelo servidor em Retry-After (número ou data HTTP)."""
+    valor = response.headers.get("retry-after")
+    if not valor:
+        return None
+
+    try:
+        segundos = float(valor)
+    except ValueError:
+        try:
+            segundos = parsedate_to_datetime(valor).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+
+    return min(ESPERA_MAXIMA, max(0.0, segundos))
+
+
+class ConcorrenciaAdaptativa:
+    def __init__(self, maximo: int, minimo: int = 1, latencia_alvo: float = 2.0):
+        self.maximo = maximo
+        self.minimo = min(minimo, maximo)
+        self.latencia_alvo = latencia_alvo
+        self.limite = float(maximo)
+        self.em_uso = 0
+        self._ultimo_corte = 0.0
+        self._cond = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.em_uso < int(self.limite))
+            self.em_uso += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        async with self._cond:
+            self.em_uso -= 1
+            self._cond.notify_all()
+
+    def registrar(self, latencia: float, erro: bool):
+        """Ajusta o limite com o resultado de uma requisição."""
+        if erro or latencia > 2 * self.latencia_alvo:
+            # corta no máximo uma vez por janela, para uma rajada de erros não zerar o limite
+            agora = time.monotonic()
+            if agora - self._ultimo_corte >= self.latencia_alvo:
+                self._ultimo_corte = agora
+                novo = max(self.minimo, self.limite / 2)
+                if int(novo) < int(self.limite):
+                    print(f"[!] Reduzindo concorrência para {int(novo)} (erros ou lentidão)")
+                self.limite = novo
+        elif latencia < self.latencia_alvo:
+            self.limite = min(self.maximo, self.limite + 1 / self.limite)
@@ -0,0 +1,229 @@
+"""
+Métricas do sync: quanto tempo cada etapa leva, quantas requisições (por
+status HTTP), quantos bytes foram baixados e quantas linhas foram gravadas.
+
+O BaseProvedor mede, quando `BaseProvedor.metricas` está ligado:
+- listagem: buscar e interpretar uma página da listagem
+- capitulos: `get_chapters` de um mangá (requisição + parse)
+- parse: cada `analisar`, com o rótulo `funcao` (parse_listagem,
+  parse_capitulos, ...); o `numero_capitulo` de cada capítulo roda dentro do
+  parse_capitulos (às vezes em outro processo) e entra nesse tempo
+- gravacao e commit: os comandos em massa de um lote e o commit dele
+
+As etapas se sobrepõem (o parse está dentro de capitulos e listagem) e as
+que rodam em paralelo somam mais que o tempo de relógio; o que interessa é
+comparar onde o tempo de cada provedor vai.
+
+A saída é o formato texto do Prometheus (para o textfile collector do
+node_exporter, ou para servir como está) e um relatório JSON da execução.
+"""
+import asyncio
+import contextlib
+import json
+import math
+import os
+import time
+from bisect import bisect_left
+from collections import Counter
+
+PREFIXO = "sync_mangas"
+
+# limites dos buckets dos histogramas, em segundos
+BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, math.inf,
+)
+
+
+class Histograma:
+    __slots__ = ("contagens", "soma", "total", "maximo")
+
+    def __init__(self):
+        self.contagens = [0] * len(BUCKETS)
+        self.soma = 0.0
+        self.total = 0
+        self.maximo = 0.0
+
+    def observar(self, valor: float):
+        self.contagens[bisect_left(BUCKETS, valor)] += 1
+        self.soma += valor
+        self.total += 1
+        if valor > self.maximo:
+            self.maximo = valor
+
+    def quantil(self, q: float) -> float:
+        """Estimativa do quantil `q` pelos buckets (interpolação linear, como o histogram_quantile)."""
+        if not self.total:
+            return 0.0
+        alvo = q * self.total
+        acumulado = 0
+        for i, n in enumerate(self.contagens):
+            if acumulado + n >= alvo and n:
+                inicio = BUCKETS[i - 1] if i else 0.0
+                fim = min(BUCKETS[i], self.maximo)
+                return inicio + (fim - inicio) * (alvo - acumulado) / n
+            acumulado += n
+        return self.maximo
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _rotulos(rotulos) -> str:
+    if not rotulos:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in rotulos) + "}"
+
+
+def _le(limite: float) -> str:
+    return "+Inf" if limite == math.inf else repr(limite)
+
+
+class Metricas:
+    def __init__(self):
+        self.inicio = time.time()
+        # (etapa, ((rótulo, valor), ...)) -> Histograma
+        self.etapas: dict[tuple, Histograma] = {}
+        self.requisicoes: Counter = Counter()   # (provedor, status)
+        self.bytes: Counter = Counter()         # provedor
+        self.linhas: Counter = Counter()        # (provedor, tabela)
+
+    def observar(self, etapa: str, segundos: float, **rotulos):
+        chave = (etapa, tuple(sorted(rotulos.items())))
+        histograma = self.etapas.get(chave)
+        if histograma is None:
+            histograma = self.etapas[chave] = Histograma()
+        histograma.observar(segundos)
+
+    @contextlib.contextmanager
+    def medir(self, etapa: str, **rotulos):
+        """Mede o bloco `with` (inclusive o que ele espera com await) na etapa."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(etapa, time.perf_counter() - inicio, **rotulos)
+
+    def requisicao(self, provedor: str, status: int | str, tamanho: int = 0):
+        """Conta uma resposta (ou 'erro' de rede) e os bytes do corpo."""
+        self.requisicoes[provedor, str(status)] += 1
+        self.bytes[provedor] += tamanho
+
+    def gravadas(self, provedor: str, tabela: str, n: int):
+        if n:
+            self.linhas[provedor, tabela] += n
+
+    def prometheus(self) -> str:
+        """Todas as métricas no formato texto do Prometheus."""
+        linhas = [
+            f"# HELP {PREFIXO}_etapa_segundos Duração de cada etapa do sync.",
+            f"# TYPE {PREFIXO}_etapa_segundos histogram",
+        ]
+        for (etapa, rotulos), h in sorted(self.etapas.items()):
+            base = (("etapa", etapa),) + rotulos
+            acumulado = 0
+            for limite, n in zip(BUCKETS, h.contagens):
+                acumulado += n
+                linhas.append(f"{PREFIXO}_etapa_segundos_bucket{_rotulos(base + (('le', _le(limite)),))} {acumulado}")
+            linhas.append(f"{PREFIXO}_etapa_segundos_sum{_rotulos(base)} {h.soma!r}")
+            linhas.append(f"{PREFIXO}_etapa_segundos_count{_rotulos(base)} {h.total}")
+
+        linhas += [
+            f"# HELP {PREFIXO}_requisicoes_total Respostas HTTP por status ('erro' = falha de rede).",
+            f"# TYPE {PREFIXO}_requisicoes_total counter",
+        ]
+        for (provedor, status), n in sorted(self.requisicoes.items()):
+            linhas.append(f"{PREFIXO}_requisicoes_total{_rotulos((('provedor', provedor), ('status', status)))} {n}")
+
+        linhas += [
+            f"# HELP {PREFIXO}_bytes_baixados_total Bytes de corpo das respostas HTTP.",
+            f"# TYPE {PREFIXO}_bytes_baixados_total counter",
+        ]
+        for provedor, n in sorted(self.bytes.items()):
+            linhas.append(f"{PREFIXO}_bytes_baixados_total{_rotulos((('provedor', provedor),))} {n}")
+
+        linhas += [
+            f"# HELP {PREFIXO}_linhas_gravadas_total Linhas inseridas ou atualizadas no banco.",
+            f"# TYPE {PREFIXO}_linhas_gravadas_total counter",
+        ]
+        for (provedor, tabela), n in sorted(self.linhas.items()):
+            linhas.append(f"{PREFIXO}_linhas_gravadas_total{_rotulos((('provedor', provedor), ('tabela', tabela)))} {n}")
+
+        linhas += [
+            f"# HELP {PREFIXO}_inicio_timestamp_segundos Início da execução.",
+            f"# TYPE {PREFIXO}_inicio_timestamp_segundos gauge",
+            f"{PREFIXO}_inicio_timestamp_segundos {self.inicio!r}",
+        ]
+        return "\n".join(linhas) + "\n"
+
+    def relatorio(self, resumos: list[dict] | None = None) -> dict:
+        """Relatório da execução, com as etapas da mais para a menos demorada no total."""
+        etapas = [
+            {
+                "etapa": etapa,
+                **dict(rotulos),
+                "n": h.total,
+                "total_s": round(h.soma, 4),
+                "media_ms": round(h.soma / h.total * 1000, 3),
+                "p50_ms": round(h.quantil(0.5) * 1000, 3),
+                "p95_ms": round(h.quantil(0.95) * 1000, 3),
+                "p99_ms": round(h.quantil(0.99) * 1000, 3),
+                "max_ms": round(h.maximo * 1000, 3),
+            }
+            for (etapa, rotulos), h in self.etapas.items() if h.total
+        ]
+        etapas.sort(key=lambda e: e["total_s"], reverse=True)
+
+        requisicoes = {}
+        for (provedor, status), n in sorted(self.requisicoes.items()):
+            requisicoes.setdefault(provedor, {})[status] = n
+        linhas = {}
+        for (provedor, tabela), n in sorted(self.linhas.items()):
+            linhas.setdefault(provedor, {})[tabela] = n
+
+        return {
+            "inicio": self.inicio,
+            "duracao_s": round(time.time() - self.inicio, 3),
+            "provedores": resumos or [],
+            "etapas": etapas,
+            "requisicoes": requisicoes,
+            "bytes_baixados": dict(self.bytes),
+            "linhas_gravadas": linhas,
+        }
+
+    def imprimir(self, limite: int = 10):
+        """As etapas que mais tomaram tempo, para ver o gargalo de cada provedor."""
+        etapas = self.relatorio()["etapas"][:limite]
+        if not etapas:
+            return
+
+        print("\n=== Etapas (tempo total) ===")
+        for e in etapas:
+            nome = e["etapa"] + (f"/{e['funcao']}" if "funcao" in e else "")
+            print(
+                f"{e.get('provedor', ''):<15} {nome:<28} {e['total_s']:>9.2f}s  "
+                f"n: {e['n']:<7} p50: {e['p50_ms']:>8.1f}ms  p95: {e['p95_ms']:>8.1f}ms"
+            )
+
+    def gravar_prometheus(self, caminho: str):
+        """Grava o texto do Prometheus trocando o arquivo de uma vez (o coletor nunca lê pela metade)."""
+        _gravar(caminho, self.prometheus())
+
+    def gravar_relatorio(self, caminho: str, resumos: list[dict] | None = None):
+        _gravar(caminho, json.dumps(self.relatorio(resumos), ensure_ascii=False, indent=2))
+
+    async def exportar_periodicamente(self, caminho: str, intervalo: float = 15.0):
+        """Regrava o arquivo do Prometheus a cada `intervalo` segundos (até ser cancelada)."""
+        while True:
+            await asyncio.sleep(intervalo)
+            self.gravar_prometheus(caminho)
+
+
+def _gravar(caminho: str, conteudo: str):
+    pasta = os.path.dirname(os.path.abspath(caminho))
+    os.makedirs(pasta, exist_ok=True)
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        f.write(conteudo)
+    os.replace(temporario, caminho)
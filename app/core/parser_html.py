@@ -0,0 +1,184 @@
+"""
+Leitura de HTML para os provedores, com o parser mais rápido instalado.
+
+Ordem de preferência:
+- selectolax (lexbor, em C): o mais rápido, com seletores CSS próprios
+- lxml + cssselect: árvore em C, seletores traduzidos para XPath
+- BeautifulSoup (com o builder do lxml se houver, senão html.parser): sempre
+  disponível; aqui o `somente` dos provedores limita a árvore às partes que
+  interessam, em vez de montar o documento inteiro em objetos Python
+
+Os provedores só usam a interface de `Elemento` (selecionar, primeiro, attr,
+texto, texto_direto), então o mesmo código roda com qualquer um dos três.
+"""
+import importlib.util
+import os
+import re
+
+_PARSERS = ("selectolax", "lxml", "html.parser")
+
+
+def _instalado(*modulos: str) -> bool:
+    return all(importlib.util.find_spec(m) is not None for m in modulos)
+
+
+def escolher_parser(preferido: str | None = None) -> str:
+    """O parser a usar: o `preferido` (ou $SYNC_MANGAS_PARSER) se instalado, senão o mais rápido."""
+    preferido = preferido or os.environ.get("SYNC_MANGAS_PARSER")
+    disponiveis = [
+        nome for nome, modulos in (
+            ("selectolax", ("selectolax",)),
+            ("lxml", ("lxml", "cssselect")),
+            ("html.parser", ("bs4",)),
+        )
+        if _instalado(*modulos)
+    ]
+    if preferido:
+        if preferido not in _PARSERS:
+            raise ValueError(f"parser desconhecido: {preferido} (use {', '.join(_PARSERS)})")
+        if preferido in disponiveis:
+            return preferido
+        print(f"[warn] parser {preferido} não instalado; usando {disponiveis[0]}")
+    return disponiveis[0]
+
+
+PARSER = escolher_parser()
+
+
+class Elemento:
+    """Um nó do documento, igual para os três parsers."""
+
+    __slots__ = ("_no",)
+
+    def __init__(self, no):
+        self._no = no
+
+    def selecionar(self, seletor: str) -> list["Elemento"]:
+        raise NotImplementedError
+
+    def primeiro(self, seletor: str) -> "Elemento | None":
+        encontrados = self.selecionar(seletor)
+        return encontrados[0] if encontrados else None
+
+    def attr(self, nome: str, padrao: str | None = None) -> str | None:
+        raise NotImplementedError
+
+    def texto(self) -> str:
+        """Todo o texto do elemento e dos filhos, sem espaços nas pontas."""
+        raise NotImplementedError
+
+    def texto_direto(self) -> str:
+        """Só os textos que são filhos diretos do elemento, unidos por espaço."""
+        raise NotImplementedError
+
+
+class _ElementoSelectolax(Elemento):
+    __slots__ = ()
+
+    def selecionar(self, seletor):
+        return [_ElementoSelectolax(n) for n in self._no.css(seletor)]
+
+    def primeiro(self, seletor):
+        no = self._no.css_first(seletor)
+        return _ElementoSelectolax(no) if no is not None else None
+
+    def attr(self, nome, padrao=None):
+        valor = self._no.attributes.get(nome)
+        return valor if valor is not None else padrao
+
+    def texto(self):
+        return self._no.text(strip=True)
+
+    def texto_direto(self):
+        return self._no.text(deep=False, separator=" ", strip=True)
+
+
+class _ElementoLxml(Elemento):
+    __slots__ = ()
+
+    def selecionar(self, seletor):
+        return [_ElementoLxml(n) for n in self._no.cssselect(seletor)]
+
+    def attr(self, nome, padrao=None):
+        return self._no.get(nome, padrao)
+
+    def texto(self):
+        # como o get_text(strip=True) do bs4: pedaços sem espaços, colados
+        return "".join(t.strip() for t in self._no.itertext())
+
+    def texto_direto(self):
+        partes = [self._no.text] + [filho.tail for filho in self._no]
+        return " ".join(p.strip() for p in partes if p and p.strip())
+
+
+class _ElementoSoup(Elemento):
+    __slots__ = ()
+
+    def selecionar(self, seletor):
+        return [_ElementoSoup(n) for n in self._no.select(seletor)]
+
+    def primeiro(self, seletor):
+        no = self._no.select_one(seletor)
+        return _ElementoSoup(no) if no is not None else None
+
+    def attr(self, nome, padrao=None):
+        valor = self._no.get(nome)
+        if isinstance(valor, list):  # class, rel: o bs4 devolve lista
+            valor = " ".join(valor)
+        return valor if valor is not None else padrao
+
+    def texto(self):
+        return self._no.get_text(strip=True)
+
+    def texto_direto(self):
+        partes = self._no.find_all(string=True, recursive=False)
+        return " ".join(p.strip() for p in partes if p.strip())
+
+
+def _filtro_soup(somente: tuple[str, ...]):
+    """SoupStrainer para as tags, as classes ou os ids de `somente` (None se misturados)."""
+    from bs4 import SoupStrainer
+
+    if all(p.startswith(".") for p in somente):
+        # durante o parse o atributo class ainda é o texto cru ("x post-title")
+        classes = "|".join(re.escape(p[1:]) for p in somente)
+        return SoupStrainer(class_=re.compile(rf"(?:^|\s)(?:{classes})(?:\s|$)"))
+    if all(p.startswith("#") for p in somente):
+        return SoupStrainer(id=[p[1:] for p in somente])
+    if not any(p.startswith((".", "#")) for p in somente):
+        return SoupStrainer(list(somente))
+    return None
+
+
+def documento(html: str, somente: tuple[str, ...] | None = None, parser: str | None = None) -> Elemento:
+    """
+    Interpreta `html` e devolve a raiz para as buscas.
+
+    `somente` lista as tags (ex.: "li"), as classes (".post-title") ou os ids
+    ("#chapter-images") dentro dos quais estão os seletores que o provedor vai
+    usar; o BeautifulSoup monta só essas partes (com os descendentes) e os
+    parsers em C, que leem o documento inteiro mais rápido, ignoram a dica.
+    """
+    parser = parser or PARSER
+
+    if parser == "selectolax":
+        from selectolax.lexbor import LexborHTMLParser
+        return _ElementoSelectolax(LexborHTMLParser(html).root)
+
+    if parser == "lxml":
+        import lxml.html
+        if not html.strip():
+            return _ElementoLxml(lxml.html.Element("html"))
+        # bytes: o lxml recusa str que traz declaração de encoding
+        parser_utf8 = lxml.html.HTMLParser(encoding="utf-8")
+        return _ElementoLxml(lxml.html.document_fromstring(html.encode("utf-8"), parser=parser_utf8))
+
+    from bs4 import BeautifulSoup
+    builder = "lxml" if _instalado("lxml") else "html.parser"
+    filtro = _filtro_soup(somente) if somente else None
+    return _ElementoSoup(BeautifulSoup(html, builder, parse_only=filtro))
+
+
+def selecionar(html: str, seletor: str, somente: tuple[str, ...] | None = None) -> list[Elemento]:
+    """Atalho para `documento(html, somente).selecionar(seletor)`."""
+    return documento(html, somente).selecionar(seletor)
@@ -0,0 +1,126 @@
+"""
+Pool de conexões HTTP compartilhado pelos provedores.
+
+Em vez de cada provedor criar (e esquecer aberto) o próprio AsyncClient, todos
+usam o cliente do pool, que reaproveita conexões keep-alive, limita conexões
+simultâneas por host e pode falar HTTP/2. O cliente é fechado quando o último
+provedor que o usa sai do `async with`.
+"""
+import asyncio
+import importlib.util
+from collections import defaultdict
+
+import httpx
+
+
+class PoolHTTP:
+    def __init__(
+        self,
+        max_conexoes: int = 100,
+        max_por_host: int = 10,
+        max_keepalive: int = 20,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
+        timeout: float = 30,
+        transporte: httpx.AsyncBaseTransport | None = None,
+    ):
+        if http2 and importlib.util.find_spec("h2") is None:
+            print("[warn] HTTP/2 requer o pacote 'h2' (pip install httpx[http2]); usando HTTP/1.1")
+            http2 = False
+
+        self.limites = httpx.Limits(
+            max_connections=max_conexoes,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.max_por_host = max_por_host
+        self.http2 = http2
+        self.timeout = timeout
+        # transporte no lugar da rede (ex.: httpx.ASGITransport do site falso do benchmark)
+        self.transporte = transporte
+
+        # um cliente por cache (None = sem cache), com contagem de usuários
+        self._clientes: dict[int, httpx.AsyncClient] = {}
+        self._usuarios: dict[int, int] = defaultdict(int)
+
+    def cliente(self, cache=None) -> httpx.AsyncClient:
+        """Retorna o cliente compartilhado. Cada chamada deve ter um `liberar` correspondente."""
+        chave = id(cache)
+        if chave not in self._clientes:
+            transporte = TransporteLimitado(
+                self.transporte or httpx.AsyncHTTPTransport(limits=self.limites, http2=self.http2),
+                self.max_por_host,
+            )
+            if cache is not None:
+                transporte = cache.transporte(transporte)
+
+            self._clientes[chave] = httpx.AsyncClient(
+                transport=transporte,
+                follow_redirects=True,
+                timeout=self.timeout,
+            )
+
+        self._usuarios[chave] += 1
+        return self._clientes[chave]
+
+    async def liberar(self, client: httpx.AsyncClient) -> bool:
+        """Devolve o cliente ao pool. Retorna False se ele não pertence ao pool."""
+        for chave, atual in list(self._clientes.items()):
+            if atual is client:
+                self._usuarios[chave] -= 1
+                if self._usuarios[chave] <= 0:
+                    del self._clientes[chave]
+                    del self._usuarios[chave]
+                    await client.aclose()
+                return True
+        return False
+
+    async def fechar(self):
+        """Fecha todos os clientes, mesmo que ainda haja usuários."""
+        clientes = list(self._clientes.values())
+        self._clientes.clear()
+        self._usuarios.clear()
+        for client in clientes:
+            await client.aclose()
+
+
+class TransporteLimitado(httpx.AsyncBaseTransport):
+    """Limita as requisições em andamento por host; a vaga só é liberada quando o corpo é fechado."""
+
+    def __init__(self, base: httpx.AsyncBaseTransport, max_por_host: int):
+        self.base = base
+        self._semaforos = defaultdict(lambda: asyncio.Semaphore(max_por_host))
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        semaforo = self._semaforos[request.url.host]
+        await semaforo.acquire()
+        try:
+            response = await self.base.handle_async_request(request)
+        except BaseException:
+            semaforo.release()
+            raise
+
+        response.stream = _StreamComVaga(response.stream, semaforo)
+        return response
+
+    async def aclose(self):
+        await self.base.aclose()
+
+
+class _StreamComVaga(httpx.AsyncByteStream):
+    def __init__(self, stream, semaforo: asyncio.Semaphore):
+        self._stream = stream
+        self._semaforo = semaforo
+        self._liberado = False
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._liberado:
+                self._liberado = True
+                self._semaforo.release()
@@ -1,5 +1,8 @@
 from app.core.base_provedor import BaseProvedor
+from app.core.parser_html import documento
+from app.core.registro import registrar
 
+@registrar
 class {class_name}(BaseProvedor):
     nome = "{class_name}"
     url = "{url}"
@@ -14,13 +17,24 @@ class {class_name}(BaseProvedor):
         """
         raise NotImplementedError
     
-    async def get_all_mangas(self) -> list:
+    def url_listagem(self, pagina: int) -> str:
+        """URL da página `pagina` (começando em 1) da listagem de mangás."""
+        raise NotImplementedError
+
+    def parse_listagem(self, html: str) -> list:
         """
-        Retorna uma lista de dicionarios com todos os mangas existentes:
+        Extrai os mangas de uma página de listagem:
         
         [{'titulo': 'Blue Lock', 'alter_title': 'ブルーロック', 'autor': '...', 'url': '...'}]
+
+        Ex.: [{'titulo': a.texto(), 'url': a.attr('href')}
+              for a in documento(html, somente=('.lista',)).selecionar('.lista a')]
         """
         raise NotImplementedError
+
+    def total_paginas(self, html: str) -> int | None:
+        """Total de páginas lido da paginação (None = descobrir por sondagem)."""
+        return None
     
     async def get_manga_details(self, url: str) -> dict:
         raise NotImplementedError
@@ -28,13 +42,18 @@ class {class_name}(BaseProvedor):
     async def get_chapters(self, url: str) -> list:
         raise NotImplementedError
 
-    async def sincronizar_mangas(self):
+    async def sincronizar_mangas(
+        self,
+        concorrencia: int | None = None,
+        incremental: bool = False,
+        retomar: bool = False,
+    ):
         """Busca mangas novos e capítulos novos, e atualiza o banco."""
         raise NotImplementedError
 
-    async def baixar_mangas(self, manga_id):
+    def parse_paginas(self, html: str) -> list[str]:
         """
-        Baixa os capítulos do manga informado.
-        Deve ser sobrescrito por cada provedor.
+        Extrai as URLs das imagens do HTML de um capítulo, em ordem de leitura.
+        O download (baixar_mangas) já é feito pelo BaseProvedor.
         """
         raise NotImplementedError
\ No newline at end of file
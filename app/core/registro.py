@@ -0,0 +1,173 @@
+"""
+Registro dos provedores de app.providers.
+
+Cada provedor se declara com o decorador `registrar` (ou, como antes, só
+herdando de BaseProvedor), com `nome` e `url` como atributos da classe.
+
+O manifesto nome → {nome, url, modulo, classe} é montado lendo o código dos
+módulos com `ast`, sem importá-los, e fica em cache em
+app/providers/__pycache__/manifesto.json; um módulo só é lido de novo
+quando o mtime ou o tamanho do arquivo mudam. A classe de um provedor só é
+importada quando ele é usado (`carregar`), então registrar provedores ou
+sincronizar um deles não importa os outros (nem o BaseProvedor e o httpx).
+"""
+import ast
+import importlib
+import json
+import os
+import pkgutil
+
+_VERSAO_CACHE = 1
+
+# classes já importadas que se declararam com @registrar, por nome
+_CLASSES: dict[str, type] = {}
+_manifesto: dict[str, dict] | None = None
+
+
+def registrar(cls: type) -> type:
+    """Decorador que declara a classe como provedor."""
+    _CLASSES[cls.nome] = cls
+    return cls
+
+
+def _nome(expr: ast.expr) -> str | None:
+    """'registrar' para registrar, registro.registrar ou registrar(...); idem para as bases."""
+    if isinstance(expr, ast.Call):
+        return _nome(expr.func)
+    if isinstance(expr, ast.Attribute):
+        return expr.attr
+    if isinstance(expr, ast.Name):
+        return expr.id
+    return None
+
+
+def _ler_modulo(caminho: str, modulo: str) -> list[dict]:
+    """Os provedores declarados no arquivo, sem importá-lo."""
+    with open(caminho, "rb") as f:
+        arvore = ast.parse(f.read(), caminho)
+
+    entradas = []
+    for no in arvore.body:
+        if not isinstance(no, ast.ClassDef):
+            continue
+        decorada = any(_nome(d) == "registrar" for d in no.decorator_list)
+        if not decorada and not any(_nome(b) == "BaseProvedor" for b in no.bases):
+            continue
+
+        atributos = {
+            alvo.id: atribuicao.value.value
+            for atribuicao in no.body
+            if isinstance(atribuicao, ast.Assign)
+            and isinstance(atribuicao.value, ast.Constant)
+            and isinstance(atribuicao.value.value, str)
+            for alvo in atribuicao.targets
+            if isinstance(alvo, ast.Name)
+        }
+        nome = atributos.get("nome")
+        url = atributos.get("url")
+        if nome is None:
+            # nome calculado: só importando para saber
+            cls = getattr(importlib.import_module(modulo), no.name)
+            nome, url = cls.nome, getattr(cls, "url", None)
+        entradas.append({"nome": nome, "url": url, "modulo": modulo, "classe": no.name})
+    return entradas
+
+
+def _caminho_cache(pasta: str) -> str:
+    return os.path.join(pasta, "__pycache__", "manifesto.json")
+
+
+def _ler_cache(pasta: str) -> dict:
+    try:
+        with open(_caminho_cache(pasta), encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache.get("arquivos", {}) if cache.get("versao") == _VERSAO_CACHE else {}
+
+
+def _gravar_cache(pasta: str, arquivos: dict):
+    caminho = _caminho_cache(pasta)
+    try:
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        temporario = f"{caminho}.{os.getpid()}"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump({"versao": _VERSAO_CACHE, "arquivos": arquivos}, f)
+        os.replace(temporario, caminho)
+    except OSError:
+        pass  # pasta só de leitura: o manifesto é montado de novo na próxima vez
+
+
+def manifesto(recarregar: bool = False) -> dict[str, dict]:
+    """
+    Os provedores disponíveis, por nome: {'nome', 'url', 'modulo', 'classe'}.
+    Só os módulos alterados desde a última chamada (nesta ou em outra execução)
+    são lidos de novo; `recarregar=True` ignora o cache.
+    """
+    global _manifesto
+    if _manifesto is not None and not recarregar:
+        return _manifesto
+
+    import app.providers as pacote
+    pasta = pacote.__path__[0]
+    cache = {} if recarregar else _ler_cache(pasta)
+
+    arquivos = {}
+    for _, modname, ispkg in pkgutil.iter_modules(pacote.__path__):
+        caminho = os.path.join(pasta, modname, "__init__.py") if ispkg else os.path.join(pasta, f"{modname}.py")
+        try:
+            st = os.stat(caminho)
+        except OSError:
+            continue  # só o .pyc, ou extensão compilada: fora do manifesto
+
+        assinatura = [st.st_mtime_ns, st.st_size]
+        anterior = cache.get(modname)
+        if anterior and anterior["assinatura"] == assinatura:
+            arquivos[modname] = anterior
+            continue
+
+        modulo = f"{pacote.__name__}.{modname}"
+        try:
+            entradas = _ler_modulo(caminho, modulo)
+        except Exception as e:
+            print(f"[warn] não foi possível ler {modulo}: {e}")
+            continue
+        arquivos[modname] = {"assinatura": assinatura, "provedores": entradas}
+
+    if arquivos != cache:
+        _gravar_cache(pasta, arquivos)
+
+    _manifesto = {}
+    for modname in sorted(arquivos):
+        for entrada in arquivos[modname]["provedores"]:
+            if entrada["nome"] in _manifesto:
+                print(f"[warn] provedor {entrada['nome']} declarado em {_manifesto[entrada['nome']]['modulo']} e em {entrada['modulo']}")
+                continue
+            _manifesto[entrada["nome"]] = entrada
+    return _manifesto
+
+
+def carregar(modulo: str, nome: str) -> type:
+    """
+    Importa `modulo` (só agora) e devolve a classe do provedor `nome`.
+    Levanta ImportError se o módulo não importa e LookupError se a classe
+    não está nele.
+    """
+    mod = importlib.import_module(modulo)
+
+    cls = _CLASSES.get(nome)
+    if cls is not None and cls.__module__ == modulo:
+        return cls
+
+    entrada = manifesto().get(nome)
+    if entrada is not None and entrada["modulo"] == modulo:
+        cls = getattr(mod, entrada["classe"], None)
+        if cls is not None:
+            return cls
+
+    # módulo fora do manifesto (ex.: provedor registrado de outro pacote)
+    for attr in dir(mod):
+        obj = getattr(mod, attr)
+        if isinstance(obj, type) and getattr(obj, "nome", None) == nome:
+            return obj
+    raise LookupError(f"classe do provedor {nome} não encontrada em {modulo}")
@@ -1,78 +1,140 @@
-from typing import Optional, List, Tuple
-import importlib
-import pkgutil
+from typing import Optional, List, Tuple, AsyncIterator, TYPE_CHECKING
 import inspect
 import asyncio
+import contextlib
+import os
+import socket
+import time
 
-from sqlalchemy import select, func
+from sqlalchemy import select, func, tuple_
 from app.db import async_session
-from app.models import Provedor, Manga, Capitulo
-from app.core.base_provedor import BaseProvedor
+from app.models import Provedor, Manga, Capitulo, CapituloProvedor
+from app.core import blobs, bulk, busca, casamento, fila, registro
+
+# BaseProvedor (e com ele o httpx) e o downloader só são importados pelos
+# comandos que usam a rede, não por stats, buscar, listar...
+if TYPE_CHECKING:
+    from app.core.base_provedor import BaseProvedor
 
 async def registrar_provedores():
-    import app.providers
-    package = app.providers
-    
+    # o manifesto lê os provedores sem importá-los
+    provedores = registro.manifesto(recarregar=True)
+
     async with async_session() as session:
         async with session.begin():
-            for _, modname, _ in pkgutil.iter_modules(package.__path__):
-                modulo = f"app.providers.{modname}"
-                mod = importlib.import_module(modulo)
-                
-                for attr in dir(mod):
-                    obj = getattr(mod, attr)
-
-                    # Apenas subclasses concretas de BaseProvedor
-                    if isinstance(obj, type) and issubclass(obj, BaseProvedor) and obj is not BaseProvedor:
-                        with session.no_autoflush:
-                            # Verifica se já existe no banco
-                            result = await session.execute(
-                                select(Provedor).where(Provedor.modulo == modulo)
-                            )
-                            existing = result.scalar_one_or_none()
-                            if existing:
-                                continue
-
-                            # Adiciona o provedor
-                            provedor = Provedor(
-                                nome=obj.nome,  # já é string correta
-                                url=getattr(obj, "url", None),
-                                modulo=modulo
-                            )
-                            session.add(provedor)
+            result = await session.execute(select(Provedor.modulo))
+            registrados = set(result.scalars())
+
+            for entrada in provedores.values():
+                # um provedor por módulo
+                if entrada["modulo"] in registrados:
+                    continue
+                registrados.add(entrada["modulo"])
+
+                session.add(Provedor(
+                    nome=entrada["nome"],
+                    url=entrada["url"],
+                    modulo=entrada["modulo"],
+                ))
                         
-async def buscar_mangas_no_banco(query: str):
+# colunas devolvidas pelas listagens (linhas leves em vez de objetos do ORM)
+_COLUNAS_MANGA = (Manga.id, Manga.titulo, Manga.alter_title, Manga.autor, Manga.descricao)
+
+async def buscar_mangas_no_banco(query: str, limite: Optional[int] = 50, pagina: int = 1):
     """
-    Busca mangas pelo título ou título alternativo.
+    Busca mangas pelo título ou título alternativo, sem diferenciar acentos,
+    tolerando erros de digitação e com os mais relevantes primeiro.
+    `limite` resultados por página (None = todos), `pagina` começando em 1.
+    Com `query` vazia, lista todos em ordem alfabética.
     Retorna lista de dicionários.
     """
+    offset = (pagina - 1) * limite if limite else 0
+
     async with async_session() as session:
+        if query.strip():
+            return await busca.buscar(session, query, limite, offset)
+
         result = await session.execute(
-            select(Manga).where(
-                (Manga.titulo.ilike(f"%{query}%")) |
-                (Manga.alter_title.ilike(f"%{query}%"))
-            )
+            select(*_COLUNAS_MANGA)
+            .order_by(Manga.titulo, Manga.id)
+            .limit(limite)
+            .offset(offset)
         )
-        mangas = result.scalars().all()
         # Converter para lista de dicts
-        return [
-            {
-                "id": m.id,
-                "titulo": m.titulo,
-                "alter_title": m.alter_title,
-                "autor": m.autor,
-                "descricao": m.descricao
-            } for m in mangas
-        ]
-
-async def sincronizar_provedores(provedores: Optional[List[str]] = None):
-    """
-    Importa provedores do package app.providers, filtra pelos nomes passados (se houver)
-    e chama instance.sincronizar_mangas() para cada um.
+        return [dict(row._mapping) for row in result]
+
+async def listar_mangas(apos: Optional[Tuple[str, int]] = None, limite: int = 100) -> List[dict]:
+    """
+    Uma página da listagem em ordem alfabética (paginação por keyset).
+    `apos` é o (titulo, id) do último mangá da página anterior; cada página
+    custa o mesmo, não importa quão longe na listagem ela esteja.
+    """
+    stmt = select(*_COLUNAS_MANGA).order_by(Manga.titulo, Manga.id).limit(limite)
+    if apos is not None:
+        stmt = stmt.where(tuple_(Manga.titulo, Manga.id) > tuple_(*apos))
+
+    async with async_session() as session:
+        result = await session.execute(stmt)
+        return [dict(row._mapping) for row in result]
+
+async def iter_mangas_no_banco(tamanho_lote: int = 500) -> AsyncIterator[dict]:
+    """
+    Todos os mangás em ordem alfabética, um de cada vez, por um cursor no
+    servidor: só `tamanho_lote` linhas ficam na memória e a primeira chega
+    sem esperar a consulta inteira.
+    """
+    async with async_session() as session:
+        result = await session.stream(
+            select(*_COLUNAS_MANGA)
+            .order_by(Manga.titulo, Manga.id)
+            .execution_options(yield_per=tamanho_lote)
+        )
+        async for row in result:
+            yield dict(row._mapping)
+
+async def iter_buscar_mangas(query: str, tamanho_pagina: int = 50) -> AsyncIterator[dict]:
+    """
+    Todos os resultados da busca, por relevância, buscados página a página.
+    Com `query` vazia, todos os mangás em ordem alfabética, paginados por
+    keyset (`listar_mangas`): a última página custa o mesmo que a primeira.
+    """
+    if not query.strip():
+        apos = None
+        while True:
+            pagina = await listar_mangas(apos, limite=tamanho_pagina)
+            for r in pagina:
+                yield r
+            if len(pagina) < tamanho_pagina:
+                return
+            apos = (pagina[-1]["titulo"], pagina[-1]["id"])
+
+    async with async_session() as session:
+        async for r in busca.iter_buscar(session, query, tamanho_pagina):
+            yield r
+
+async def sincronizar_provedores(
+    provedores: Optional[List[str]] = None,
+    concorrencia: Optional[int] = None,
+    paralelo: bool = False,
+    incremental: bool = False,
+    retomar: bool = False,
+    processos: Optional[int] = None,
+):
+    """
+    Carrega os provedores registrados no banco, filtra pelos nomes passados (se houver)
+    e chama instance.sincronizar_mangas() para cada um; só os módulos dos
+    provedores escolhidos são importados.
     Suporta métodos async e sync (faz await se for coroutine).
+    `concorrencia` sobrescreve o limite de buscas simultâneas de cada provedor.
+    Com `paralelo=True` todos os provedores rodam ao mesmo tempo, cada um com sua
+    própria sessão de banco; a falha de um não interrompe os outros.
+    Com `incremental=True` cada provedor pula o que não mudou desde a última execução.
+    Com `retomar=True` cada provedor continua sua última execução interrompida.
+    Com `processos`, o parse do HTML de todos os provedores roda nesse número
+    de processos (o processo principal fica só com a rede e o banco).
+    Retorna a lista de resumos por provedor (também impressa no final).
     """
-    # importa o pacote de provedores só aqui (evita execução no import do módulo)
-    import app.providers as providers_package
+    from app.core.base_provedor import BaseProvedor
 
     # pegar lista de provedores do banco
     async with async_session() as session:
@@ -83,55 +145,331 @@ async def sincronizar_provedores(provedores: Optional[List[str]] = None):
     if provedores:
         db_provedores = [p for p in db_provedores if p.nome in provedores]
 
-    for p in db_provedores:
-        # importa o módulo do provedor dinamicamente
-        try:
-            mod = importlib.import_module(p.modulo)
-        except Exception as e:
-            # falha ao importar módulo: pula e segue
-            print(f"[warn] não foi possível importar {p.modulo}: {e}")
-            continue
+    kwargs = {}
+    if concorrencia:
+        kwargs["concorrencia"] = concorrencia
+    if incremental:
+        kwargs["incremental"] = True
+    if retomar:
+        kwargs["retomar"] = True
 
-        # encontra a classe dentro do módulo cuja .nome bate com p.nome
-        cls = None
-        for attr in dir(mod):
-            obj = getattr(mod, attr)
-            if isinstance(obj, type) and getattr(obj, "nome", None) == p.nome:
-                cls = obj
-                break
+    # um índice de títulos para todos os provedores: o mangá que um deles
+    # acabou de criar já casa com a grafia dos outros
+    async with async_session() as session:
+        BaseProvedor.casador = await casamento.CasadorTitulos.carregar(session)
 
-        if cls is None:
-            print(f"[warn] classe do provedor {p.nome} não encontrada em {p.modulo}")
-            continue
+    if processos:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        # spawn: os processos não herdam o event loop, as conexões nem as threads deste
+        BaseProvedor.executor = ProcessPoolExecutor(
+            max_workers=processos, mp_context=multiprocessing.get_context("spawn")
+        )
+        print(f"[*] Parse de HTML em {processos} processos")
 
-        instance = cls()  # instancia o provedor
+    try:
+        if paralelo:
+            resumos = await asyncio.gather(
+                *(_sincronizar_provedor(p, kwargs) for p in db_provedores)
+            )
+        else:
+            resumos = [await _sincronizar_provedor(p, kwargs) for p in db_provedores]
+    finally:
+        BaseProvedor.casador = None
+        if BaseProvedor.executor is not None:
+            BaseProvedor.executor.shutdown(cancel_futures=True)
+            BaseProvedor.executor = None
 
-        sync_fn = getattr(instance, "sincronizar_mangas", None)
-        if sync_fn is None:
-            print(f"[warn] provedor {p.nome} não implementa sincronizar_mangas()")
-            continue
+    resumos = [r for r in resumos if r is not None]
+    _imprimir_resumo(resumos)
+    return resumos
 
-        try:
+def _carregar_provedor(p: Provedor) -> Optional["BaseProvedor"]:
+    """Importa o módulo do provedor e devolve uma instância da sua classe."""
+    try:
+        cls = registro.carregar(p.modulo, p.nome)
+    except LookupError as e:
+        print(f"[warn] {e}")
+        return None
+    except Exception as e:
+        # falha ao importar módulo: pula e segue
+        print(f"[warn] não foi possível importar {p.modulo}: {e}")
+        return None
+    return cls()  # instancia o provedor
+
+async def _sincronizar_provedor(p: Provedor, kwargs: dict) -> Optional[dict]:
+    """
+    Roda a sincronização de um provedor isolando suas falhas.
+    Retorna {'provedor', 'duracao', 'mangas', 'capitulos', 'falhas', 'erro'}.
+    """
+    instance = _carregar_provedor(p)
+    if instance is None:
+        return None
+
+    sync_fn = getattr(instance, "sincronizar_mangas", None)
+    if sync_fn is None:
+        print(f"[warn] provedor {p.nome} não implementa sincronizar_mangas()")
+        return None
+
+    resumo = {"provedor": p.nome, "duracao": 0.0, "mangas": 0, "capitulos": 0, "falhas": 0, "erro": None}
+    inicio = time.perf_counter()
+
+    try:
+        # a sessão HTTP do provedor é devolvida ao pool mesmo se der erro
+        async with instance:
             # se for função async definida com "async def"
             if inspect.iscoroutinefunction(sync_fn):
-                await sync_fn()
+                resultado = await sync_fn(**kwargs)
             else:
                 # pode ser função sync; se retornar coroutine, await também
-                maybe = sync_fn()
-                if asyncio.iscoroutine(maybe):
-                    await maybe
+                resultado = sync_fn(**kwargs)
+                if asyncio.iscoroutine(resultado):
+                    resultado = await resultado
+        if isinstance(resultado, dict):
+            resumo["mangas"] = resultado.get("mangas", 0)
+            resumo["capitulos"] = resultado.get("capitulos", 0)
+            resumo["falhas"] = resultado.get("falhas", 0)
+    except Exception as e:
+        # não interrompe a sincronização dos outros provedores
+        print(f"[error] erro sincronizando {p.nome}: {e}")
+        resumo["erro"] = str(e) or type(e).__name__
+
+    resumo["duracao"] = time.perf_counter() - inicio
+    return resumo
+
+def _imprimir_resumo(resumos: List[dict]):
+    if not resumos:
+        return
+
+    print("\n=== Resumo da sincronização ===")
+    for r in resumos:
+        status = f"erro: {r['erro']}" if r["erro"] else "ok"
+        print(
+            f"{r['provedor']:<15} {r['duracao']:>8.1f}s  "
+            f"mangás: {r['mangas']:<6} capítulos: {r['capitulos']:<7} "
+            f"falhas: {r['falhas']:<5} {status}"
+        )
+
+async def baixar_manga(
+    manga_id: int, destino: str = "downloads", formato: str = "pastas", **opcoes
+) -> Optional[dict]:
+    """
+    Baixa os capítulos pendentes do mangá por cada provedor que tem algum deles.
+    `formato` é 'pastas' (uma pasta de imagens por capítulo), 'cbz' ou 'blobs'.
+    O primeiro provedor que conseguir baixar um capítulo o marca como baixado,
+    e os seguintes só tentam o que ainda falta.
+    Retorna o total {'capitulos', 'falhas', 'paginas', 'bytes', 'duracao'}.
+    """
+    async with async_session() as session:
+        manga = await session.get(Manga, manga_id)
+        if manga is None:
+            print(f"[!] Mangá {manga_id} não encontrado")
+            return None
+
+        result = await session.execute(
+            select(Provedor)
+            .join(CapituloProvedor, CapituloProvedor.provedor_id == Provedor.id)
+            .join(Capitulo, Capitulo.id == CapituloProvedor.capitulo_id)
+            .where(
+                Capitulo.manga_id == manga_id,
+                Capitulo.baixado.is_(False),
+                CapituloProvedor.removido_em.is_(None),
+            )
+            .distinct()
+        )
+        db_provedores = result.scalars().all()
+
+    total = {"capitulos": 0, "falhas": 0, "paginas": 0, "bytes": 0, "duracao": 0.0}
+    if not db_provedores:
+        print(f"[-] Nenhum capítulo pendente de '{manga.titulo}'")
+        return total
+
+    for p in db_provedores:
+        instance = _carregar_provedor(p)
+        if instance is None:
+            continue
+
+        try:
+            async with instance:
+                resultado = await instance.baixar_mangas(manga_id, destino=destino, formato=formato, **opcoes)
         except Exception as e:
-            print(f"[error] erro sincronizando {p.nome}: {e}")
-            # não interrompe a sincronização dos outros provedores
+            print(f"[error] erro baixando '{manga.titulo}' de {p.nome}: {e}")
             continue
 
-async def obter_estatisticas() -> Tuple[int, int, int]:
+        for chave in total:
+            total[chave] += resultado.get(chave, 0)
+
+    return total
+
+async def enfileirar_downloads(manga_id: Optional[int] = None) -> int:
+    """Coloca na fila de downloads os capítulos não baixados. Retorna quantos entraram."""
+    async with async_session() as session:
+        n = await fila.enfileirar(session, manga_id)
+        await session.commit()
+    return n
+
+async def executar_worker(
+    nome: Optional[str] = None,
+    destino: str = "downloads",
+    formato: str = "pastas",
+    lote: int = 20,
+    lease: float = fila.LEASE_PADRAO,
+    intervalo: float = 5.0,
+    uma_vez: bool = False,
+    **opcoes,
+) -> dict:
+    """
+    Worker da fila de downloads. Vários podem rodar ao mesmo tempo, em processos
+    ou máquinas diferentes, apontando para o mesmo banco: cada um reivindica
+    lotes de `lote` jobs (SKIP LOCKED), renova o lease enquanto baixa e devolve
+    o resultado. Com `uma_vez=True` termina quando não há mais job disponível
+    (os que falharam e estão esperando a próxima tentativa ficam); senão espera
+    `intervalo` segundos e consulta de novo. `formato` é 'pastas', 'cbz' ou 'blobs'.
+    `opcoes` vão para o Downloader (max_simultaneos, max_por_host, ...).
+    """
+    from app.core.downloader import Downloader, criar_saida
+
+    nome = nome or f"{socket.gethostname()}:{os.getpid()}"
+    print(f"[*] Worker {nome} iniciado (lote: {lote}, lease: {lease:.0f}s)")
+
+    async with async_session() as session:
+        result = await session.execute(select(Provedor))
+        db_provedores = {p.id: p for p in result.scalars().all()}
+
+    async def concluir(ids):
+        async with async_session() as session:
+            await fila.concluir(session, ids)
+
+    downloader = Downloader(criar_saida(formato, destino), ao_concluir=concluir, **opcoes)
+    instancias = {}
+    inicio = time.perf_counter()
+
+    async with contextlib.AsyncExitStack() as pilha:
+
+        async def provedor(provedor_id: int):
+            # uma instância (e sessão HTTP) por provedor durante toda a vida do worker
+            if provedor_id not in instancias:
+                instance = _carregar_provedor(db_provedores[provedor_id])
+                if instance is not None:
+                    await pilha.enter_async_context(instance)
+                instancias[provedor_id] = instance
+            return instancias[provedor_id]
+
+        while True:
+            async with async_session() as session:
+                jobs = await fila.reivindicar(session, nome, lote, lease)
+
+            if not jobs:
+                if uma_vez:
+                    break
+                await asyncio.sleep(intervalo)
+                continue
+
+            job_ids = [j["job_id"] for j in jobs]
+            heartbeat = asyncio.create_task(_manter_leases(nome, job_ids, lease))
+            downloader.falhos.clear()
+            sem_provedor = {}
+            try:
+                itens = []
+                for j in jobs:
+                    links = [link for link in j["links"] if link[0] in db_provedores]
+                    if not links:
+                        sem_provedor[j["capitulo"]["id"]] = "nenhum provedor disponível"
+                        continue
+                    # a cada nova tentativa usa o próximo provedor que tem o capítulo
+                    provedor_id, url = links[(j["tentativas"] - 1) % len(links)]
+                    instance = await provedor(provedor_id)
+                    if instance is None:
+                        sem_provedor[j["capitulo"]["id"]] = f"provedor {provedor_id} indisponível"
+                        continue
+                    itens.append((instance, j["manga"], {**j["capitulo"], "url": url}))
+
+                await downloader.baixar_capitulos(itens)
+            except BaseException:
+                # interrompido (ex.: Ctrl+C): o que não terminou volta para a fila
+                heartbeat.cancel()
+                async with async_session() as session:
+                    await fila.liberar(session, nome, job_ids)
+                raise
+            finally:
+                heartbeat.cancel()
+
+            falhos = {**sem_provedor, **downloader.falhos}
+            if falhos:
+                async with async_session() as session:
+                    await fila.falhar(session, nome, falhos)
+
+    return downloader.resumo(time.perf_counter() - inicio)
+
+async def _manter_leases(worker: str, job_ids: List[int], lease: float):
+    """Heartbeat: renova o lease dos jobs a cada terço do prazo."""
+    while True:
+        await asyncio.sleep(lease / 3)
+        async with async_session() as session:
+            ativos = await fila.renovar(session, worker, job_ids, lease)
+        if ativos < len(job_ids):
+            print(f"[warn] {len(job_ids) - ativos} jobs do lote não pertencem mais a {worker}")
+
+async def listar_duplicados(limiar: float = casamento.LIMIAR_SUGESTAO) -> List[dict]:
+    """
+    Pares de mangás com títulos parecidos (possíveis duplicados entre provedores),
+    do mais para o menos parecido: [{'manga', 'outro', 'similaridade'}], onde
+    manga e outro são {'id', 'titulo', 'alter_title', 'capitulos'}.
+    """
+    async with async_session() as session:
+        casador = await casamento.CasadorTitulos.carregar(session)
+        pares = casador.duplicados(limiar)
+
+        mangas = {}
+        for chunk in bulk._chunks(list({i for a, b, _ in pares for i in (a, b)})):
+            result = await session.execute(
+                select(Manga.id, Manga.titulo, Manga.alter_title, func.count(Capitulo.id).label("capitulos"))
+                .outerjoin(Capitulo, Capitulo.manga_id == Manga.id)
+                .where(Manga.id.in_(chunk))
+                .group_by(Manga.id, Manga.titulo, Manga.alter_title)
+            )
+            mangas.update({row.id: dict(row._mapping) for row in result})
+
+    return [
+        {"manga": mangas[a], "outro": mangas[b], "similaridade": similaridade}
+        for a, b, similaridade in pares
+    ]
+
+async def mesclar_mangas(manter_id: int, remover_id: int) -> Optional[dict]:
+    """
+    Junta o mangá `remover_id` (capítulos, ligações com provedores, título) em
+    `manter_id` e apaga o primeiro. Retorna {'movidos', 'repetidos'} ou None se
+    algum dos dois não existir.
+    """
+    async with async_session() as session:
+        try:
+            resultado = await casamento.mesclar_mangas(session, manter_id, remover_id)
+        except ValueError as e:
+            print(f"[!] {e}")
+            return None
+        await session.commit()
+
+    # sync em andamento: o índice de títulos dele também passa a casar com o mantido
+    from app.core.base_provedor import BaseProvedor
+    if BaseProvedor.casador is not None:
+        BaseProvedor.casador.mesclar(manter_id, remover_id)
+    return resultado
+
+async def coletar_blobs(destino: str = "downloads", carencia: float = 3600) -> dict:
+    """Apaga do armazém de blobs em `destino` as imagens que nenhum capítulo usa."""
+    armazem = blobs.ArmazemBlobs(os.path.join(destino, "blobs"))
+    async with async_session() as session:
+        return await blobs.coletar(session, armazem, carencia)
+
+async def obter_estatisticas() -> Tuple[int, int, int, dict]:
     """
-    Retorna (n_provedores, n_mangas, n_capitulos) como ints.
+    Retorna (n_provedores, n_mangas, n_capitulos, fila), onde fila é
+    {'pendente', 'executando', 'concluido', 'falhou', 'por_hora'} da fila de downloads.
     Usa func.count() corretamente.
     """
     async with async_session() as session:
         provs = await session.scalar(select(func.count(Provedor.id)))
         mangas = await session.scalar(select(func.count(Manga.id)))
         caps = await session.scalar(select(func.count(Capitulo.id)))
-        return int(provs or 0), int(mangas or 0), int(caps or 0)
\ No newline at end of file
+        stats_fila = await fila.estatisticas(session)
+        return int(provs or 0), int(mangas or 0), int(caps or 0), stats_fila
\ No newline at end of file
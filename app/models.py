@@ -1,5 +1,5 @@
 from sqlalchemy.orm import declarative_base, relationship
-from sqlalchemy import Column, Integer, String, ForeignKey, UniqueConstraint, Float, Boolean
+from sqlalchemy import Column, Integer, BigInteger, String, ForeignKey, UniqueConstraint, Float, Boolean, DateTime, func
 
 Base = declarative_base()
 
@@ -53,6 +53,12 @@ class CapituloProvedor(Base):
     capitulo_id = Column(Integer, ForeignKey("capitulos.id"), nullable=False)
     provedor_id = Column(Integer, ForeignKey("provedores.id"), nullable=False)
     url = Column(String, nullable=False)
+    # o provedor tirou o capítulo da lista (None = continua lá)
+    removido_em = Column(DateTime(timezone=True), nullable=True)
+    # URL de antes da última troca feita pelo provedor
+    url_anterior = Column(String, nullable=True)
+    # última remoção, volta ou troca de URL
+    alterado_em = Column(DateTime(timezone=True), nullable=True)
     
     capitulo = relationship("Capitulo", back_populates="provedores")
     provedor = relationship("Provedor", back_populates="capitulos")
@@ -61,6 +67,123 @@ class CapituloProvedor(Base):
         UniqueConstraint("capitulo_id", "provedor_id", name="uq_capitulo_por_provedor"),
     )
     
+class MarcaSync(Base):
+    """
+    Marca d'água da sincronização incremental: o que foi visto da última vez em
+    uma URL do provedor (página de listagem ou capítulos de um mangá).
+    """
+    __tablename__ = "marcas_sync"
+    
+    id = Column(Integer, primary_key=True)
+    provedor_id = Column(Integer, ForeignKey("provedores.id"), nullable=False)
+    url = Column(String, nullable=False)
+    hash = Column(String, nullable=True)
+    etag = Column(String, nullable=True)
+    last_modified = Column(String, nullable=True)
+    atualizado_em = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    
+    __table_args__ = (
+        UniqueConstraint("provedor_id", "url", name="uq_marca_por_provedor"),
+    )
+    
+class TituloAlternativo(Base):
+    """
+    Títulos de mangás que foram mesclados em outro: o casador continua
+    reconhecendo essas grafias, e o sync não recria o mangá apagado.
+    """
+    __tablename__ = "titulos_alternativos"
+    
+    id = Column(Integer, primary_key=True)
+    manga_id = Column(Integer, ForeignKey("mangas.id"), nullable=False, index=True)
+    titulo = Column(String, unique=True, nullable=False)
+    
+class ImpressaoCapitulos(Base):
+    """
+    Impressão digital da lista de capítulos de um mangá em um provedor (hash
+    dos números e URLs), da última sincronização: lista com a mesma impressão
+    não mudou e não precisa ser comparada capítulo a capítulo.
+    """
+    __tablename__ = "impressoes_capitulos"
+    
+    id = Column(Integer, primary_key=True)
+    manga_id = Column(Integer, ForeignKey("mangas.id"), nullable=False)
+    provedor_id = Column(Integer, ForeignKey("provedores.id"), nullable=False)
+    impressao = Column(String, nullable=False)
+    capitulos = Column(Integer, nullable=False, default=0)
+    atualizado_em = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    
+    __table_args__ = (
+        UniqueConstraint("manga_id", "provedor_id", name="uq_impressao_por_provedor"),
+    )
+    
+class ExecucaoSync(Base):
+    """
+    Uma execução de sincronização de um provedor, com o ponto onde parou.
+    `cursor` é a última página da listagem com todos os mangás já gravados;
+    `cli.py sync --resume` continua da página seguinte.
+    """
+    __tablename__ = "sync_runs"
+    
+    id = Column(Integer, primary_key=True)
+    provedor_id = Column(Integer, ForeignKey("provedores.id"), nullable=False, index=True)
+    status = Column(String, nullable=False, default="executando")  # executando, concluida, falhou
+    incremental = Column(Boolean, nullable=False, default=False)
+    cursor = Column(Integer, nullable=False, default=0)
+    mangas = Column(Integer, nullable=False, default=0)
+    capitulos = Column(Integer, nullable=False, default=0)
+    falhas = Column(Integer, nullable=False, default=0)
+    erro = Column(String, nullable=True)
+    iniciado_em = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    atualizado_em = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    finalizado_em = Column(DateTime(timezone=True), nullable=True)
+    
+class JobDownload(Base):
+    """
+    Capítulo na fila de download, compartilhada por todos os workers (`cli.py worker`).
+    Um worker reivindica o job com SELECT ... FOR UPDATE SKIP LOCKED e o segura
+    até `lease_ate`, renovando enquanto baixa; lease vencido volta para a fila.
+    """
+    __tablename__ = "download_jobs"
+    
+    id = Column(Integer, primary_key=True)
+    capitulo_id = Column(Integer, ForeignKey("capitulos.id"), nullable=False, unique=True)
+    status = Column(String, nullable=False, default="pendente", index=True)  # pendente, executando, concluido, falhou
+    tentativas = Column(Integer, nullable=False, default=0)
+    worker = Column(String, nullable=True)
+    lease_ate = Column(DateTime(timezone=True), nullable=True)
+    # depois de uma falha, o job só volta a ser reivindicável a partir daqui
+    disponivel_em = Column(DateTime(timezone=True), nullable=True)
+    erro = Column(String, nullable=True)
+    criado_em = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    atualizado_em = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    concluido_em = Column(DateTime(timezone=True), nullable=True)
+    
+class Blob(Base):
+    """
+    Imagem guardada uma única vez no armazém de blobs, pelo sha256 do conteúdo.
+    `refs` é quantas páginas de capítulos apontam para ela; com 0 o gc pode apagar.
+    """
+    __tablename__ = "blobs"
+    
+    hash = Column(String, primary_key=True)
+    tamanho = Column(BigInteger, nullable=False)
+    refs = Column(Integer, nullable=False, default=0)
+    criado_em = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    
+class PaginaCapitulo(Base):
+    """Página `indice` de um capítulo baixado no armazém de blobs."""
+    __tablename__ = "paginas_capitulo"
+    
+    id = Column(Integer, primary_key=True)
+    capitulo_id = Column(Integer, ForeignKey("capitulos.id"), nullable=False, index=True)
+    indice = Column(Integer, nullable=False)
+    blob_hash = Column(String, ForeignKey("blobs.hash"), nullable=False, index=True)
+    extensao = Column(String, nullable=False)
+    
+    __table_args__ = (
+        UniqueConstraint("capitulo_id", "indice", name="uq_pagina_capitulo"),
+    )
+    
 class Config(Base):
     __tablename__ = "config"
     
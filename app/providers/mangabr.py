@@ -1,19 +1,18 @@
 import re, html, asyncio
 from urllib.parse import quote, urljoin
-from bs4 import BeautifulSoup
 
 from app.core.base_provedor import BaseProvedor
+from app.core.parser_html import documento
+from app.core.registro import registrar
 
+@registrar
 class MangaBR(BaseProvedor):
     nome = "MangaBR"
     url = "https://mangabr.org/"
     
     async def buscar_mangas(self, query: str) -> list:
-        if self.session is None:
-            await self.criar_sessao()
-
         url_pesquisa = self.url + "search?q=" + quote(query)
-        response = await self.session.get(url_pesquisa)
+        response = await self.requisitar("GET", url_pesquisa)
 
         if response.status_code == 200:
             # Pega o texto da resposta
@@ -26,104 +25,68 @@ class MangaBR(BaseProvedor):
 
         return ""
     
-    async def get_all_mangas(self) -> list:
-        if self.session is None:
-            await self.criar_sessao()
-
-        mangas = []
-        page = 1
-        while True:
-            # Corrigido: usar rstrip() para remover barra final
-            if page == 1:
-                url_pesquisa = self.url.rstrip("/") + "/manga"
-            else:
-                url_pesquisa = self.url.rstrip("/") + f"/manga?page={page}"
-
-            print(f"[*] Buscando página {page}: {url_pesquisa}")
-
-            try:
-                response = await self.session.get(url_pesquisa)
-            except Exception as e:
-                print(f"[!] Erro ao acessar {url_pesquisa}: {e}")
-                break
-
-            if response.status_code != 200 or not response.text.strip():
-                print(f"[!] Página {page} não encontrada ou vazia. Encerrando.")
-                break
-
-            soup = BeautifulSoup(response.text, "html.parser")
-
-            # Corrigido: seletor CSS precisa do ponto
-            links = soup.select(".series .justify-content-center .link-series")
-
-            if not links:
-                print(f"[✓] Nenhum mangá encontrado na página {page}. Encerrando.")
-                break
-
-            for link in links:
-                mangas.append({
-                    "titulo": link.get_text(strip=True),
-                    "url": self.url.rstrip("/") + link.get("href")
-                })
-
-            page += 1
-
-        return mangas
+    def url_listagem(self, pagina: int) -> str:
+        # Corrigido: usar rstrip() para remover barra final
+        if pagina == 1:
+            return self.url.rstrip("/") + "/manga"
+        return self.url.rstrip("/") + f"/manga?page={pagina}"
+
+    def parse_listagem(self, html: str) -> list:
+        # Corrigido: seletor CSS precisa do ponto
+        doc = documento(html, somente=(".series",))
+        links = doc.selecionar(".series .justify-content-center .link-series")
+
+        return [
+            {
+                "titulo": link.texto(),
+                "url": self.url.rstrip("/") + link.attr("href")
+            } for link in links
+        ]
+
+    def total_paginas(self, html: str) -> int | None:
+        doc = documento(html, somente=(".pagination",))
+        paginas = [
+            int(m.group(1))
+            for a in doc.selecionar(".pagination a[href]")
+            if (m := re.search(r"[?&]page=(\d+)", a.attr("href")))
+        ]
+        return max(paginas) if paginas else None
     
     async def get_manga_details(self, url: str) -> dict:
         raise NotImplementedError
     
-    async def get_chapters(self, url: str) -> list:
-        if self.session is None:
-            await self.criar_sessao()
-            
+    async def get_chapters(self, url: str) -> list | None:
         chapters = []
         
         print(f"[*] Carregando capítulos pela URL: {url}")
         
         try:
-            response = await self.session.get(url, headers={
+            response = await self.requisitar("GET", url, marca=url, headers={
                 "User-Agent": "Mozilla/5.0",
                 "X-Requested-With": "XMLHttpRequest"
             })
         except Exception as e:
             print(f"[!] Erro ao acessar {url}: {e}")
-            return chapters
+            raise
+
+        if self.inalterado(url):
+            print(f"[-] Capítulos sem mudanças em {url}")
+            return None
         
-        if response.status_code != 200 or not response.text.strip():
+        if response.status_code != 200 or not response.content.strip():
             print(f"[!] Resposta vazia ou erro {response.status_code} em {url}")
             return chapters
         
-        soup = BeautifulSoup(response.text, "html.parser")
-        links = soup.select(".col-chapter a")
-        
-        print(f"[*] Links de capítulos encontrados: {len(links)}")
-        
-        for link in links:
-            href = self.url.rstrip("/") + link.get("href")
+        registros = await self.analisar(self.parse_capitulos, response)
 
-            # pega só o <h5> dentro do <a>
-            h5 = link.find("h5")
-            if not h5:
-                continue
-            
-            text_parts = [t.strip() for t in h5.find_all(string=True, recursive=False) if t.strip()]
-            text = " ".join(text_parts)  # ex: "Capítulo 281"
-            
-            if not href or not text:
-                continue
-            
-            numero, titulo = await self.parse_chapter(text)
-            
+        print(f"[*] Links de capítulos encontrados: {len(registros)}")
+
+        for numero, titulo, href in registros:
             if numero is None:
                 print(f"[!] Capítulo sem número detectado: '{titulo}' — pulando...")
                 continue  # ou numero = 0 se quiser inserir mesmo assim
 
-            chapters.append({
-                "numero": numero,
-                "titulo": titulo,  # usa só o título parseado
-                "url": href if href.startswith("http") else urljoin(self.url, href)
-            })
+            chapters.append({"numero": numero, "titulo": titulo, "url": href})
 
         # ordena capítulos por número
         chapters = sorted(chapters, key=lambda x: x["numero"] if x["numero"] else 0)
@@ -131,7 +94,7 @@ class MangaBR(BaseProvedor):
         print(f"[*] Total de capítulos extraídos: {len(chapters)}")
         return chapters
 
-    async def parse_chapter(self, text: str) -> tuple[int | float | None, str]:
+    def numero_capitulo(self, text: str) -> tuple[int | float | None, str]:
         """
         Retorna (numero, titulo limpo)
         """
@@ -150,12 +113,42 @@ class MangaBR(BaseProvedor):
 
         return numero, titulo
     
-    async def sincronizar_mangas(self):
-        return await super().sincronizar_mangas()
-
-    async def baixar_mangas(self, manga_id):
+    async def sincronizar_mangas(
+        self,
+        concorrencia: int | None = None,
+        incremental: bool = False,
+        retomar: bool = False,
+    ):
+        return await super().sincronizar_mangas(concorrencia, incremental, retomar)
+
+    def parse_capitulos(self, html: str) -> list[tuple[int | float | None, str, str]]:
         """
-        Baixa os capítulos do manga informado.
-        Deve ser sobrescrito por cada provedor.
+        (numero, titulo, url) de cada capítulo da página do mangá; numero é
+        None quando o texto do capítulo não tem número.
         """
-        raise NotImplementedError
\ No newline at end of file
+        capitulos = []
+        for link in documento(html, somente=(".col-chapter",)).selecionar(".col-chapter a"):
+            href = self.url.rstrip("/") + (link.attr("href") or "")
+
+            # pega só o <h5> dentro do <a>, e só o texto dele (ex: "Capítulo 281")
+            h5 = link.primeiro("h5")
+            if not h5:
+                continue
+            text = h5.texto_direto()
+            if not text:
+                continue
+
+            numero, titulo = self.numero_capitulo(text)  # usa só o título parseado
+            url = href if href.startswith("http") else urljoin(self.url, href)
+            capitulos.append((numero, titulo, url))
+        return capitulos
+
+    def parse_paginas(self, html: str) -> list[str]:
+        doc = documento(html)
+
+        paginas = []
+        for img in doc.selecionar(".chapter-images img, #chapter-images img, .reading-content img"):
+            src = img.attr("data-src") or img.attr("data-lazy-src") or img.attr("src")
+            if src and src.strip():
+                paginas.append(src.strip())
+        return paginas
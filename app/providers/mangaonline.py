@@ -1,77 +1,63 @@
-from sqlalchemy.future import select
-from bs4 import BeautifulSoup
+import re
 from urllib.parse import urljoin, urlparse
 
-from app.db import async_session
-from app.models import Manga, Capitulo, CapituloProvedor, Provedor
 from app.core.base_provedor import BaseProvedor
+from app.core.parser_html import documento
+from app.core.registro import registrar
 
+@registrar
 class MangaOnline(BaseProvedor):
     nome = "MangaOnline"
     url = "https://mangaonline.blog/"
+    # /manga/ usa a ordem padrão "latest" do tema Madara (últimos atualizados primeiro)
+    listagem_por_atualizacao = True
 
     async def buscar_mangas(self, termo=""):
-        if self.session is None:
-            await self.criar_sessao()
-
         url_pesquisa = self.url + "?s=" + urlparse.quote(termo)
-        response = await self.session.get(url_pesquisa)
+        response = await self.requisitar("GET", url_pesquisa)
 
         if response.status_code == 200:
             return response.text
         return ""
 
-    async def get_all_mangas(self):
-        if self.session is None:
-            await self.criar_sessao()
-
-        mangas = []
-        page = 1
-        while True:
-            # Corrigido: usar rstrip() para remover barra final
-            if page == 1:
-                url_pesquisa = self.url.rstrip("/") + "/manga/"
-            else:
-                url_pesquisa = self.url.rstrip("/") + f"/manga/page/{page}/"
-
-            print(f"[*] Buscando página {page}: {url_pesquisa}")
-
-            try:
-                response = await self.session.get(url_pesquisa)
-            except Exception as e:
-                print(f"[!] Erro ao acessar {url_pesquisa}: {e}")
-                break
-
-            if response.status_code != 200 or not response.text.strip():
-                print(f"[!] Página {page} não encontrada ou vazia. Encerrando.")
-                break
-
-            soup = BeautifulSoup(response.text, "html.parser")
-
-            # Corrigido: seletor CSS precisa do ponto
-            links = soup.select(".post-title a")
-
-            if not links:
-                print(f"[✓] Nenhum mangá encontrado na página {page}. Encerrando.")
-                break
-
-            for link in links:
-                mangas.append({
-                    "titulo": link.get_text(strip=True),
-                    "url": link.get("href")
-                })
-
-            page += 1
-
-        return mangas
-
-    async def baixar_mangas(self, manga_id):
-        raise NotImplementedError
+    def url_listagem(self, pagina: int) -> str:
+        # Corrigido: usar rstrip() para remover barra final
+        if pagina == 1:
+            return self.url.rstrip("/") + "/manga/"
+        return self.url.rstrip("/") + f"/manga/page/{pagina}/"
+
+    def parse_listagem(self, html: str) -> list:
+        # Corrigido: seletor CSS precisa do ponto
+        links = documento(html, somente=(".post-title",)).selecionar(".post-title a")
+
+        return [
+            {
+                "titulo": link.texto(),
+                "url": link.attr("href")
+            } for link in links
+        ]
+
+    def total_paginas(self, html: str) -> int | None:
+        doc = documento(html, somente=(".wp-pagenavi", ".nav-links"))
+        paginas = [
+            int(m.group(1))
+            for a in doc.selecionar(".wp-pagenavi a[href], .nav-links a[href]")
+            if (m := re.search(r"/page/(\d+)/?", a.attr("href")))
+        ]
+        return max(paginas) if paginas else None
+
+    def parse_paginas(self, html: str) -> list[str]:
+        doc = documento(html, somente=(".reading-content",))
+
+        # leitor do tema Madara; imagens com lazy-load guardam a URL em data-src
+        paginas = []
+        for img in doc.selecionar(".reading-content .page-break img"):
+            src = img.attr("data-src") or img.attr("data-lazy-src") or img.attr("src")
+            if src and src.strip():
+                paginas.append(src.strip())
+        return paginas
     
-    async def get_chapters(self, url: str) -> list:
-        if self.session is None:
-            await self.criar_sessao()
-
+    async def get_chapters(self, url: str) -> list | None:
         chapters = []
 
         # monta a URL AJAX
@@ -83,41 +69,32 @@ class MangaOnline(BaseProvedor):
         print(f"[*] Carregando capítulos via AJAX: {ajax_url}")
 
         try:
-            response = await self.session.post(ajax_url, headers={
+            response = await self.requisitar("POST", ajax_url, marca=url, headers={
                 "User-Agent": "Mozilla/5.0",
                 "X-Requested-With": "XMLHttpRequest"
             })
         except Exception as e:
             print(f"[!] Erro ao acessar {ajax_url}: {e}")
-            return chapters
+            raise
 
-        if response.status_code != 200 or not response.text.strip():
+        if self.inalterado(url):
+            print(f"[-] Capítulos sem mudanças em {ajax_url}")
+            return None
+
+        if response.status_code != 200 or not response.content.strip():
             print(f"[!] Resposta vazia ou erro {response.status_code} em {ajax_url}")
             return chapters
 
-        soup = BeautifulSoup(response.text, "html.parser")
-        links = soup.select("li a")
+        registros = await self.analisar(self.parse_capitulos, response)
 
-        print(f"[*] Links de capítulos encontrados: {len(links)}")
+        print(f"[*] Links de capítulos encontrados: {len(registros)}")
 
-        for link in links:
-            href = link.get("href")
-            text = link.get_text(strip=True)
-            
-            if not href or not text:
-                continue
-            
-            numero, titulo = await self.parse_chapter(text)
-            
+        for numero, titulo, href in registros:
             if numero is None:
                 print(f"[!] Capítulo sem número detectado: '{titulo}' — pulando...")
                 continue  # ou numero = 0 se quiser inserir mesmo assim
 
-            chapters.append({
-                "numero": numero,
-                "titulo": text,
-                "url": href if href.startswith("http") else urljoin(self.url, href)
-            })
+            chapters.append({"numero": numero, "titulo": titulo, "url": href})
 
         # ordena capítulos por número
         chapters = sorted(chapters, key=lambda x: x["numero"] if x["numero"] else 0)
@@ -125,78 +102,18 @@ class MangaOnline(BaseProvedor):
         print(f"[*] Total de capítulos extraídos: {len(chapters)}")
         return chapters
 
+    def parse_capitulos(self, html: str) -> list[tuple[int | float | None, str, str]]:
+        """
+        (numero, titulo, url) de cada link da lista de capítulos devolvida pelo
+        AJAX; numero é None quando o texto do link não tem número.
+        """
+        capitulos = []
+        for link in documento(html, somente=("li",)).selecionar("li a"):
+            href, text = link.attr("href"), link.texto()
+            if not href or not text:
+                continue
 
-
-    async def sincronizar_mangas(self):
-        print(f"[*] Sincronizando mangás do provedor {self.nome}")
-        
-        # pega a lista de todos os mangas do server
-        mangas = await self.get_all_mangas()
-        
-        async with async_session() as session:
-            result = await session.execute(select(Provedor).where(Provedor.nome == self.nome))
-            db_prov = result.scalars().first()
-            self.db_provedor_id = db_prov.id
-
-            for m in mangas:
-                titulo = m["titulo"].strip()
-                
-                # checa se já existe no banco
-                result = await session.execute(
-                    select(Manga).where(Manga.titulo == titulo)
-                )
-                manga_db = result.scalars().first()
-                
-                if not manga_db:
-                    # se não existir, cria um novo manga
-                    manga_db = Manga(titulo=titulo)
-                    session.add(manga_db)
-                    await session.flush() # gera o id
-                    
-                # pega os caps existentes no banco
-                result = await session.execute(
-                    select(Capitulo).where(Capitulo.manga_id == manga_db.id)
-                )
-                
-                caps_existentes = result.scalars().all()
-                caps_existentes_dict = {float(c.numero): c for c in caps_existentes}
-                
-                # pega capitulos novos do provedor
-                capitulos = await self.get_chapters(m["url"])
-                
-                if len(capitulos) == len(caps_existentes):
-                    print(f"[-] Mangá '{titulo}' já sincronizado.")
-                    continue
-                
-                #adiciona caps que não existem
-                novos = 0
-                for cap in capitulos:
-                    if cap["numero"] not in caps_existentes_dict:
-                        novo_cap = Capitulo(
-                            manga_id=manga_db.id,
-                            numero=cap["numero"],
-                            titulo=cap.get("titulo"),
-                        )
-                        session.add(novo_cap)
-                        await session.flush()  # garante que novo_cap.id é gerado
-
-                        # 👉 Atualiza o dict para evitar inserir duplicados
-                        caps_existentes_dict[cap["numero"]] = novo_cap
-
-                        cap_prov = CapituloProvedor(
-                            capitulo_id=novo_cap.id,
-                            provedor_id=self.db_provedor_id,
-                            url=cap["url"]
-                        )
-                        session.add(cap_prov)
-                        novos += 1
-                    else:
-                        print(f"[!] Capítulo {cap['numero']} já existente em '{titulo}', ignorado.")
-
-                        
-                if novos > 0:
-                    print(f"[+] Mangá '{titulo}': {novos} capítulos adicionados.")
-                    
-            await session.commit()
-            
-        print(f"[✓] Sincronização de {self.nome} concluída!")
\ No newline at end of file
+            numero, _ = self.numero_capitulo(text)
+            url = href if href.startswith("http") else urljoin(self.url, href)
+            capitulos.append((numero, text, url))
+        return capitulos
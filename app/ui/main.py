@@ -1,6 +1,7 @@
 from textual.app import App, ComposeResult
-from textual.widgets import Button, Input, Static, Checkbox
-from app.crud import buscar_mangas_no_banco, sincronizar_provedores, obter_estatisticas
+from textual.widgets import Button, Input, Static, Checkbox, Log
+from app import db
+from app.crud import iter_buscar_mangas, iter_mangas_no_banco, sincronizar_provedores, obter_estatisticas
 
 class MangaApp(App):
     CSS_PATH = "styles.css"
@@ -20,10 +21,17 @@ class MangaApp(App):
         # Lista de provedores (checkbox)
         # Você pode popular dinamicamente via self.provedores
         yield Checkbox("MangaOnline", id="provider_mangaonline")
+
+        # resultados de busca/listagem, preenchidos conforme chegam
+        yield Log(id="resultados")
         
     async def on_mount(self) -> None:
         """Chamado automaticamente quando a UI está pronta."""
         await self.atualizar_stats()
+
+    async def on_unmount(self) -> None:
+        # o pool de conexões é do event loop da UI: fecha antes de ele acabar
+        await db.fechar()
         
     async def on_button_pressed(self, event: Button.Pressed):
         if event.button.id == "sync_button":
@@ -31,16 +39,26 @@ class MangaApp(App):
             await self.atualizar_stats()
         elif event.button.id == "search_button":
             query = self.query_one("#search_input").value
-            results = await buscar_mangas_no_banco(query)
-            print(results)
+            # exclusive: uma nova busca/listagem cancela a anterior
+            self.run_worker(self.mostrar(iter_buscar_mangas(query)), exclusive=True)
         elif event.button.id == "listar_button":
-            results = await buscar_mangas_no_banco("")
-            
+            self.run_worker(self.mostrar(iter_mangas_no_banco()), exclusive=True)
+
+    async def mostrar(self, mangas):
+        """Escreve os mangás no painel de resultados à medida que chegam do banco."""
+        log = self.query_one("#resultados", Log)
+        log.clear()
+        async for r in mangas:
+            log.write_line(f"[{r['id']}] {r['titulo']} ({r.get('autor')})")
             
+
     async def atualizar_stats(self):
         stats_widget = self.query_one("#stats", Static)
-        provs, mangas, caps = await obter_estatisticas()
-        stats_widget.update(f"Provedores: {provs} | Mangas: {mangas} | Capitulos: {caps}")
+        provs, mangas, caps, fila = await obter_estatisticas()
+        stats_widget.update(
+            f"Provedores: {provs} | Mangas: {mangas} | Capitulos: {caps} | "
+            f"Fila: {fila['pendente']} pendentes, {fila['por_hora']}/h"
+        )
         
 if __name__ == "__main__":
     MangaApp().run()
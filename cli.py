@@ -2,42 +2,379 @@ import os
 import typer
 import asyncio
 from pathlib import Path
-from app.crud import registrar_provedores, sincronizar_provedores, obter_estatisticas, buscar_mangas_no_banco
+from typing import List, Optional
+
+# app.crud (SQLAlchemy), BaseProvedor (httpx) e companhia são importados
+# dentro de cada comando: `--help` ou `novo-provedor` não carregam o banco e
+# `stats` ou `buscar` não carregam a parte de rede
 
 app = typer.Typer()
 
+def _executar(coro):
+    """asyncio.run que devolve as conexões do banco antes de o event loop acabar."""
+    async def com_banco():
+        from app import db
+        try:
+            return await coro
+        finally:
+            await db.fechar()
+
+    return asyncio.run(com_banco())
+
 @app.command()
 def registrar():
     """Registrar provedores disponíveis no banco"""
-    asyncio.run(registrar_provedores())
+    from app.crud import registrar_provedores
+
+    _executar(registrar_provedores())
     print("Provedores registrados com sucesso!")
 
 @app.command()
-def sync():
+def sync(
+    concorrencia: Optional[int] = typer.Option(
+        None, "--concorrencia", "-c", help="Mangás buscados ao mesmo tempo por provedor"
+    ),
+    paralelo: bool = typer.Option(
+        False, "--paralelo", "-p", help="Sincronizar todos os provedores ao mesmo tempo"
+    ),
+    incremental: bool = typer.Option(
+        False, "--incremental", "-i", help="Pular o que não mudou desde a última sincronização"
+    ),
+    resume: bool = typer.Option(
+        False, "--resume", "-r", help="Continuar a última sincronização interrompida de cada provedor"
+    ),
+    cache: Optional[Path] = typer.Option(
+        None, "--cache", help="Diretório do cache de respostas HTTP"
+    ),
+    cache_ttl: float = typer.Option(
+        3600, "--cache-ttl", help="Segundos que uma resposta em cache vale sem revalidar"
+    ),
+    offline: bool = typer.Option(
+        False, "--offline", help="Usar só o cache, sem acessar os sites (requer --cache)"
+    ),
+    conexoes_por_host: int = typer.Option(
+        10, "--conexoes-por-host", help="Conexões HTTP simultâneas por site"
+    ),
+    http2: bool = typer.Option(
+        False, "--http2", help="Usar HTTP/2 quando o site suportar (requer h2)"
+    ),
+    processos: int = typer.Option(
+        0, "--processos", "-P", help="Processos para interpretar o HTML (0 = no processo principal)"
+    ),
+    metricas: Optional[Path] = typer.Option(
+        None, "--metricas", help="Arquivo de métricas no formato do Prometheus (atualizado durante o sync)"
+    ),
+    relatorio: Optional[Path] = typer.Option(
+        None, "--relatorio", help="Relatório JSON da execução (tempo de cada etapa, requisições, linhas gravadas)"
+    ),
+):
     """Sincronizar mangas de todos os provedores"""
-    asyncio.run(sincronizar_provedores())
+    from app.core.base_provedor import BaseProvedor
+    from app.core.cache_http import CacheHTTP
+    from app.core.metricas import Metricas
+    from app.core.pool_http import PoolHTTP
+    from app.crud import sincronizar_provedores
+
+    if offline and cache is None:
+        typer.echo("⚠️ --offline requer --cache")
+        raise typer.Exit(1)
+    if cache is not None:
+        BaseProvedor.cache = CacheHTTP(cache, ttl=cache_ttl, offline=offline)
+    BaseProvedor.pool = PoolHTTP(max_por_host=conexoes_por_host, http2=http2)
+    if metricas is not None or relatorio is not None:
+        BaseProvedor.metricas = Metricas()
+
+    async def rodar():
+        exportador = None
+        if metricas is not None:
+            exportador = asyncio.create_task(BaseProvedor.metricas.exportar_periodicamente(str(metricas)))
+        try:
+            return await sincronizar_provedores(
+                concorrencia=concorrencia, paralelo=paralelo, incremental=incremental, retomar=resume,
+                processos=processos,
+            )
+        finally:
+            if exportador is not None:
+                exportador.cancel()
+
+    resumos = None
+    try:
+        resumos = _executar(rodar())
+    finally:
+        if BaseProvedor.metricas is not None:
+            BaseProvedor.metricas.imprimir()
+            if metricas is not None:
+                BaseProvedor.metricas.gravar_prometheus(str(metricas))
+            if relatorio is not None:
+                BaseProvedor.metricas.gravar_relatorio(str(relatorio), resumos)
     print("Sincronização concluída!")
 
+@app.command()
+def baixar(
+    manga_id: int,
+    destino: Path = typer.Option(
+        Path("downloads"), "--destino", "-d", help="Pasta onde os capítulos são gravados"
+    ),
+    formato: str = typer.Option(
+        "pastas", "--formato", "-f", help="Saída de cada capítulo: pastas (imagens soltas), cbz ou blobs (sem imagens repetidas)"
+    ),
+    simultaneos: int = typer.Option(
+        16, "--simultaneos", "-s", help="Páginas baixadas ao mesmo tempo (total)"
+    ),
+    por_host: int = typer.Option(
+        4, "--por-host", help="Páginas baixadas ao mesmo tempo de um mesmo servidor de imagens"
+    ),
+    capitulos: int = typer.Option(
+        4, "--capitulos", help="Capítulos baixados ao mesmo tempo"
+    ),
+):
+    """Baixar os capítulos ainda não baixados de um mangá"""
+    from app.core.downloader import SAIDAS
+    from app.crud import baixar_manga
+
+    if formato not in SAIDAS:
+        typer.echo(f"⚠️ Formato inválido: {formato} (use {', '.join(SAIDAS)})")
+        raise typer.Exit(1)
+    resultado = _executar(baixar_manga(
+        manga_id,
+        destino=str(destino),
+        formato=formato,
+        max_simultaneos=simultaneos,
+        max_por_host=por_host,
+        capitulos_simultaneos=capitulos,
+    ))
+    if resultado is None:
+        raise typer.Exit(1)
+
+    duracao = resultado["duracao"]
+    print(
+        f"Download concluído: {resultado['capitulos']} capítulos, "
+        f"{resultado['paginas']} páginas, {resultado['falhas']} falhas "
+        f"({resultado['paginas'] / duracao if duracao else 0:.1f} páginas/s)"
+    )
+
+@app.command()
+def enfileirar(
+    manga_id: Optional[int] = typer.Argument(None, help="Só os capítulos deste mangá"),
+):
+    """Colocar na fila de downloads os capítulos ainda não baixados"""
+    from app.crud import enfileirar_downloads
+
+    n = _executar(enfileirar_downloads(manga_id))
+    print(f"{n} capítulos enfileirados.")
+
+@app.command()
+def worker(
+    destino: Path = typer.Option(
+        Path("downloads"), "--destino", "-d", help="Pasta onde os capítulos são gravados"
+    ),
+    formato: str = typer.Option(
+        "pastas", "--formato", "-f", help="Saída de cada capítulo: pastas (imagens soltas), cbz ou blobs (sem imagens repetidas)"
+    ),
+    nome: Optional[str] = typer.Option(
+        None, "--nome", help="Identificação do worker (padrão: host:pid)"
+    ),
+    lote: int = typer.Option(
+        20, "--lote", "-l", help="Jobs reivindicados por vez"
+    ),
+    lease: float = typer.Option(
+        120, "--lease", help="Segundos que um job fica reservado sem heartbeat"
+    ),
+    simultaneos: int = typer.Option(
+        16, "--simultaneos", "-s", help="Páginas baixadas ao mesmo tempo (total)"
+    ),
+    por_host: int = typer.Option(
+        4, "--por-host", help="Páginas baixadas ao mesmo tempo de um mesmo servidor de imagens"
+    ),
+    uma_vez: bool = typer.Option(
+        False, "--uma-vez", help="Sair quando a fila estiver vazia"
+    ),
+    enfileirar: bool = typer.Option(
+        False, "--enfileirar", "-e", help="Enfileirar os capítulos não baixados antes de começar"
+    ),
+):
+    """Processar a fila de downloads (pode rodar em vários processos/máquinas)"""
+    from app.core.downloader import SAIDAS
+    from app.crud import enfileirar_downloads, executar_worker
+
+    if formato not in SAIDAS:
+        typer.echo(f"⚠️ Formato inválido: {formato} (use {', '.join(SAIDAS)})")
+        raise typer.Exit(1)
+    async def rodar():
+        if enfileirar:
+            print(f"[*] {await enfileirar_downloads()} capítulos enfileirados")
+        return await executar_worker(
+            nome=nome,
+            destino=str(destino),
+            formato=formato,
+            lote=lote,
+            lease=lease,
+            uma_vez=uma_vez,
+            max_simultaneos=simultaneos,
+            max_por_host=por_host,
+        )
+
+    try:
+        _executar(rodar())
+    except KeyboardInterrupt:
+        print("Worker interrompido; jobs em andamento devolvidos à fila.")
+
+@app.command()
+def gc(
+    destino: Path = typer.Option(
+        Path("downloads"), "--destino", "-d", help="Pasta de downloads que contém o armazém de blobs"
+    ),
+    carencia: float = typer.Option(
+        3600, "--carencia", help="Não apagar arquivos modificados há menos de N segundos"
+    ),
+):
+    """Apagar do armazém de blobs as imagens que nenhum capítulo usa"""
+    from app.crud import coletar_blobs
+
+    resultado = _executar(coletar_blobs(str(destino), carencia))
+    print(f"{resultado['blobs']} blobs removidos ({resultado['bytes'] / 1024 / 1024:.1f} MiB liberados).")
+
 @app.command()
 def stats():
     """Exibir estatísticas do banco"""
-    provs, mangas, caps = asyncio.run(obter_estatisticas())
+    from app.crud import obter_estatisticas
+
+    provs, mangas, caps, fila = _executar(obter_estatisticas())
     print(f"Provedores: {provs}, Mangas: {mangas}, Capitulos: {caps}")
+    print(
+        f"Fila de downloads: {fila['pendente']} pendentes, {fila['executando']} em andamento, "
+        f"{fila['concluido']} concluídos, {fila['falhou']} falharam "
+        f"({fila['por_hora']} concluídos na última hora)"
+    )
 
 @app.command()
-def buscar(query: str):
+def buscar(
+    query: str,
+    limite: int = typer.Option(20, "--limite", "-n", help="Resultados por página"),
+    pagina: int = typer.Option(1, "--pagina", help="Página de resultados (começando em 1)"),
+    todos: bool = typer.Option(False, "--todos", "-t", help="Mostrar todos os resultados"),
+):
     """Buscar mangas no banco"""
-    resultados = asyncio.run(buscar_mangas_no_banco(query))
-    for r in resultados:
-        print(f"[{r['id']}] {r['titulo']} ({r.get('autor')})")
+    from app.crud import buscar_mangas_no_banco, iter_buscar_mangas
+
+    async def imprimir():
+        if todos:
+            async for r in iter_buscar_mangas(query, tamanho_pagina=limite):
+                print(f"[{r['id']}] {r['titulo']} ({r.get('autor')})")
+            return
+        for r in await buscar_mangas_no_banco(query, limite=limite, pagina=pagina):
+            print(f"[{r['id']}] {r['titulo']} ({r.get('autor')})")
+
+    _executar(imprimir())
 
 @app.command()
 def listar():
     """Listar mangas no banco"""
-    resultados = asyncio.run(buscar_mangas_no_banco(""))
-    for r in resultados:
-        print(f"[{r['id']}] {r['titulo']} ({r.get('autor')})")
+    from app.crud import iter_mangas_no_banco
+
+    async def imprimir():
+        # imprime conforme as linhas chegam, sem carregar a tabela inteira
+        async for r in iter_mangas_no_banco():
+            print(f"[{r['id']}] {r['titulo']} ({r.get('autor')})")
+
+    _executar(imprimir())
         
+@app.command()
+def duplicados(
+    limiar: float = typer.Option(
+        0.7, "--limiar", help="Similaridade mínima entre os títulos (0 a 1)"
+    ),
+):
+    """Listar mangás que parecem ser o mesmo (para revisar e juntar com `mesclar`)"""
+    from app.crud import listar_duplicados
+
+    pares = _executar(listar_duplicados(limiar))
+    for par in pares:
+        a, b = par["manga"], par["outro"]
+        print(
+            f"{par['similaridade']:.2f}  [{a['id']}] {a['titulo']} ({a['capitulos']} caps)"
+            f"  ~  [{b['id']}] {b['titulo']} ({b['capitulos']} caps)"
+        )
+    print(f"{len(pares)} possíveis duplicados. Para juntar: mesclar <id que fica> <id que sai>")
+
+@app.command()
+def mesclar(
+    manter_id: int = typer.Argument(..., help="Mangá que fica"),
+    remover_id: int = typer.Argument(..., help="Mangá que é juntado ao outro e apagado"),
+):
+    """Juntar dois mangás duplicados (capítulos e provedores passam para o que fica)"""
+    from app.crud import mesclar_mangas
+
+    resultado = _executar(mesclar_mangas(manter_id, remover_id))
+    if resultado is None:
+        raise typer.Exit(1)
+    print(
+        f"Mangá {remover_id} juntado ao {manter_id}: {resultado['movidos']} capítulos movidos, "
+        f"{resultado['repetidos']} capítulos repetidos unificados."
+    )
+
+@app.command()
+def bench(
+    mangas: int = typer.Option(1000, "--mangas", "-m", help="Mangás no catálogo do site falso"),
+    capitulos: int = typer.Option(50, "--capitulos", help="Média de capítulos por mangá"),
+    por_pagina: int = typer.Option(20, "--por-pagina", help="Mangás por página de listagem"),
+    latencia: float = typer.Option(0.05, "--latencia", "-l", help="Segundos de latência de cada resposta (média)"),
+    rodadas: int = typer.Option(2, "--rodadas", "-r", help="Rodadas de sync (a 1ª sincroniza tudo)"),
+    atualizados: float = typer.Option(
+        0.1, "--atualizados", help="Fração dos mangás com um capítulo novo a cada rodada"
+    ),
+    provedor: Optional[List[str]] = typer.Option(
+        None, "--provedor", help="Provedor a sincronizar (pode repetir; padrão: todos com layout)"
+    ),
+    banco: Optional[str] = typer.Option(
+        None, "--banco", help="URL do banco de teste (padrão: SQLite temporário). O benchmark grava nele!"
+    ),
+    concorrencia: Optional[int] = typer.Option(
+        None, "--concorrencia", "-c", help="Mangás buscados ao mesmo tempo por provedor"
+    ),
+    processos: int = typer.Option(
+        0, "--processos", "-P", help="Processos para interpretar o HTML (0 = no processo principal)"
+    ),
+    saida: Optional[Path] = typer.Option(None, "--saida", "-o", help="Gravar o resultado em JSON"),
+):
+    """Medir o sync contra um site falso local (sem internet)"""
+    import json
+    from app.core.benchmark import SiteFalso, executar_benchmark
+
+    site = SiteFalso(
+        mangas=mangas, capitulos=capitulos, por_pagina=por_pagina,
+        latencia=latencia, atualizados=atualizados,
+    )
+    try:
+        resultado = _executar(executar_benchmark(
+            site, provedores=provedor, banco=banco, rodadas=rodadas,
+            concorrencia=concorrencia, processos=processos,
+        ))
+    except ValueError as e:
+        typer.echo(f"⚠️ {e}")
+        raise typer.Exit(1)
+
+    print("\n=== Benchmark ===")
+    config = resultado["config"]
+    print(
+        f"{', '.join(config['provedores'])}: {config['mangas']} mangás, "
+        f"~{config['capitulos_por_manga']} capítulos cada, latência {config['latencia_s'] * 1000:.0f}ms, "
+        f"banco: {config['banco']}"
+    )
+    for r in resultado["rodadas"]:
+        rss = f"{r['rss_pico_processo_mb']:.0f} MB" if r["rss_pico_processo_mb"] is not None else "?"
+        print(
+            f"rodada {r['rodada']}: {r['duracao_s']:>8.2f}s  {r['mangas_por_s']:>8.1f} mangás/s  "
+            f"{r['capitulos_por_s']:>9.1f} capítulos/s  {r['requisicoes_por_s']:>8.1f} req/s  "
+            f"pico de memória do processo: {rss}"
+        )
+        for erro in r["erros"]:
+            print(f"    erro: {erro}")
+
+    if saida is not None:
+        saida.write_text(json.dumps(resultado, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"Resultado gravado em {saida}")
+
 @app.command()
 def novo_provedor(nome: str):
     """